@@ -1,6 +1,9 @@
 const neo4j = require('neo4j-driver');
 const { driver } = require('../configs/neo4j');
-const { getCurrentTime, getDayType, parseTime, formatTime, formatDuration } = require('../utils/timeUtils');
+const { getCurrentTime, getDayType, parseTime, formatTime, formatDuration, toMinuteList, nextDeparture } = require('../utils/timeUtils');
+const { loadStopIndex, directConnections, routeStopSequence } = require('../utils/stopIndexUtils');
+const { findStopsNear } = require('../utils/nearbyStopUtils');
+const { findWeightedPaths } = require('../utils/routeSearchUtils');
 
 // İki koordinat arasındaki mesafeyi hesaplayan yardımcı fonksiyon
 const calculateDistance = (lat1, lon1, lat2, lng2) => {
@@ -22,6 +25,64 @@ const calculateDistance = (lat1, lon1, lat2, lng2) => {
   return distance * 1000;
 };
 
+// A durağından B durağına aynı yönde giden hatlar, durak farkına göre artan sırada.
+// veri_yukle.py --stop-index ile yazılan indeks varsa Cypher'a gitmeden sıralı liste kesişimiyle bulunur
+const getOrtakHatlar = async (session, baslangicId, bitisId) => {
+  const stopIndex = loadStopIndex();
+  if (stopIndex) {
+    return directConnections(stopIndex, baslangicId, bitisId);
+  }
+
+  const result = await session.run(
+    `MATCH path=(baslangic:Durak {stop_id: $baslangicId})-[r1:GÜZERGAH_ÜZERINDE]->(hat:Hat)<-[r2:GÜZERGAH_ÜZERINDE]-(bitis:Durak {stop_id: $bitisId})
+     WHERE r1.yön = r2.yön AND r1.sıra < r2.sıra
+     // Aynı rotada olması ve sıralı olması gerekli
+     RETURN hat.route_id AS hatId, 
+            hat.route_name AS hatAdi, 
+            hat.route_number AS hatNo, 
+            r1.yön AS yon,
+            r2.sıra - r1.sıra AS durakFarki // Duraklar arası adım sayısı
+     ORDER BY durakFarki ASC`,  // En az durak içeren güzergahı seç
+    { baslangicId, bitisId }
+  );
+  return result.records.map(record => ({
+    hatId: record.get('hatId'),
+    hatAdi: record.get('hatAdi'),
+    hatNo: record.get('hatNo'),
+    yon: record.get('yon'),
+    durakFarki: Number(record.get('durakFarki'))
+  }));
+};
+
+// Hattın bir yöndeki durakları sıraya göre: [{ durak, hat, yon, sira }].
+// İndeks varsa durak sırası indeksten gelir, durak bilgileri stop_id ile tek sorguda alınır
+const getHatDuraklari = async (session, hatId, yon) => {
+  const stopIndex = loadStopIndex();
+  const sequence = stopIndex && routeStopSequence(stopIndex, hatId, yon);
+  if (sequence) {
+    const result = await session.run(
+      `MATCH (d:Durak) WHERE d.stop_id IN $stopIds RETURN d AS durakObj`,
+      { stopIds: [...new Set(sequence.map(s => s.stopId))] }
+    );
+    const duraklar = new Map(result.records.map(r => [r.get('durakObj').properties.stop_id, r.get('durakObj').properties]));
+    return sequence
+      .filter(s => duraklar.has(s.stopId))
+      .map(s => ({ durak: duraklar.get(s.stopId), hat: hatId, yon, sira: s.sira }));
+  }
+
+  const hatDuraklari = await session.run(
+    `MATCH (h:Hat {route_id: $hatId})<-[r:GÜZERGAH_ÜZERINDE {yön: $yon}]-(d:Durak)
+     RETURN d.stop_id AS durakId, d AS durakObj, r.sıra AS sira`,
+    { hatId, yon }
+  );
+  return hatDuraklari.records.map(r => ({
+    durak: r.get('durakObj').properties,
+    hat: hatId,
+    yon,
+    sira: Number(r.get('sira'))
+  })).sort((a, b) => a.sira - b.sira);
+};
+
 // Bir hat için sonraki kalkış zamanını bulan fonksiyon
 const getNextDepartureTime = async (hatId, yon) => {
   const session = driver.session();
@@ -34,7 +95,10 @@ const getNextDepartureTime = async (hatId, yon) => {
        RETURN h.route_id as route_id,
               h.weekday_times as weekday_times, 
               h.saturday_times as saturday_times, 
-              h.sunday_times as sunday_times`,
+              h.sunday_times as sunday_times,
+              h.weekday_dk as weekday_dk,
+              h.saturday_dk as saturday_dk,
+              h.sunday_dk as sunday_dk`,
       { hatId }
     );
     
@@ -46,6 +110,14 @@ const getNextDepartureTime = async (hatId, yon) => {
     const record = result.records[0];
     const dayType = getDayType(); // Bugün haftaiçi mi, cumartesi mi, pazar mı?
     const currentTime = getCurrentTime(); // Şu anki saat (dakika cinsinden)
+
+    // İçe aktarımda ayrıştırılmış sıralı dizi varsa ikili arama ile bul
+    const departureMinutes = toMinuteList(record.get(`${dayType}_dk`));
+    if (departureMinutes && departureMinutes.length > 0) {
+      const nextMinute = nextDeparture(departureMinutes, currentTime - 1);
+      // Bugün kalan sefer yoksa yarının ilk seferi
+      return nextMinute !== null ? nextMinute : departureMinutes[0];
+    }
     
     // Gün tipine göre zaman alanını seç
     let timesField = `${dayType}_times`;
@@ -362,30 +434,13 @@ exports.enYakinDuraklar = async (req, res) => {
     const latitude = parseFloat(lat);
     const longitude = parseFloat(lng);
     
-    // Neo4j noktalar arası mesafe sorgusu
-    const result = await session.run(
-      `MATCH (d:Durak)
-       WHERE d.lat IS NOT NULL AND d.lon IS NOT NULL
-       WITH d, 
-            point.distance(
-              point({latitude: toFloat(d.lat), longitude: toFloat(d.lon)}), 
-              point({latitude: $latitude, longitude: $longitude})
-            ) as mesafe
-       WHERE mesafe <= $maxWalking
-       RETURN d, mesafe
-       ORDER BY mesafe
-       LIMIT 5`,
-      { 
-        latitude,
-        longitude,
-        maxWalking
-      }
-    );
+    // d.konum üzerindeki POINT indeksiyle, konumsuz eski veritabanında lat/lon taramasıyla
+    const yakinDuraklar = await findStopsNear(session, latitude, longitude, maxWalking, 5);
     
     // Durakları ve mesafeleri formatla
-    const duraklar = result.records.map(record => ({
-      ...record.get('d').properties,
-      mesafe: record.get('mesafe')
+    const duraklar = yakinDuraklar.map(({ stop, distance }) => ({
+      ...stop,
+      mesafe: distance
     }));
     
     res.json(duraklar);
@@ -396,7 +451,141 @@ exports.enYakinDuraklar = async (req, res) => {
   }
 };
 
-// İki nokta arasında rota bul
+// Ağırlıklı aramanın bulduğu yolu (utils/routeSearchUtils) rota yanıtına çevirir.
+// hatBilgileri: route_id -> { hatAdi, hatNo, yon }
+const AKTARMA_SURESI = 5; // dakika
+
+const yoldanRota = async (yol, hatBilgileri, baslangicNokta, bitisNokta) => {
+  const { start, end, stops, legs } = yol;
+  const baslangicYurumeSuresi = Math.ceil(start.distance / 100 * 1.5); // 100m başına 1.5 dakika
+  const bitisYurumeSuresi = Math.ceil(end.distance / 100 * 1.5);
+
+  const adimlar = [{
+    tip: 'yürüme',
+    baslangic: baslangicNokta,
+    bitis: stops[0],
+    mesafe: start.distance,
+    süre: baslangicYurumeSuresi,
+    baslangicNokta: true
+  }];
+  const duraklar = [{ durak: stops[0] }];
+  const otobusAdimlari = [];
+  for (const leg of legs) {
+    const baslangic = stops[leg.from];
+    const bitis = stops[leg.to];
+    if (leg.type === 'WALK') {
+      adimlar.push({ tip: 'yürüme', baslangic, bitis, mesafe: leg.distance, süre: Math.ceil(leg.duration) });
+    } else {
+      if (otobusAdimlari.length > 0) {
+        adimlar.push({ tip: 'aktarma', baslangic, bitis: baslangic, süre: AKTARMA_SURESI });
+      }
+      const hat = hatBilgileri.get(leg.routeId) || { hatAdi: leg.line, hatNo: leg.line };
+      const rotaDuraklar = stops.slice(leg.from, leg.to + 1);
+      const varisZamanBilgisi = await calculateArrivalTime(
+        leg.routeId, hat.yon, leg.from, leg.to, baslangic, bitis, rotaDuraklar);
+      const adim = {
+        tip: 'otobüs',
+        hat: leg.routeId,
+        hatNo: hat.hatNo || hat.hatAdi,
+        hatAdi: hat.hatAdi,
+        yon: hat.yon,
+        baslangic,
+        bitis,
+        durakSayisi: leg.to - leg.from,
+        süre: Math.ceil(leg.duration),
+        mesafe: leg.distance,
+        timeEstimate: varisZamanBilgisi,
+        binisZamanFormatli: varisZamanBilgisi?.boardingTime,
+        biniseKalanSure: varisZamanBilgisi?.waitTime,
+        varisZamanFormatli: varisZamanBilgisi?.arrivalTime
+      };
+      adimlar.push(adim);
+      otobusAdimlari.push(adim);
+    }
+    const otobus = leg.type === 'BUS' ? otobusAdimlari[otobusAdimlari.length - 1] : null;
+    stops.slice(leg.from + 1, leg.to + 1).forEach(durak =>
+      duraklar.push(otobus ? { durak, hat: otobus.hat, yon: otobus.yon } : { durak }));
+  }
+  adimlar.push({
+    tip: 'yürüme',
+    baslangic: stops[stops.length - 1],
+    bitis: bitisNokta,
+    mesafe: end.distance,
+    süre: bitisYurumeSuresi,
+    bitisNokta: true
+  });
+  if (otobusAdimlari.length === 0) return null;
+
+  const toplamSure = adimlar.reduce((toplam, adim) => toplam + adim.süre, 0);
+  const toplamMesafe = adimlar.reduce((toplam, adim) => toplam + (adim.mesafe || 0), 0);
+  const ilk = otobusAdimlari[0];
+  const ilkZaman = ilk.timeEstimate;
+  const rota = {
+    rotaId: `${otobusAdimlari.length === 1 ? 'direkt' : 'aktarmali'}-${otobusAdimlari.map(a => a.hat).join('-')}-${stops[0].stop_id}-${stops[stops.length - 1].stop_id}`,
+    rotaTipi: otobusAdimlari.length === 1 ? 'direkt' : 'aktarmali',
+    toplamSure,
+    toplamMesafe,
+    adimlar,
+    duraklar,
+    haritaKoordinatlari: [
+      [parseFloat(baslangicNokta.lat), parseFloat(baslangicNokta.lng)],
+      ...stops.map(d => [parseFloat(d.lat), parseFloat(d.lon)]),
+      [parseFloat(bitisNokta.lat), parseFloat(bitisNokta.lng)]
+    ]
+  };
+  if (otobusAdimlari.length === 1) {
+    rota.hatAdi = ilk.hatAdi;
+    rota.hatNo = ilk.hatNo;
+    rota.otobusZamanlama = ilkZaman ? {
+      ilkDuraktanKalkis: ilkZaman.departureTime,
+      duragaVaris: ilkZaman.boardingTime,
+      biniseKalanSure: ilkZaman.waitTime,
+      ilkDuraktanBinisDuragina: ilkZaman.timeToReachBoardingStop || 0
+    } : null;
+  } else {
+    rota.aktarmaDurakAdi = otobusAdimlari[1].baslangic.name;
+    rota.varisZamani = {
+      ilkSegment: ilkZaman,
+      ikinciSegment: otobusAdimlari[1].timeEstimate,
+      toplamBeklemeSuresi: ilkZaman ? ilkZaman.waitTime : 0,
+      toplamSeyahatSuresi: toplamSure,
+      ilkDuraktanBinisDuragina: ilkZaman ? ilkZaman.timeToReachBoardingStop : 0
+    };
+  }
+  return rota;
+};
+
+// Aktarma grafı yokken en yakın durak çiftini bağlayan direkt hat, ağırlıklı yol biçiminde
+const direktHatYolu = async (session, start, end) => {
+  const ortakHatlar = await getOrtakHatlar(session, start.stop.stop_id, end.stop.stop_id);
+  if (ortakHatlar.length === 0) return null;
+  const { hatId, hatAdi, hatNo, yon } = ortakHatlar[0];
+  const duraklar = await getHatDuraklari(session, hatId, yon);
+  const baslangicIndex = duraklar.findIndex(d => d.durak.stop_id === start.stop.stop_id);
+  const bitisIndex = duraklar.findIndex(d => d.durak.stop_id === end.stop.stop_id);
+  if (baslangicIndex === -1 || bitisIndex <= baslangicIndex) return null;
+
+  const stops = duraklar.slice(baslangicIndex, bitisIndex + 1).map(d => d.durak);
+  let mesafe = 0;
+  for (let i = 0; i < stops.length - 1; i++) {
+    mesafe += calculateDistance(
+      parseFloat(stops[i].lat), parseFloat(stops[i].lon),
+      parseFloat(stops[i + 1].lat), parseFloat(stops[i + 1].lon)
+    );
+  }
+  return {
+    yol: {
+      start,
+      end,
+      stops,
+      legs: [{ type: 'BUS', line: hatNo || hatAdi, routeId: hatId, from: 0, to: stops.length - 1,
+               duration: (stops.length - 1) * 2, distance: mesafe }] // Her durak arası 2 dakika
+    },
+    hat: { hatAdi, hatNo, yon }
+  };
+};
+
+// İki nokta arasında rota bul: yakın durak çiftleri için tek süre ağırlıklı arama
 exports.noktalarArasiRotaBul = async (req, res) => {
   const { baslangicLat, baslangicLng, bitisLat, bitisLng } = req.query;
   const maxWalkingDistance = req.query.maxWalkingDistance ? parseInt(req.query.maxWalkingDistance) : 500;
@@ -408,38 +597,11 @@ exports.noktalarArasiRotaBul = async (req, res) => {
     const session = driver.session();
     
     try {
-      // 1. A noktasına en yakın 5 durak bul
-      const baslangicDuraklar = await session.run(
-        `MATCH (d:Durak)
-         WHERE d.lat IS NOT NULL AND d.lon IS NOT NULL
-         RETURN d, 
-                point.distance(point({latitude: toFloat(d.lat), longitude: toFloat(d.lon)}), 
-                               point({latitude: toFloat($lat), longitude: toFloat($lng)})) as mesafe
-         ORDER BY mesafe
-         LIMIT 5`,
-        { lat: baslangicLat, lng: baslangicLng }
-      );
-      
-      // 2. B noktasına en yakın 5 durak bul
-      const bitisDuraklar = await session.run(
-        `MATCH (d:Durak)
-         WHERE d.lat IS NOT NULL AND d.lon IS NOT NULL
-         RETURN d, 
-                point.distance(point({latitude: toFloat(d.lat), longitude: toFloat(d.lon)}), 
-                               point({latitude: toFloat($lat), longitude: toFloat($lng)})) as mesafe
-         ORDER BY mesafe
-         LIMIT 5`,
-        { lat: bitisLat, lng: bitisLng }
-      );
-      
-      // Mesafe sınırı içindeki durakları filtrele
-      const yakinBaslangicDuraklar = baslangicDuraklar.records.filter(
-        record => record.get('mesafe') <= maxWalkingDistance
-      );
-      
-      const yakinBitisDuraklar = bitisDuraklar.records.filter(
-        record => record.get('mesafe') <= maxWalkingDistance
-      );
+      // 1-2. A ve B noktalarına yürüme mesafesindeki en yakın 5'er durak
+      const yakinBaslangicDuraklar = await findStopsNear(
+        session, parseFloat(baslangicLat), parseFloat(baslangicLng), maxWalkingDistance, 5);
+      const yakinBitisDuraklar = await findStopsNear(
+        session, parseFloat(bitisLat), parseFloat(bitisLng), maxWalkingDistance, 5);
       
       console.log(`Başlangıç noktasına ${yakinBaslangicDuraklar.length} yakın durak, bitiş noktasına ${yakinBitisDuraklar.length} yakın durak bulundu`);
       
@@ -451,398 +613,39 @@ exports.noktalarArasiRotaBul = async (req, res) => {
         return res.status(404).json({ hata: 'Bitiş noktasına yakın durak bulunamadı' });
       }
       
-      // Potansiyel rotaları topla
-      const rotalar = [];
-      
-      // Başlangıç ve bitiş için en yakın 5 durak arasındaki tüm kombinasyonları değerlendir
-      for (const baslangicRecord of yakinBaslangicDuraklar) {
-        const baslangicDurak = baslangicRecord.get('d').properties;
-        const baslangicMesafe = baslangicRecord.get('mesafe');
-        
-        for (const bitisRecord of yakinBitisDuraklar) {
-          const bitisDurak = bitisRecord.get('d').properties;
-          const bitisMesafe = bitisRecord.get('mesafe');
-          
-          // 3. Bu durak çifti arasındaki en kısa yolu giden hatları bul
-          // NOT: Kuş uçuşu mesafeye göre değil, hatların gittiği gerçek mesafeye göre
-          const ortakHatlar = await session.run(
-            `MATCH path=(baslangic:Durak {stop_id: $baslangicId})-[r1:GÜZERGAH_ÜZERINDE]->(hat:Hat)<-[r2:GÜZERGAH_ÜZERINDE]-(bitis:Durak {stop_id: $bitisId})
-             WHERE r1.yön = r2.yön AND r1.sıra < r2.sıra
-             // Aynı rotada olması ve sıralı olması gerekli
-             RETURN hat.route_id AS hatId, 
-                    hat.route_name AS hatAdi, 
-                    hat.route_number AS hatNo, 
-                    r1.yön AS yon,
-                    r2.sıra - r1.sıra AS durakFarki // Duraklar arası adım sayısı
-             ORDER BY durakFarki ASC`,  // En az durak içeren güzergahı seç
-            { baslangicId: baslangicDurak.stop_id, bitisId: bitisDurak.stop_id }
-          );
-          
-          console.log(`Durak çifti: ${baslangicDurak.name} -> ${bitisDurak.name}, ortak hat sayısı: ${ortakHatlar.records.length}`);
-          
-          // Ortak hat varsa, bu hat üzerinden direkt rota oluştur
-          for (const record of ortakHatlar.records) {
-            const hatId = record.get('hatId');
-            const hatAdi = record.get('hatAdi');
-            const hatNo = record.get('hatNo') || hatAdi; // Hat numarası yoksa hat adını kullan
-            const yon = record.get('yon');
-            
-            // Bu hat üzerindeki tüm durakları al
-            const hatDuraklari = await session.run(
-              `MATCH (h:Hat {route_id: $hatId})<-[r:GÜZERGAH_ÜZERINDE {yön: $yon}]-(d:Durak)
-               RETURN d.stop_id AS durakId, d AS durakObj, r.sıra AS sira`,
-              { hatId, yon }
-            );
-            
-            // Durakları listeye dönüştür ve sıraya göre düzenle
-            const duraklar = hatDuraklari.records.map(r => ({
-              durak: r.get('durakObj').properties,
-              hat: hatId,
-              yon,
-              sira: Number(r.get('sira'))
-            })).sort((a, b) => a.sira - b.sira);
-            
-            // Başlangıç ve bitiş duraklarının indekslerini bul
-            const baslangicIndex = duraklar.findIndex(d => d.durak.stop_id === baslangicDurak.stop_id);
-            const bitisIndex = duraklar.findIndex(d => d.durak.stop_id === bitisDurak.stop_id);
-            
-            if (baslangicIndex !== -1 && bitisIndex !== -1 && baslangicIndex < bitisIndex) {
-              // Başlangıç ve bitiş arasındaki durakları al
-              const rotaDuraklar = duraklar.slice(baslangicIndex, bitisIndex + 1);
-              
-              // Toplam gerçek mesafeyi hesapla (duraklar arası mesafeler toplamı)
-              let toplamMesafe = 0;
-              for (let i = 0; i < rotaDuraklar.length - 1; i++) {
-                const durak1 = rotaDuraklar[i].durak;
-                const durak2 = rotaDuraklar[i + 1].durak;
-                
-                // İki durak arasındaki mesafeyi hesapla
-                const durakMesafe = calculateDistance(
-                  parseFloat(durak1.lat), parseFloat(durak1.lon),
-                  parseFloat(durak2.lat), parseFloat(durak2.lon)
-                );
-                
-                toplamMesafe += durakMesafe;
-              }
-              
-              // Tahmini süre hesapla
-              const durakSayisi = rotaDuraklar.length - 1; // Geçilen durak sayısı
-              const tahminSure = durakSayisi * 2; // Her durak arası 2 dakika
-              
-              // Yürüme sürelerini hesapla
-              const baslangicYurumeSuresi = Math.ceil(baslangicMesafe / 100 * 1.5); // 100m başına 1.5 dakika
-              const bitisYurumeSuresi = Math.ceil(bitisMesafe / 100 * 1.5);
-              
-              // Toplam yolculuk süresi (otobüs + yürüme)
-              const toplamSure = tahminSure + baslangicYurumeSuresi + bitisYurumeSuresi;
-              
-              // Varış zamanı bilgilerini hesapla
-              const varisZamanBilgisi = await calculateArrivalTime(
-                hatId,
-                yon,
-                baslangicIndex,
-                bitisIndex,
-                baslangicDurak,
-                bitisDurak,
-                rotaDuraklar.map(d => d.durak)
-              );
-              
-              // Başlangıç ve bitiş koordinatlarını ekleyerek adımları oluştur
-              const adimlar = [
-                // A noktasından başlangıç durağına yürüme
-                  {
-                    tip: 'yürüme',
-                  baslangic: { lat: baslangicLat, lng: baslangicLng, name: 'A Noktası' },
-                    bitis: baslangicDurak,
-                  mesafe: baslangicMesafe,
-                  süre: baslangicYurumeSuresi,
-                  baslangicNokta: true
-                  },
-                // Otobüs yolculuğu
-                  {
-                    tip: 'otobüs',
-                    hat: hatId,
-                    hatNo: hatNo,
-                  hatAdi: hatAdi,
-                  yon: yon,
-                  baslangic: baslangicDurak,
-                  bitis: bitisDurak,
-                  durakSayisi: durakSayisi,
-                    süre: tahminSure,
-                  mesafe: toplamMesafe,
-                  timeEstimate: varisZamanBilgisi,
-                  binisZamanFormatli: varisZamanBilgisi?.boardingTime,
-                  biniseKalanSure: varisZamanBilgisi?.waitTime,
-                  varisZamanFormatli: varisZamanBilgisi?.arrivalTime
-                },
-                // Bitiş durağından B noktasına yürüme
-                  {
-                    tip: 'yürüme',
-                    baslangic: bitisDurak,
-                  bitis: { lat: bitisLat, lng: bitisLng, name: 'B Noktası' },
-                  mesafe: bitisMesafe,
-                  süre: bitisYurumeSuresi,
-                  bitisNokta: true
-                }
-              ];
-              
-              // Rotayı ekle
-              rotalar.push({
-                rotaId: `direkt-${hatId}-${baslangicDurak.stop_id}-${bitisDurak.stop_id}`,
-                rotaTipi: 'direkt',
-                hatAdi: hatAdi,
-                hatNo: hatNo,
-                toplamSure: toplamSure,
-                toplamMesafe: toplamMesafe + baslangicMesafe + bitisMesafe,
-                adimlar: adimlar,
-                duraklar: rotaDuraklar,
-                haritaKoordinatlari: [
-                  [parseFloat(baslangicLat), parseFloat(baslangicLng)],
-                  ...rotaDuraklar.map(d => [parseFloat(d.durak.lat), parseFloat(d.durak.lon)]),
-                  [parseFloat(bitisLat), parseFloat(bitisLng)]
-                ],
-                otobusZamanlama: varisZamanBilgisi ? {
-                  ilkDuraktanKalkis: varisZamanBilgisi.departureTime,
-                  duragaVaris: varisZamanBilgisi.boardingTime,
-                  biniseKalanSure: varisZamanBilgisi.waitTime,
-                  ilkDuraktanBinisDuragina: varisZamanBilgisi.timeToReachBoardingStop || 0
-                } : null
-              });
-            }
-          }
+      // 3. Tüm durak çiftleri için tek sorguda süre ağırlıklı en kısa yollar
+      const yollar = await findWeightedPaths(session, yakinBaslangicDuraklar, yakinBitisDuraklar, 10);
+      const hatBilgileri = new Map();
+      if (yollar.length > 0) {
+        const routeIds = [...new Set(yollar.flatMap(yol => yol.legs.filter(leg => leg.type === 'BUS').map(leg => leg.routeId)))];
+        const hatResult = await session.run(
+          `MATCH (h:Hat) WHERE h.route_id IN $routeIds
+           RETURN h.route_id AS hatId, h.route_name AS hatAdi, h.route_number AS hatNo, h.yön AS yon`,
+          { routeIds }
+        );
+        hatResult.records.forEach(record => hatBilgileri.set(record.get('hatId'), {
+          hatAdi: record.get('hatAdi'),
+          hatNo: record.get('hatNo'),
+          yon: record.get('yon')
+        }));
+      } else {
+        // Aktarma grafı ya da APOC yoksa en yakın durak çiftindeki direkt hatla yetin
+        const direkt = await direktHatYolu(session, yakinBaslangicDuraklar[0], yakinBitisDuraklar[0]);
+        if (direkt) {
+          yollar.push(direkt.yol);
+          hatBilgileri.set(direkt.yol.legs[0].routeId, direkt.hat);
         }
       }
-      
-      // Eğer direkt hat yoksa, aktarmalı rotaları hesapla
-      if (rotalar.length === 0 && yakinBaslangicDuraklar.length > 0 && yakinBitisDuraklar.length > 0) {
-        // En yakın başlangıç ve bitiş duraklarını ve mesafeleri al
-        const baslangicDurak = yakinBaslangicDuraklar[0].get('d').properties;
-        const bitisDurak = yakinBitisDuraklar[0].get('d').properties;
-        const baslangicMesafe = yakinBaslangicDuraklar[0].get('mesafe');
-        const bitisMesafe = yakinBitisDuraklar[0].get('mesafe');
-        const bitisId = bitisDurak.stop_id;
-
-        // Önemli aktarma noktalarını bul (en fazla hat geçen duraklar)
-        const session4 = driver.session();
-        try {
-          console.log("Direkt hat bulunamadı, aktarmalı rotalar hesaplanıyor...");
-          
-          const aktarmaNoktasiAdaylari = await session4.run(
-            `MATCH (d:Durak)-[r:GÜZERGAH_ÜZERINDE]->(h:Hat)
-             WHERE d.stop_id <> $baslangicId AND d.stop_id <> $bitisId
-             WITH d, COUNT(DISTINCT h) as hat_sayisi
-             RETURN d, hat_sayisi
-             ORDER BY hat_sayisi DESC
-             LIMIT 5`,
-            { 
-              baslangicId: baslangicDurak.stop_id, 
-              bitisId: bitisDurak.stop_id
-            }
-          );
-
-          console.log(`Aktarma noktası olabilecek ${aktarmaNoktasiAdaylari.records.length} durak bulundu`);
 
-          // Her bir aktarma noktası adayı için rota oluştur
-          for (const aktarmaRecord of aktarmaNoktasiAdaylari.records) {
-            const aktarmaDurak = aktarmaRecord.get('d').properties;
-            const hatSayisi = aktarmaRecord.get('hat_sayisi').toNumber();
-            
-            console.log(`Potansiyel aktarma noktası: ${aktarmaDurak.name} (${hatSayisi} hat geçiyor)`);
-
-            // Başlangıçtan aktarma noktasına hat var mı kontrol et
-                const baslangicToAktarma = await session4.run(
-              `MATCH (baslangic:Durak {stop_id: $baslangicId})-[r1:GÜZERGAH_ÜZERINDE]->(hat:Hat)<-[r2:GÜZERGAH_ÜZERINDE]-(aktarma:Durak {stop_id: $aktarmaId})
-                   WHERE r1.yön = r2.yön AND r1.sıra < r2.sıra
-                RETURN hat.route_id AS hatId, hat.route_name AS hatAdi, hat.route_number AS hatNo, r1.yön AS yon`,
-                  { baslangicId: baslangicDurak.stop_id, aktarmaId: aktarmaDurak.stop_id }
-                );
-
-            // Aktarma noktasından bitişe hat var mı kontrol et
-                const aktarmaToBitis = await session4.run(
-              `MATCH (aktarma:Durak {stop_id: $aktarmaId})-[r1:GÜZERGAH_ÜZERINDE]->(hat:Hat)<-[r2:GÜZERGAH_ÜZERINDE]-(bitis:Durak {stop_id: $bitisId})
-                   WHERE r1.yön = r2.yön AND r1.sıra < r2.sıra
-                RETURN hat.route_id AS hatId, hat.route_name AS hatAdi, hat.route_number AS hatNo, r1.yön AS yon`,
-              { aktarmaId: aktarmaDurak.stop_id, bitisId }
-                );
-
-                // Eğer her iki segment için de hat bulunduysa
-                if (baslangicToAktarma.records.length > 0 && aktarmaToBitis.records.length > 0) {
-                  const baslangicHat = baslangicToAktarma.records[0];
-                  const baslangicHatId = baslangicHat.get('hatId');
-                  const baslangicHatAdi = baslangicHat.get('hatAdi');
-                  const baslangicHatNo = baslangicHat.get('hatNo') || baslangicHatAdi;
-                  const baslangicYon = baslangicHat.get('yon');
-
-                  const bitisHat = aktarmaToBitis.records[0];
-                  const bitisHatId = bitisHat.get('hatId');
-                  const bitisHatAdi = bitisHat.get('hatAdi');
-                  const bitisHatNo = bitisHat.get('hatNo') || bitisHatAdi;
-                  const bitisYon = bitisHat.get('yon');
-
-                  console.log(`Aktarmalı rota: ${baslangicDurak.name} (${baslangicHatNo}) -> ${aktarmaDurak.name} (Aktarma) -> ${bitisDurak.name} (${bitisHatNo})`);
-
-                  // İlk segment için durak sayısını ve sürelerini hesapla
-                  const ilkSegmentSonuc = await getRotaSegmenti(session4, baslangicHatId, baslangicYon, baslangicDurak.stop_id, aktarmaDurak.stop_id);
-                  
-                  // İkinci segment için durak sayısını ve sürelerini hesapla
-                  const ikinciSegmentSonuc = await getRotaSegmenti(session4, bitisHatId, bitisYon, aktarmaDurak.stop_id, bitisDurak.stop_id);
-                  
-                  if (ilkSegmentSonuc && ikinciSegmentSonuc) {
-                    // İlk segmentin toplam mesafesini hesapla
-                    let ilkSegmentMesafe = 0;
-                    for (let i = 0; i < ilkSegmentSonuc.duraklar.length - 1; i++) {
-                      const durak1 = ilkSegmentSonuc.duraklar[i].durak;
-                      const durak2 = ilkSegmentSonuc.duraklar[i + 1].durak;
-                      ilkSegmentMesafe += calculateDistance(
-                        parseFloat(durak1.lat), parseFloat(durak1.lon),
-                        parseFloat(durak2.lat), parseFloat(durak2.lon)
-                      );
-                    }
-                    
-                    // İkinci segmentin toplam mesafesini hesapla
-                    let ikinciSegmentMesafe = 0;
-                    for (let i = 0; i < ikinciSegmentSonuc.duraklar.length - 1; i++) {
-                      const durak1 = ikinciSegmentSonuc.duraklar[i].durak;
-                      const durak2 = ikinciSegmentSonuc.duraklar[i + 1].durak;
-                      ikinciSegmentMesafe += calculateDistance(
-                        parseFloat(durak1.lat), parseFloat(durak1.lon),
-                        parseFloat(durak2.lat), parseFloat(durak2.lon)
-                      );
-                    }
-                    
-                    // İlk segmentin varış zamanı bilgilerini hesapla
-                    const ilkSegmentVarisZamani = await calculateArrivalTime(
-                      baslangicHatId,
-                      baslangicYon,
-                      ilkSegmentSonuc.baslangicIndex,
-                      ilkSegmentSonuc.bitisIndex,
-                      baslangicDurak,
-                      aktarmaDurak,
-                      ilkSegmentSonuc.duraklar.map(d => d.durak)
-                    );
-                    
-                    // İkinci segmentin varış zamanı bilgilerini hesapla (aktarma süresi eklenmiş)
-                    const aktarmaSuresi = 5; // dakika
-                    let ikinciSegmentVarisZamani = null;
-                    
-                    if (ilkSegmentVarisZamani) {
-                      // İlk segmentin varış zamanından aktarma süresini ekle
-                      const ikinciSegmentBaslangicZamani = ilkSegmentVarisZamani.time + aktarmaSuresi;
-                      
-                      // İkinci segment için varış zamanı hesapla
-                      ikinciSegmentVarisZamani = await calculateArrivalTime(
-                        bitisHatId,
-                        bitisYon,
-                        ikinciSegmentSonuc.baslangicIndex,
-                        ikinciSegmentSonuc.bitisIndex,
-                        aktarmaDurak,
-                        bitisDurak,
-                        ikinciSegmentSonuc.duraklar.map(d => d.durak)
-                      );
-                    }
-
-                    // Yürüme sürelerini hesapla
-                    const baslangicYurumeSuresi = Math.ceil(baslangicMesafe / 100 * 1.5);
-                    const bitisYurumeSuresi = Math.ceil(bitisMesafe / 100 * 1.5);
-                    
-                    // Toplam süre ve mesafeyi hesapla
-                    const toplamSure = ilkSegmentSonuc.sure + aktarmaSuresi + ikinciSegmentSonuc.sure + baslangicYurumeSuresi + bitisYurumeSuresi;
-                    const toplamMesafe = ilkSegmentMesafe + ikinciSegmentMesafe + baslangicMesafe + bitisMesafe;
-                    
-                    // Adımları oluştur
-                    const adimlar = [
-                      // A noktasından başlangıç durağına yürüme
-                      {
-                        tip: 'yürüme',
-                        baslangic: { lat: baslangicLat, lng: baslangicLng, name: 'A Noktası' },
-                        bitis: baslangicDurak,
-                        mesafe: baslangicMesafe,
-                        süre: baslangicYurumeSuresi,
-                        baslangicNokta: true
-                      },
-                      // İlk otobüs yolculuğu
-                      {
-                        tip: 'otobüs',
-                        hat: baslangicHatId,
-                        hatNo: baslangicHatNo,
-                        hatAdi: baslangicHatAdi,
-                        yon: baslangicYon,
-                        baslangic: baslangicDurak,
-                        bitis: aktarmaDurak,
-                        durakSayisi: ilkSegmentSonuc.durakSayisi,
-                        süre: ilkSegmentSonuc.sure,
-                        mesafe: ilkSegmentMesafe,
-                        timeEstimate: ilkSegmentVarisZamani,
-                        binisZamanFormatli: ilkSegmentVarisZamani?.boardingTime,
-                        biniseKalanSure: ilkSegmentVarisZamani?.waitTime,
-                        varisZamanFormatli: ilkSegmentVarisZamani?.arrivalTime
-                      },
-                      // Aktarma
-                      {
-                        tip: 'aktarma',
-                        baslangic: aktarmaDurak,
-                        bitis: aktarmaDurak,
-                        süre: aktarmaSuresi
-                      },
-                      // İkinci otobüs yolculuğu
-                      {
-                        tip: 'otobüs',
-                        hat: bitisHatId,
-                        hatNo: bitisHatNo,
-                        hatAdi: bitisHatAdi,
-                        yon: bitisYon,
-                        baslangic: aktarmaDurak,
-                        bitis: bitisDurak,
-                        durakSayisi: ikinciSegmentSonuc.durakSayisi,
-                        süre: ikinciSegmentSonuc.sure,
-                        mesafe: ikinciSegmentMesafe,
-                        timeEstimate: ikinciSegmentVarisZamani,
-                        binisZamanFormatli: ikinciSegmentVarisZamani?.boardingTime,
-                        biniseKalanSure: ikinciSegmentVarisZamani?.waitTime,
-                        varisZamanFormatli: ikinciSegmentVarisZamani?.arrivalTime
-                      },
-                      // Bitiş durağından B noktasına yürüme
-                      {
-                        tip: 'yürüme',
-                        baslangic: bitisDurak,
-                        bitis: { lat: bitisLat, lng: bitisLng, name: 'B Noktası' },
-                        mesafe: bitisMesafe,
-                        süre: bitisYurumeSuresi,
-                        bitisNokta: true
-                      }
-                    ];
-                    
-                    // Rotayı oluştur
-                    rotalar.push({
-                      rotaId: `aktarmali-${baslangicHatId}-${aktarmaDurak.stop_id}-${bitisHatId}-${bitisDurak.stop_id}`,
-                      rotaTipi: 'aktarmali',
-                      aktarmaDurakAdi: aktarmaDurak.name,
-                      toplamSure: toplamSure,
-                      toplamMesafe: toplamMesafe,
-                      varisZamani: {
-                        ilkSegment: ilkSegmentVarisZamani,
-                        ikinciSegment: ikinciSegmentVarisZamani,
-                        toplamBeklemeSuresi: ilkSegmentVarisZamani ? ilkSegmentVarisZamani.waitTime : 0,
-                        toplamSeyahatSuresi: toplamSure,
-                        ilkDuraktanBinisDuragina: ilkSegmentVarisZamani ? ilkSegmentVarisZamani.timeToReachBoardingStop : 0
-                      },
-                      adimlar: adimlar,
-                      duraklar: [
-                        ...ilkSegmentSonuc.duraklar,
-                        ...ikinciSegmentSonuc.duraklar.slice(1)
-                      ],
-                      haritaKoordinatlari: [
-                        [parseFloat(baslangicLat), parseFloat(baslangicLng)],
-                        ...ilkSegmentSonuc.duraklar.map(d => [parseFloat(d.durak.lat), parseFloat(d.durak.lon)]),
-                        ...ikinciSegmentSonuc.duraklar.slice(1).map(d => [parseFloat(d.durak.lat), parseFloat(d.durak.lon)]),
-                        [parseFloat(bitisLat), parseFloat(bitisLng)]
-                      ]
-                    });
-              }
-            }
-          }
-        } catch (err) {
-          console.error("Aktarmalı rota arama hatası:", err);
+      const baslangicNokta = { lat: baslangicLat, lng: baslangicLng, name: 'A Noktası' };
+      const bitisNokta = { lat: bitisLat, lng: bitisLng, name: 'B Noktası' };
+      const rotalar = [];
+      const gorulen = new Set();
+      for (const yol of yollar) {
+        const rota = await yoldanRota(yol, hatBilgileri, baslangicNokta, bitisNokta);
+        if (rota && !gorulen.has(rota.rotaId)) {
+          gorulen.add(rota.rotaId);
+          rotalar.push(rota);
         }
       }
       
@@ -860,6 +663,8 @@ exports.noktalarArasiRotaBul = async (req, res) => {
     } catch (error) {
       console.error("Rota hesaplama hatası:", error);
       res.status(500).json({ hata: 'Rota hesaplanırken bir hata oluştu', detay: error.message });
+    } finally {
+      await session.close();
     }
   } catch (error) {
     console.error("Rota hesaplama hatası:", error);
@@ -973,58 +778,6 @@ exports.durakBaglantiBul = async (req, res) => {
   }
 };
 
-// Bir hat üzerindeki iki durak arasındaki rota segmentini hesapla
-async function getRotaSegmenti(session, hatId, yon, baslangicId, bitisId) {
-  // Bu hat üzerindeki tüm durakları al
-  const hatDuraklari = await session.run(
-    `MATCH (h:Hat {route_id: $hatId})<-[r:GÜZERGAH_ÜZERINDE {yön: $yon}]-(d:Durak)
-     RETURN d.stop_id AS durakId, d AS durakObj, r.sıra AS sira`,
-    { hatId, yon }
-  );
-  
-  // Durakları listeye dönüştür ve sıraya göre düzenle
-  const duraklar = hatDuraklari.records.map(r => ({
-    durak: r.get('durakObj').properties,
-    hat: hatId,
-    yon,
-    sira: Number(r.get('sira'))
-  })).sort((a, b) => a.sira - b.sira);
-  
-  // Başlangıç ve bitiş duraklarının indekslerini bul
-  const baslangicIndex = duraklar.findIndex(d => d.durak.stop_id === baslangicId);
-  const bitisIndex = duraklar.findIndex(d => d.durak.stop_id === bitisId);
-  
-  if (baslangicIndex !== -1 && bitisIndex !== -1) {
-    // Başlangıç ve bitiş arasındaki durakları al
-    let rotaDuraklar;
-    if (baslangicIndex < bitisIndex) {
-      rotaDuraklar = duraklar.slice(baslangicIndex, bitisIndex + 1);
-    } else {
-      rotaDuraklar = duraklar.slice(bitisIndex, baslangicIndex + 1).reverse();
-    }
-    
-    // Durak sayısı ve tahmini süre hesapla
-    const durakSayisi = rotaDuraklar.length - 1;
-    const sure = durakSayisi * 2; // Her durak arası 2 dakika
-    
-    return {
-      duraklar: rotaDuraklar,
-      durakSayisi,
-      sure,
-      baslangicIndex,
-      bitisIndex
-    };
-  }
-  
-  return {
-    duraklar: [],
-    durakSayisi: 0,
-    sure: 0,
-    baslangicIndex: -1,
-    bitisIndex: -1
-  };
-}
-
 // Belirli bir konuma yakın olan durakları getirir
 exports.getYakinDuraklar = async (req, res) => {
   const { lat, lng, maxDistance } = req.query;
@@ -1035,22 +788,67 @@ exports.getYakinDuraklar = async (req, res) => {
 
   const session = driver.session();
   try {
-    const result = await session.run(
-      `
-      MATCH (d:Durak)
-      WHERE d.lat IS NOT NULL AND d.lon IS NOT NULL
-       WITH d, point.distance(
-         point({latitude: toFloat($lat), longitude: toFloat($lng)}),
-        point({latitude: toFloat(d.lat), longitude: toFloat(d.lon)})
-       ) AS distance
-      WHERE distance <= toFloat($maxDistance)
-       RETURN d.stop_id AS stop_id, d.name AS name, d.lat AS lat, d.lon AS lon, distance
-       ORDER BY distance
-      LIMIT 100
-      `,
-      { lat: parseFloat(lat), lng: parseFloat(lng), maxDistance: parseFloat(maxDistance) }
+    const yakinDuraklar = await findStopsNear(session, parseFloat(lat), parseFloat(lng), parseFloat(maxDistance), 100);
+
+    const stops = yakinDuraklar.map(({ stop, distance }) => ({
+      stop_id: stop.stop_id,
+      name: stop.name,
+      lat: stop.lat,
+      lon: stop.lon,
+      distance,
+    }));
+
+    res.json(stops);
+  } catch (error) {
+    console.error('Yakın duraklar alınırken hata oluştu:', error);
+    res.status(500).send('Sunucu hatası');
+  } finally {
+    await session.close();
+  }
+};
+
+// Bir durağa en yakın durakları getirir. veri_yukle.py --stop-neighbors ile önceden
+// hesaplanan komşu listesi varsa onu okur, yoksa konum indeksiyle yarıçap içinde arar
+exports.getDurakKomsulari = async (req, res) => {
+  const { id } = req.params;
+  const maxDistance = req.query.maxDistance ? parseFloat(req.query.maxDistance) : 500;
+
+  const session = driver.session();
+  try {
+    const durakResult = await session.run(
+      'MATCH (d:Durak {stop_id: $id}) RETURN d.komsu_duraklar AS komsular',
+      { id }
     );
 
+    if (durakResult.records.length === 0) {
+      return res.status(404).json({ hata: 'Durak bulunamadı' });
+    }
+
+    const result = durakResult.records[0].get('komsular')
+      ? await session.run(
+        `
+        MATCH (d:Durak {stop_id: $id})
+        UNWIND range(0, size(d.komsu_duraklar) - 1) AS i
+        WITH d.komsu_duraklar[i] AS komsuId, d.komsu_mesafeler[i] AS distance
+        WHERE distance <= $maxDistance
+        MATCH (k:Durak {stop_id: komsuId})
+        RETURN k.stop_id AS stop_id, k.name AS name, k.lat AS lat, k.lon AS lon, distance
+        ORDER BY distance
+        `,
+        { id, maxDistance }
+      )
+      : await session.run(
+        `
+        MATCH (d:Durak {stop_id: $id})
+        MATCH (k:Durak)
+        WHERE point.distance(k.konum, d.konum) <= $maxDistance AND k <> d
+        WITH k, point.distance(k.konum, d.konum) AS distance
+        RETURN k.stop_id AS stop_id, k.name AS name, k.lat AS lat, k.lon AS lon, distance
+        ORDER BY distance
+        `,
+        { id, maxDistance }
+      );
+
     const stops = result.records.map(record => ({
       stop_id: record.get('stop_id'),
       name: record.get('name'),
@@ -1061,7 +859,7 @@ exports.getYakinDuraklar = async (req, res) => {
 
     res.json(stops);
   } catch (error) {
-    console.error('Yakın duraklar alınırken hata oluştu:', error);
+    console.error('Komşu duraklar alınırken hata oluştu:', error);
     res.status(500).send('Sunucu hatası');
   } finally {
     await session.close();
@@ -1135,7 +933,9 @@ exports.getYaklasanHatlar = async (req, res) => {
              h.route_number AS hat_no,
              h.route_long_name AS hat_adi,
              h.${dayType}_times AS schedule,
-             r.sıra AS stop_sequence
+             h.${dayType}_dk AS schedule_dk,
+             r.sıra AS stop_sequence,
+             r.offset_dk AS offset_dk
     `, { stopId });
 
     if (hatlarResult.records.length === 0) {
@@ -1150,22 +950,32 @@ exports.getYaklasanHatlar = async (req, res) => {
         schedule: record.get('schedule'),
         stop_sequence: record.get('stop_sequence')?.toNumber()
       };
+      // İçe aktarımda ayrıştırılmış sıralı sefer dakikaları ve duraktaki kalkış farkı (varsa)
+      const seferDakikalari = toMinuteList(record.get('schedule_dk'));
+      const offset = record.get('offset_dk');
 
       // Gerekli bilgiler eksikse bu hattı atla
-      if (!hat.schedule || hat.stop_sequence === undefined || hat.stop_sequence <= 0) {
+      if ((!hat.schedule && !seferDakikalari) || hat.stop_sequence === undefined || hat.stop_sequence <= 0) {
         return null;
       }
-      
-      // 2. Sonraki kalkış saatini bul
-      const seferSaatleri = hat.schedule.trim().split(' ').map(parseTime).filter(t => t !== null);
-      if(seferSaatleri.length === 0) return null;
 
       // Durağa tahmini varış süresini hesaba katarak bir sonraki kalkışı bul.
       // Bu, "otobüs çoktan kalktı ama daha durağa varmadı" durumunu doğru ele almamızı sağlar.
-      const seyahatSuresi = hat.stop_sequence * 0.85; // Dakika
+      const seyahatSuresi = offset !== null && offset !== undefined ? offset : hat.stop_sequence * 0.85; // Dakika
 
-      // Kalkış saati + seyahat süresi > şimdiki zaman olan ilk seferi bul
-      const sonrakiUygunSefer = seferSaatleri.find(kalkisSaati => (kalkisSaati + seyahatSuresi) > currentTimeInMinutes);
+      // 2. Sonraki kalkış saatini bul
+      let sonrakiUygunSefer;
+      if (seferDakikalari) {
+        // Kalkış saati + seyahat süresi > şimdiki zaman olan ilk sefer, ikili arama ile
+        sonrakiUygunSefer = nextDeparture(seferDakikalari, currentTimeInMinutes, seyahatSuresi);
+        if (sonrakiUygunSefer === null) sonrakiUygunSefer = undefined;
+      } else {
+        const seferSaatleri = hat.schedule.trim().split(' ').map(parseTime).filter(t => t !== null);
+        if(seferSaatleri.length === 0) return null;
+
+        // Kalkış saati + seyahat süresi > şimdiki zaman olan ilk seferi bul
+        sonrakiUygunSefer = seferSaatleri.find(kalkisSaati => (kalkisSaati + seyahatSuresi) > currentTimeInMinutes);
+      }
 
       if (sonrakiUygunSefer === undefined) {
         return null; // Bugün için yakalanabilecek sefer yok
@@ -2,6 +2,8 @@ const { driver } = require('../configs/neo4j');
 const fs = require('fs');
 const csv = require('csv-parser');
 const path = require('path');
+const { getCompactShape, decodePolyline } = require('../utils/shapeUtils');
+const { getRouteDocuments, pairedRouteId: getPairedRouteId } = require('../utils/routeDocumentUtils');
 
 // Tüm hatları getir
 exports.tumHatlariGetir = async (req, res) => {
@@ -107,6 +109,16 @@ exports.hatGuzergahiniGetir = async (req, res) => {
   const { yon } = req.query; // "Gidiş" veya "Dönüş"
   
   try {
+    // Okuma modeli varsa (veri_yukle.py --route-documents) sıralı durak listesi tek özellikten okunur
+    const documents = await getRouteDocuments(session, [id]);
+    const document = documents[id];
+    if (document) {
+      if (document.stops.length === 0 || (yon && document.yon !== yon)) {
+        return res.status(404).json({ hata: 'Hat veya güzergah bulunamadı' });
+      }
+      return res.json(document.stops.map(durak => (yon ? durak : { ...durak, yon: document.yon })));
+    }
+
     let query;
     
     if (yon) {
@@ -167,6 +179,23 @@ exports.hatShapeGetir = async (req, res) => {
   const { yon } = req.query; // "Gidiş" veya "Dönüş"
   
   try {
+    // Kompakt shape yüklenmişse (veri_yukle.py --shape-mode compact) tek düğümden oku.
+    // Aşağıdaki ShapeNoktasi sorgusu gibi aynı hattın o yöndeki route_id'sine bak (son hane yönü
+    // belirtir); yön verilmemişse gidiş ('0') kullanılır
+    const compactRouteId = id.slice(0, -1) + (yon === 'Dönüş' ? '1' : '0');
+
+    // Okuma modelindeki sadeleştirilmiş shape (veri_yukle.py --route-documents)
+    const documents = await getRouteDocuments(session, [compactRouteId]);
+    if (documents[compactRouteId] && documents[compactRouteId].shape) {
+      const points = decodePolyline(documents[compactRouteId].shape);
+      return res.json(points.map(([lat, lng], index) => ({ lat, lng, sequence: index })));
+    }
+
+    const compactShape = await getCompactShape(session, compactRouteId);
+    if (compactShape.length > 0) {
+      return res.json(compactShape.map(([lat, lng], index) => ({ lat, lng, sequence: index })));
+    }
+
     // Find the correct shape for this route
     // First, check if there are direct shapes for this route ID
     const routeIdPrefix = id.slice(0, -1);  // Remove last digit
@@ -254,6 +283,35 @@ exports.hatSaatBilgileriGetir = async (req, res) => {
   const { id } = req.params;
   
   try {
+    // Okuma modeli varsa (veri_yukle.py --route-documents) iki yönün çizelgesi tek sorguda okunur
+    const documents = await getRouteDocuments(session, [id, getPairedRouteId(id)]);
+    const document = documents[id];
+    if (document && document.schedule) {
+      const schedule = document.schedule;
+      const paired = document.paired_route_id && documents[document.paired_route_id]
+        ? documents[document.paired_route_id].schedule
+        : null;
+      return res.json({
+        direction_1: schedule.direction,
+        direction_2: paired ? paired.direction : (id.endsWith('0') ? 'Dönüş' : 'Gidiş'),
+        route_short_name_1: schedule.route_short_name,
+        route_short_name_2: paired ? paired.route_short_name : '',
+        notes: schedule.notes,
+        weekday_times: {
+          direction_1: schedule.weekday_times,
+          direction_2: paired ? paired.weekday_times : []
+        },
+        saturday_times: {
+          direction_1: schedule.saturday_times,
+          direction_2: paired ? paired.saturday_times : []
+        },
+        sunday_times: {
+          direction_1: schedule.sunday_times,
+          direction_2: paired ? paired.sunday_times : []
+        }
+      });
+    }
+
     // Get the current route's schedule
     const result = await session.run(
       `MATCH (h:Hat {route_id: $id}) 
@@ -1,6 +1,8 @@
 const neo4j = require('../configs/neo4j');
-const { int } = require('neo4j-driver');
 const { getDayType, getCurrentTimeInMinutes, parseTime, formatTime, getDayTypeFromDate, getTimeInMinutesFromDate } = require('../utils/timeUtils');
+const { getCompactShape } = require('../utils/shapeUtils');
+const { findStopsNear, scanStopsByCoordinates } = require('../utils/nearbyStopUtils');
+const { getEdgeModel, segmentCandidates, assignLines, findWeightedPaths } = require('../utils/routeSearchUtils');
 
 // Grafiğin bellekteki adı
 const GDS_GRAPH_NAME = 'kocaeliRouteGraph';
@@ -31,23 +33,16 @@ const calculateShapeDistance = (shape) => {
     return totalDistance;
 };
 
-// Enlem ve boylama en yakın N durağı bulan fonksiyon
-const findNearestStops = async (session, lat, lon, limit = 5) => {
-    const query = `
-        MATCH (d:Durak)
-        WITH d, point.distance(
-            point({latitude: $lat, longitude: $lon}),
-            point({latitude: d.lat, longitude: d.lon})
-        ) AS distance
-        RETURN d, distance
-        ORDER BY distance
-        LIMIT $limit
-    `;
-    const result = await session.run(query, { lat: parseFloat(lat), lon: parseFloat(lon), limit: int(limit) });
-    return result.records.map(record => ({
-        stop: record.get('d').properties,
-        distance: record.get('distance')
-    }));
+// Enlem ve boylama en yakın N durağı bulan fonksiyon. Önce d.konum üzerindeki POINT indeksiyle
+// searchRadius metre içinde aranır; yeterli durak yoksa tüm duraklar taranır
+const findNearestStops = async (session, lat, lon, limit = 5, searchRadius = 1000) => {
+    lat = parseFloat(lat);
+    lon = parseFloat(lon);
+    let stops = await findStopsNear(session, lat, lon, searchRadius, limit);
+    if (stops.length < limit) {
+        stops = await scanStopsByCoordinates(session, lat, lon, null, limit);
+    }
+    return stops;
 };
 
 // GDS grafiğinin bellekte olup olmadığını kontrol eder, yoksa oluşturur.
@@ -63,11 +58,16 @@ const ensureGdsGraphExists = async (session) => {
 
     console.log(`GDS Grafiği '${GDS_GRAPH_NAME}' belleğe yansıtılıyor...`);
     
+    // Toplu kenar modeli yüklenmişse SONRAKI_DURAK yoktur; DURAK_BAGLANTISI yansıtılır
+    const { aggregated } = await getEdgeModel(session);
+    const relationshipType = aggregated ? 'DURAK_BAGLANTISI' : 'SONRAKI_DURAK';
+
     // 1. Adım: İlişkiler üzerinde mesafe tabanlı 'weight' özelliğini oluştur.
-    // Bu, GDS'in mesafeye göre en kısa yolu bulmasını sağlar.
+    // Bu, GDS'in mesafeye göre en kısa yolu bulmasını sağlar. DURAK_BAGLANTISI'nda
+    // yükleyicinin shape boyunca ölçtüğü mesafe (mesafe) kullanılır.
     await session.run(`
-        MATCH (d1:Durak)-[r:SONRAKI_DURAK]->(d2:Durak)
-        SET r.weight = point.distance(point({latitude: d1.lat, longitude: d1.lon}), point({latitude: d2.lat, longitude: d2.lon}))
+        MATCH (d1:Durak)-[r:${relationshipType}]->(d2:Durak)
+        SET r.weight = coalesce(r.mesafe, point.distance(point({latitude: d1.lat, longitude: d1.lon}), point({latitude: d2.lat, longitude: d2.lon})))
     `);
 
     // 2. Adım: GDS'e sadece topoloji ve ağırlık bilgisini yansıt.
@@ -76,7 +76,7 @@ const ensureGdsGraphExists = async (session) => {
             $graphName,
             'Durak',
             {
-                SONRAKI_DURAK: {
+                ${relationshipType}: {
                     properties: 'weight'
                 }
             }
@@ -102,6 +102,9 @@ const processPathToSteps = (pathRecord, startStop, endStop) => {
     // HATA AYIKLAMA KODU BİTİŞ
 
     const segmentsInPath = segmentsInPathRels.map(s => s.properties);
+    // Paralel kenarlarda mevcut hatta devam edilir, sahte aktarma üretilmez
+    const segmentLines = assignLines(segmentsInPath.map(s =>
+        s.relationshipProperties ? segmentCandidates(s.relationshipProperties) : null));
 
     let steps = [];
     // İlk yürüme adımı
@@ -110,18 +113,19 @@ const processPathToSteps = (pathRecord, startStop, endStop) => {
     if (segmentsInPath.length > 0 && segmentsInPath[0].relationshipProperties) {
         let currentBusLeg = {
             type: 'BUS',
-            line: segmentsInPath[0].relationshipProperties.hat,
+            line: segmentLines[0] && segmentLines[0].line,
             from: stopsInPath[0].name,
             to: '',
             stops: 1
         };
 
         for (let i = 0; i < segmentsInPath.length; i++) {
-            if (segmentsInPath[i].relationshipProperties.hat !== currentBusLeg.line && i > 0) {
+            const line = segmentLines[i] && segmentLines[i].line;
+            if (line !== currentBusLeg.line && i > 0) {
                 currentBusLeg.to = stopsInPath[i].name;
                 steps.push(currentBusLeg);
-                steps.push({ type: 'TRANSFER', text: `${stopsInPath[i].name} durağında ${segmentsInPath[i].relationshipProperties.hat} hattına aktarma yapın.` });
-                currentBusLeg = { type: 'BUS', line: segmentsInPath[i].relationshipProperties.hat, from: stopsInPath[i].name, to: '', stops: 1 };
+                steps.push({ type: 'TRANSFER', text: `${stopsInPath[i].name} durağında ${line} hattına aktarma yapın.` });
+                currentBusLeg = { type: 'BUS', line, from: stopsInPath[i].name, to: '', stops: 1 };
             } else {
                 currentBusLeg.stops++;
             }
@@ -149,6 +153,10 @@ const processPathToSteps = (pathRecord, startStop, endStop) => {
 
 // YENİ YARDIMCI FONKSİYON: Shape (yol geometrisi) verisini çeker
 const getShapeFor = async (session, shapeId) => {
+    // Kompakt shape yüklenmişse tek düğümden oku
+    const compactShape = await getCompactShape(session, shapeId);
+    if (compactShape.length > 0) return compactShape;
+
     const result = await session.run(
       `MATCH (p:ShapeNoktasi {shape_id: $shapeId})
        RETURN p.lat as lat, p.lng as lon
@@ -259,231 +267,85 @@ const getBusArrivalTime = async (session, routeId, boardingStop, departureTime,
     };
 };
 
-// YENİ ALGORİTMA: 0 Aktarmalı Rotaları Bul
-const findDirectRoutes = async (session, startStops, endStops, departureTime) => {
-    const startStopIds = startStops.map(s => s.stop.stop_id);
-    const endStopIds = endStops.map(s => s.stop.stop_id);
-
-    const query = `
-        // 1. Başlangıç ve bitiş duraklarından geçen ortak hatları bul
-        MATCH (startDurak:Durak)-[r1:GÜZERGAH_ÜZERINDE]->(hat:Hat)<-[r2:GÜZERGAH_ÜZERINDE]-(endDurak:Durak)
-        WHERE startDurak.stop_id IN $startStopIds 
-          AND endDurak.stop_id IN $endStopIds
-          // 2. Durakların hat üzerinde doğru sırada olduğundan emin ol (başlangıç bitişten önce gelmeli)
-          AND r1.sıra < r2.sıra
-        
-        // 3. Rota üzerindeki tüm ara durakları topla
-        MATCH (hat)<-[r_ara:GÜZERGAH_ÜZERINDE]-(araDurak:Durak)
-        WHERE r_ara.sıra >= r1.sıra AND r_ara.sıra <= r2.sıra
-        
-        WITH startDurak, endDurak, hat, r1.sıra AS startSira, r2.sıra AS endSira, COLLECT({durak: araDurak, sira: r_ara.sıra}) AS araDuraklarData
-        
-        // 4. Ara durakları sıraya göre diz
-        UNWIND araDuraklarData AS data
-        WITH startDurak, endDurak, hat, startSira, endSira, data
-        ORDER BY data.sira ASC
-        WITH startDurak, endDurak, hat, startSira, endSira, COLLECT(data.durak) AS pathStops
-
-        RETURN startDurak, endDurak, hat, pathStops, (endSira - startSira) AS durakSayisi
-    `;
-
-    const result = await session.run(query, { startStopIds, endStopIds });
-    
-    if (result.records.length === 0) {
-        return [];
-    }
-
-    const allDirectRoutes = [];
-    for (const record of result.records) {
-        const startDurak = record.get('startDurak').properties;
-        const endDurak = record.get('endDurak').properties;
-        const hat = record.get('hat').properties;
-        const pathStops = record.get('pathStops').map(p => p.properties);
-        const durakSayisi = record.get('durakSayisi').toNumber();
-
-        // Rota için yol geometrisini (shape) al ve sadece ilgili kısmı kes
-        const fullShape = await getShapeFor(session, hat.route_id);
-        const shape = sliceShape(fullShape, startDurak, endDurak);
-
-        // Otobüs güzergahının mesafesini ve süresini hesapla
-        const busDistance = calculateShapeDistance(shape);
-        const busDuration = busDistance / 400; // Ortalama hız 24km/s (400m/dk) varsayılarak
-
-        // Bu rota için doğru başlangıç ve bitiş yürüme mesafelerini bul
-        const initialWalk = startStops.find(s => s.stop.stop_id === startDurak.stop_id);
-        const finalWalk = endStops.find(s => s.stop.stop_id === endDurak.stop_id);
-
-        const steps = [];
-        // İlk yürüme adımı
-        steps.push({ type: 'WALK', from: 'Başlangıç Noktanız', to: startDurak.name, duration: initialWalk.distance / 80, distance: initialWalk.distance });
+// Süre ağırlıklı aramanın bulduğu yolu yanıt biçimine çevirir (arama: utils/routeSearchUtils).
+// Her otobüs bacağında, durağa varıştan sonraki ilk sefer beklenir; aktarma başına ceza eklenir.
+// Hatta sefer yoksa yol kullanılamaz, null döner
+const TRANSFER_PENALTY = 5;
+
+const buildRouteOption = async (session, path, departureTime) => {
+    const { start, end, stops, legs } = path;
+    const startWalkDuration = start.distance / 80;
+    const steps = [{ type: 'WALK', from: 'Başlangıç Noktanız', to: stops[0].name, duration: startWalkDuration, distance: start.distance }];
+
+    // Kullanıcının o anki konumuna varış zamanı (gün başından dakika)
+    let clock = getTimeInMinutesFromDate(departureTime) + startWalkDuration;
+    let arrivalInfo = null;
+    let waitTime = 0;
+    const lines = [];
+    for (const leg of legs) {
+        const from = stops[leg.from];
+        const to = stops[leg.to];
+        if (leg.type === 'WALK') {
+            steps.push({ type: 'WALK', from: from.name, to: to.name, duration: leg.duration, distance: leg.distance });
+            clock += leg.duration;
+            continue;
+        }
+        let legArrival;
+        if (lines.length === 0) {
+            legArrival = await getBusArrivalTime(session, leg.routeId, from, departureTime, start.distance);
+            arrivalInfo = legArrival;
+        } else {
+            const boardingTime = new Date(departureTime);
+            boardingTime.setHours(0, 0, 0, 0);
+            boardingTime.setMinutes(clock);
+            legArrival = await getBusArrivalTime(session, leg.routeId, from, boardingTime, 0);
+        }
+        if (!legArrival) return null;
+        if (lines.length > 0) {
+            steps.push({
+                type: 'TRANSFER',
+                text: `${from.name} durağında ${leg.line} hattına aktarma yapın.`,
+                duration: legArrival.waitTime, // Gerçek bekleme süresi
+                arrivalInfo: legArrival
+            });
+        }
+        waitTime += legArrival.waitTime;
+        clock += legArrival.waitTime + leg.duration;
 
-        // Otobüs adımı
+        const shape = sliceShape(await getShapeFor(session, leg.routeId), from, to);
         steps.push({
             type: 'BUS',
-            line: hat.route_number,
-            from: startDurak.name,
-            to: endDurak.name,
-            stops: pathStops.map(p => p.name), // Tüm durakların listesi
-            shape: shape,
-            duration: busDuration,
-            distance: busDistance
-        });
-
-        // Son yürüme adımı
-        steps.push({ type: 'WALK', from: endDurak.name, to: 'Varış Noktanız', duration: finalWalk.distance / 80, distance: finalWalk.distance });
-
-        const arrivalInfo = await getBusArrivalTime(session, hat.route_id, startDurak, departureTime, initialWalk.distance);
-        const total_walk_duration = steps.filter(s => s.type === 'WALK').reduce((sum, step) => sum + step.duration, 0);
-
-        // Toplam süreyi hesapla (mesafe bazlı)
-        const total_duration = (initialWalk.distance / 80) + (arrivalInfo ? arrivalInfo.waitTime : 0) + busDuration + (finalWalk.distance / 80);
-
-        allDirectRoutes.push({
-            total_duration,
-            steps,
-            arrivalInfo,
-            total_walk_duration: Math.round(total_walk_duration),
-            unique_path_id: `DIRECT-${hat.route_number}`
+            line: leg.line,
+            from: from.name,
+            to: to.name,
+            stops: stops.slice(leg.from, leg.to + 1).map(s => s.name),
+            shape,
+            duration: leg.duration,
+            distance: leg.distance
         });
+        lines.push(leg.line);
     }
+    if (lines.length === 0) return null;
+    steps.push({ type: 'WALK', from: stops[stops.length - 1].name, to: 'Varış Noktanız', duration: end.distance / 80, distance: end.distance });
 
-    return allDirectRoutes;
-};
+    const total_walk_duration = steps.filter(s => s.type === 'WALK').reduce((sum, step) => sum + step.duration, 0);
+    const busDuration = steps.filter(s => s.type === 'BUS').reduce((sum, step) => sum + step.duration, 0);
+    const total_duration = total_walk_duration + waitTime + busDuration + TRANSFER_PENALTY * (lines.length - 1);
+    const kind = lines.length === 1 ? 'DIRECT' : lines.length === 2 ? 'TRANSFER' : 'WEIGHTED';
 
-// YENİ ALGORİTMA: 1 Aktarmalı Rotaları Bul
-const findOneTransferRoutes = async (session, startStops, endStops, departureTime) => {
-    const startStopIds = startStops.map(s => s.stop.stop_id);
-    const endStopIds = endStops.map(s => s.stop.stop_id);
-    
-    // Aktarma için ek süre (dk) - Bu, algoritmanın aktarmasız rotaları tercih etmesi için bir ceza puanıdır.
-    const TRANSFER_PENALTY = 5;
-
-    const query = `
-        // 1. Başlangıç durağından geçen bir hat (hat1) bul
-        MATCH (startDurak:Durak)-[r1:GÜZERGAH_ÜZERINDE]->(hat1:Hat)
-        WHERE startDurak.stop_id IN $startStopIds
-
-        // 2. Bitiş durağından geçen bir hat (hat2) bul (hat1 ile aynı olmamalı)
-        MATCH (endDurak:Durak)-[r2:GÜZERGAH_ÜZERINDE]->(hat2:Hat)
-        WHERE endDurak.stop_id IN $endStopIds AND hat1 <> hat2
-
-        // 3. Bu iki hattın kesiştiği bir aktarma durağı bul
-        MATCH (hat1)<-[r_aktarma1:GÜZERGAH_ÜZERINDE]-(aktarmaDuragi:Durak)-[r_aktarma2:GÜZERGAH_ÜZERINDE]->(hat2)
-
-        // 4. Durak sıralamalarını kontrol et
-        // Başlangıç durağı, aktarma durağından önce gelmeli (hat1 üzerinde)
-        WHERE r1.sıra < r_aktarma1.sıra
-        // Aktarma durağı, bitiş durağından önce gelmeli (hat2 üzerinde)
-          AND r_aktarma2.sıra < r2.sıra
-
-        // 5. Rota bilgilerini ve segmentlerini topla
-        // İlk bacak (başlangıç -> aktarma)
-        MATCH (hat1)<-[r_segment1:GÜZERGAH_ÜZERINDE]-(segment1Durak:Durak)
-        WHERE r_segment1.sıra >= r1.sıra AND r_segment1.sıra <= r_aktarma1.sıra
-        
-        // İkinci bacak (aktarma -> bitiş)
-        MATCH (hat2)<-[r_segment2:GÜZERGAH_ÜZERINDE]-(segment2Durak:Durak)
-        WHERE r_segment2.sıra >= r_aktarma2.sıra AND r_segment2.sıra <= r2.sıra
-
-        WITH startDurak, endDurak, aktarmaDuragi, hat1, hat2,
-             r1.sıra AS startSira1, r_aktarma1.sıra AS endSira1,
-             r_aktarma2.sıra AS startSira2, r2.sıra AS endSira2,
-             COLLECT(DISTINCT {durak: segment1Durak, sira: r_segment1.sıra}) AS segment1Data,
-             COLLECT(DISTINCT {durak: segment2Durak, sira: r_segment2.sıra}) AS segment2Data
-
-        RETURN startDurak, endDurak, aktarmaDuragi, hat1, hat2,
-               (endSira1 - startSira1) AS durakSayisi1,
-               (endSira2 - startSira2) AS durakSayisi2,
-               segment1Data,
-               segment2Data
-        LIMIT 15 // Olası kombinasyonları sınırla
-    `;
-
-    const result = await session.run(query, { startStopIds, endStopIds });
-    
-    if (result.records.length === 0) {
-        return [];
-    }
-    
-    const allTransferRoutes = [];
-    for (const record of result.records) {
-        const startDurak = record.get('startDurak').properties;
-        const endDurak = record.get('endDurak').properties;
-        const aktarmaDuragi = record.get('aktarmaDuragi').properties;
-        const hat1 = record.get('hat1').properties;
-        const hat2 = record.get('hat2').properties;
-        
-        // Her iki otobüs bacağı için de yol geometrilerini ve mesafelerini hesapla
-        const fullShape1 = await getShapeFor(session, hat1.route_id);
-        const shape1 = sliceShape(fullShape1, startDurak, aktarmaDuragi);
-        const busDistance1 = calculateShapeDistance(shape1);
-        const busDuration1 = busDistance1 / 400; // Ortalama hız 24km/s (400m/dk)
-        
-        const fullShape2 = await getShapeFor(session, hat2.route_id);
-        const shape2 = sliceShape(fullShape2, aktarmaDuragi, endDurak);
-        const busDistance2 = calculateShapeDistance(shape2);
-        const busDuration2 = busDistance2 / 400; // Ortalama hız 24km/s (400m/dk)
-
-        // Segment verilerini al ve sıraya diz
-        const segment1Stops = record.get('segment1Data').sort((a,b) => a.sira.toNumber() - b.sira.toNumber()).map(d => d.durak.properties);
-        const segment2Stops = record.get('segment2Data').sort((a,b) => a.sira.toNumber() - b.sira.toNumber()).map(d => d.durak.properties);
-
-        const initialWalk = startStops.find(s => s.stop.stop_id === startDurak.stop_id);
-        const finalWalk = endStops.find(s => s.stop.stop_id === endDurak.stop_id);
-        const initialWalkDuration = initialWalk.distance / 80;
-        const finalWalkDuration = finalWalk.distance / 80;
-
-        // 1. İlk otobüs için varış zamanını hesapla
-        const arrivalInfo1 = await getBusArrivalTime(session, hat1.route_id, startDurak, departureTime, initialWalk.distance);
-        if (!arrivalInfo1) continue; // İlk hatta servis yoksa bu rotayı atla
-
-        // 2. Kullanıcının aktarma durağına varış zamanını hesapla (dakika cinsinden)
-        const timeInMinutesAtStartOfJourney = getTimeInMinutesFromDate(departureTime);
-        const timeOfArrivalAtTransferStop = timeInMinutesAtStartOfJourney + initialWalkDuration + arrivalInfo1.waitTime + busDuration1;
-        
-        // Aktarma durağına varış zamanını Date objesine çevir
-        const departureTimeForSecondBus = new Date(departureTime);
-        departureTimeForSecondBus.setHours(0, 0, 0, 0); // Günü sıfırla
-        departureTimeForSecondBus.setMinutes(timeOfArrivalAtTransferStop); // Yeni dakikayı ayarla
-
-        // 3. İkinci otobüs için varış zamanını hesapla (yürüme mesafesi 0)
-        const arrivalInfo2 = await getBusArrivalTime(session, hat2.route_id, aktarmaDuragi, departureTimeForSecondBus, 0);
-        if (!arrivalInfo2) continue; // İkinci hatta servis yoksa bu rotayı atla
-
-        // 4. Adımları oluştur
-        const steps = [
-            { type: 'WALK', from: 'Başlangıç Noktanız', to: startDurak.name, duration: initialWalkDuration, distance: initialWalk.distance },
-            { type: 'BUS', line: hat1.route_number, from: startDurak.name, to: aktarmaDuragi.name, stops: segment1Stops.map(s => s.name), shape: shape1, duration: busDuration1, distance: busDistance1 },
-            { 
-                type: 'TRANSFER', 
-                text: `${aktarmaDuragi.name} durağında ${hat2.route_number} hattına aktarma yapın.`,
-                duration: arrivalInfo2.waitTime, // Gerçek bekleme süresi
-                arrivalInfo: arrivalInfo2 // Tahmini biniş bilgisini frontend'e gönder
-            },
-            { type: 'BUS', line: hat2.route_number, from: aktarmaDuragi.name, to: endDurak.name, stops: segment2Stops.map(s => s.name), shape: shape2, duration: busDuration2, distance: busDistance2 },
-            { type: 'WALK', from: endDurak.name, to: 'Varış Noktanız', duration: finalWalkDuration, distance: finalWalk.distance }
-        ];
-
-        const total_walk_duration = steps.filter(s => s.type === 'WALK').reduce((sum, step) => sum + step.duration, 0);
-
-        // 5. Toplam süreyi yeniden hesapla
-        const total_duration = initialWalkDuration + arrivalInfo1.waitTime + busDuration1 + arrivalInfo2.waitTime + busDuration2 + finalWalkDuration + TRANSFER_PENALTY;
-
-        allTransferRoutes.push({
-            total_duration,
-            steps,
-            arrivalInfo: arrivalInfo1, // Ana varış bilgisi ilk otobüs için
-            total_walk_duration: Math.round(total_walk_duration),
-            unique_path_id: `TRANSFER-${hat1.route_number}-${hat2.route_number}`
-        });
-    }
-    return allTransferRoutes;
+    return {
+        total_duration,
+        steps,
+        arrivalInfo, // Ana varış bilgisi ilk otobüs için
+        total_walk_duration: Math.round(total_walk_duration),
+        unique_path_id: `${kind}-${lines.join('-')}`
+    };
 };
 
 // YENİ ALGORİTMA: Rota Adımlarını Hesaplayan ve Birleştiren Ana Fonksiyon
 const calculateRouteFromSegments = (startStop, endStop, segments) => {
     // TODO: Veritabanından gelen segmentlere göre adımları (WALK, BUS, TRANSFER) oluşturan mantık yazılacak.
-    // Bu fonksiyon, findDirectRoutes ve findOneTransferRoutes tarafından kullanılabilir.
+    // Bu fonksiyon, buildRouteOption tarafından kullanılabilir.
     // Toplam süreyi de hesaplamalı.
     return {
         total_duration: 0,
@@ -512,10 +374,13 @@ exports.findRoute = async (req, res) => {
             return res.status(404).json({ error: 'Başlangıç veya bitiş noktasına yakın durak bulunamadı.' });
         }
         
-        const directRoutes = await findDirectRoutes(session, startStops, endStops, desiredDepartureTime);
-        const oneTransferRoutes = await findOneTransferRoutes(session, startStops, endStops, desiredDepartureTime);
-
-        let allRoutes = [...directRoutes, ...oneTransferRoutes];
+        // Tüm aday durak çiftleri için tek süre ağırlıklı arama (aktarma grafı gerekir)
+        const paths = await findWeightedPaths(session, startStops, endStops, 10);
+        const allRoutes = [];
+        for (const path of paths) {
+            const route = await buildRouteOption(session, path, desiredDepartureTime);
+            if (route) allRoutes.push(route);
+        }
 
         if (allRoutes.length === 0) {
             return res.status(404).json({ error: 'Bu iki nokta arasında toplu taşıma rotası bulunamadı.' });
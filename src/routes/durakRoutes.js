@@ -17,6 +17,9 @@ router.get('/:id', durakController.durakGetir);
 // Bir durağa yaklaşan hatları getir
 router.get('/:id/yaklasan-hatlar', durakController.getYaklasanHatlar);
 
+// Bir durağa en yakın durakları getir
+router.get('/:id/komsular', durakController.getDurakKomsulari);
+
 // Bir durağın üzerinden geçen hatları getir (DurakDetay sayfası için)
 router.get('/:id/hatlar', durakController.durakHatlariniGetir);
 
@@ -0,0 +1,47 @@
+const { int } = require('neo4j-driver');
+
+// Bir noktaya yakın durak aramaları. veri_yukle.py her yüklemede d.konum POINT özelliğini ve
+// indeksini yazar; bu özellik yokken yüklenmiş eski veritabanlarında d.lat / d.lon taranır
+
+// d.konum üzerindeki POINT indeksiyle maxDistance metre içindeki en yakın limit durak: [{ stop, distance }]
+const findStopsByLocation = async (session, lat, lon, maxDistance, limit) => {
+  const result = await session.run(
+    `MATCH (d:Durak)
+     WHERE point.distance(d.konum, point({latitude: $lat, longitude: $lon})) <= $maxDistance
+     WITH d, point.distance(d.konum, point({latitude: $lat, longitude: $lon})) AS distance
+     RETURN d, distance
+     ORDER BY distance
+     LIMIT $limit`,
+    { lat, lon, maxDistance, limit: int(limit) }
+  );
+  return result.records.map(record => ({ stop: record.get('d').properties, distance: record.get('distance') }));
+};
+
+// Tüm durakları lat/lon ile tarar; maxDistance null ise mesafe sınırı uygulanmaz
+const scanStopsByCoordinates = async (session, lat, lon, maxDistance, limit) => {
+  const result = await session.run(
+    `MATCH (d:Durak)
+     WHERE d.lat IS NOT NULL AND d.lon IS NOT NULL
+     WITH d, point.distance(point({latitude: $lat, longitude: $lon}),
+                            point({latitude: d.lat, longitude: d.lon})) AS distance
+     WHERE $maxDistance IS NULL OR distance <= $maxDistance
+     RETURN d, distance
+     ORDER BY distance
+     LIMIT $limit`,
+    { lat, lon, maxDistance, limit: int(limit) }
+  );
+  return result.records.map(record => ({ stop: record.get('d').properties, distance: record.get('distance') }));
+};
+
+// maxDistance metre içindeki en yakın limit durak; konum indeksi hiç sonuç vermezse
+// (d.konum'suz eski veritabanı) koordinat taramasına döner
+const findStopsNear = async (session, lat, lon, maxDistance, limit) => {
+  const stops = await findStopsByLocation(session, lat, lon, maxDistance, limit);
+  if (stops.length > 0) return stops;
+  return scanStopsByCoordinates(session, lat, lon, maxDistance, limit);
+};
+
+module.exports = {
+  findStopsNear,
+  scanStopsByCoordinates
+};
@@ -0,0 +1,23 @@
+// veri_yukle.py --route-documents ile Hat düğümlerine yazılan okuma modellerini getir.
+// Dönen nesne route_id -> belge; okuma modeli olmayan hatlar nesnede yer almaz
+const getRouteDocuments = async (session, routeIds) => {
+  const result = await session.run(
+    `MATCH (h:Hat)
+     WHERE h.route_id IN $routeIds AND h.okuma_modeli IS NOT NULL
+     RETURN h.route_id as route_id, h.okuma_modeli as belge`,
+    { routeIds }
+  );
+  const documents = {};
+  result.records.forEach(record => {
+    documents[record.get('route_id')] = JSON.parse(record.get('belge'));
+  });
+  return documents;
+};
+
+// Karşı yöndeki hattın id'si: son hane yönü belirtir (0 gidiş, 1 dönüş)
+const pairedRouteId = (routeId) => routeId.slice(0, -1) + (routeId.endsWith('0') ? '1' : '0');
+
+module.exports = {
+  getRouteDocuments,
+  pairedRouteId
+};
@@ -0,0 +1,182 @@
+// Süre ağırlıklı rota araması: veri_yukle.py --transfer-graph ile SONRAKI_DURAK'a (toplu modelde
+// DURAK_BAGLANTISI'na) yazılan otobüs süreleri ve AKTARMA yürüme kenarları üzerinde tek bir
+// sorguda, aday başlangıç/bitiş durağı çiftleri için apoc.algo.dijkstra. Arama durak grafında
+// yapılır; hatlar bulunan durak dizisine sonradan, aktarma sayısı en az olacak şekilde atanır.
+// rotaController.findRoute ve durakController.noktalarArasiRotaBul bu aramayı kullanır
+const { int } = require('neo4j-driver');
+
+// Kenar modeli yalnızca yükleme sırasında değişir; her istekte saymak yerine bu süre boyunca saklanır
+const EDGE_MODEL_TTL_MS = 5 * 60 * 1000;
+const WALK_SPEED_M_MIN = 80;
+
+let edgeModelCache = null;
+
+// Hangi kenar modelinin yüklendiğini döner: veri_yukle.py --edge-model aggregated ile yalnızca
+// durak çifti başına DURAK_BAGLANTISI, per-route ile hat başına SONRAKI_DURAK yazılır
+const getEdgeModel = async (session) => {
+  if (edgeModelCache && Date.now() - edgeModelCache.loadedAt < EDGE_MODEL_TTL_MS) {
+    return edgeModelCache.model;
+  }
+  const result = await session.run(`
+    CALL { MATCH ()-[r:DURAK_BAGLANTISI]->() RETURN count(r) AS aggregated }
+    CALL { MATCH ()-[r:AKTARMA]->() RETURN count(r) AS transfers }
+    RETURN aggregated, transfers
+  `);
+  const record = result.records[0];
+  const model = {
+    aggregated: record.get('aggregated').toNumber() > 0,
+    transfers: record.get('transfers').toNumber() > 0
+  };
+  edgeModelCache = { model, loadedAt: Date.now() };
+  return model;
+};
+
+let searchWarned = false;
+const warnSearch = (message) => {
+  if (!searchWarned) {
+    console.warn(`Ağırlıklı rota araması kullanılamıyor: ${message}`);
+    searchWarned = true;
+  }
+};
+
+// Kenarın iki durağı arasında çalışan hatlar: [{ line, routeId }]. DURAK_BAGLANTISI kendi
+// dizilerini taşır; SONRAKI_DURAK'ta aynı çiftteki paralel kenarlar sorguyla birlikte gelir
+const segmentCandidates = (properties, parallel = []) => {
+  const candidates = [];
+  const add = (line, routeId) => {
+    if (routeId !== undefined && routeId !== null && !candidates.some(c => c.routeId === routeId)) {
+      candidates.push({ line, routeId });
+    }
+  };
+  (properties.hat_idler || []).forEach((routeId, k) => add((properties.hatlar || [])[k], routeId));
+  add(properties.hat, properties.hat_id);
+  parallel.forEach(p => add(p.hat, p.hat_id));
+  return candidates;
+};
+
+// Her otobüs kenarına bir hat seç (yürüme kenarları null). Mevcut hat kenarda çalışıyorsa
+// ona devam edilir; edilemiyorsa sonraki kenarlarda en uzun süren aday seçilir. Böylece
+// paralel kenarlar sahte aktarma üretmez ve bu durak dizisi için aktarma sayısı en azdır
+const assignLines = (candidates) => {
+  const chosen = new Array(candidates.length).fill(null);
+  let current = null;
+  for (let i = 0; i < candidates.length; i++) {
+    const options = candidates[i];
+    if (!options || options.length === 0) {
+      current = null;
+      continue;
+    }
+    let pick = current && options.find(option => option.routeId === current.routeId);
+    if (!pick) {
+      let reach = -1;
+      for (const option of options) {
+        let j = i + 1;
+        while (j < candidates.length && candidates[j] && candidates[j].some(c => c.routeId === option.routeId)) j++;
+        if (j > reach) {
+          reach = j;
+          pick = option;
+        }
+      }
+    }
+    chosen[i] = pick;
+    current = pick;
+  }
+  return chosen;
+};
+
+// Yolun kenarlarını bacaklara ayır: aynı hatta süren otobüs kenarları tek BUS bacağında
+// birleşir, AKTARMA kenarları WALK bacağı olur. from/to durak dizisindeki konumlardır
+const pathLegs = (segments, parallelLines) => {
+  const candidates = segments.map((segment, i) =>
+    segment.type === 'AKTARMA' ? null : segmentCandidates(segment.properties, parallelLines[i]));
+  const lines = assignLines(candidates);
+  const legs = [];
+  segments.forEach((segment, i) => {
+    const properties = segment.properties;
+    const duration = Number(properties.sure) || 0;
+    const distance = Number(properties.mesafe) || 0;
+    const last = legs[legs.length - 1];
+    if (segment.type === 'AKTARMA') {
+      legs.push({ type: 'WALK', from: i, to: i + 1, duration, distance });
+    } else if (last && last.type === 'BUS' && lines[i] && last.routeId === lines[i].routeId) {
+      last.to = i + 1;
+      last.duration += duration;
+      last.distance += distance;
+    } else {
+      legs.push({ type: 'BUS', line: lines[i] && lines[i].line, routeId: lines[i] && lines[i].routeId,
+                  from: i, to: i + 1, duration, distance });
+    }
+  });
+  return legs;
+};
+
+// Aday başlangıç ve bitiş durakları ([{ stop, distance }]) arasındaki en hızlı limit yol.
+// Her sonuç: { start, end, stops, legs, transfers }; aktarma grafı ya da APOC yoksa boş liste
+const findWeightedPaths = async (session, startStops, endStops, limit = 5) => {
+  const { aggregated, transfers } = await getEdgeModel(session);
+  if (!transfers) {
+    warnSearch('AKTARMA kenarı yok (veri_yukle.py --transfer-graph ile oluşturun).');
+    return [];
+  }
+  const relationshipTypes = aggregated ? 'DURAK_BAGLANTISI>|AKTARMA' : 'SONRAKI_DURAK>|AKTARMA';
+
+  const pairs = [];
+  for (const start of startStops) {
+    for (const end of endStops) {
+      if (start.stop.stop_id !== end.stop.stop_id) {
+        pairs.push({ fromId: start.stop.stop_id, toId: end.stop.stop_id,
+                     walk: (start.distance + end.distance) / WALK_SPEED_M_MIN });
+      }
+    }
+  }
+  if (pairs.length === 0) return [];
+
+  let result;
+  try {
+    result = await session.run(
+      `UNWIND $pairs AS pair
+       MATCH (a:Durak {stop_id: pair.fromId}), (b:Durak {stop_id: pair.toId})
+       CALL apoc.algo.dijkstra(a, b, $relationshipTypes, 'sure', 1.0) YIELD path, weight
+       WITH pair, path, weight
+       ORDER BY weight + pair.walk
+       LIMIT $limit
+       CALL {
+         WITH path
+         WITH nodes(path) AS stops, relationships(path) AS segments
+         UNWIND range(0, size(segments) - 1) AS i
+         WITH i, stops[i] AS s1, stops[i + 1] AS s2
+         WITH i, [(s1)-[p:SONRAKI_DURAK]->(s2) | {hat: p.hat, hat_id: p.hat_id}] AS parallel
+         ORDER BY i
+         RETURN collect(parallel) AS parallelLines
+       }
+       RETURN pair.fromId AS fromId, pair.toId AS toId, nodes(path) AS stops,
+              relationships(path) AS segments, parallelLines`,
+      { pairs, relationshipTypes, limit: int(limit) }
+    );
+  } catch (error) {
+    warnSearch(error.message);
+    return [];
+  }
+
+  const paths = [];
+  for (const record of result.records) {
+    const segments = record.get('segments');
+    if (segments.length === 0) continue;
+    const legs = pathLegs(segments, record.get('parallelLines'));
+    paths.push({
+      start: startStops.find(s => s.stop.stop_id === record.get('fromId')),
+      end: endStops.find(s => s.stop.stop_id === record.get('toId')),
+      stops: record.get('stops').map(s => s.properties),
+      legs,
+      transfers: Math.max(0, legs.filter(leg => leg.type === 'BUS').length - 1)
+    });
+  }
+  return paths;
+};
+
+module.exports = {
+  getEdgeModel,
+  segmentCandidates,
+  assignLines,
+  findWeightedPaths
+};
@@ -0,0 +1,59 @@
+// Google "encoded polyline" biçimindeki string'i [enlem, boylam] dizisine çevir
+const decodePolyline = (encoded, precision = 5) => {
+  const factor = Math.pow(10, precision);
+  const points = [];
+  let index = 0;
+  let lat = 0;
+  let lng = 0;
+
+  while (index < encoded.length) {
+    const deltas = [];
+    for (let k = 0; k < 2; k++) {
+      let result = 0;
+      let shift = 0;
+      let byte;
+      do {
+        byte = encoded.charCodeAt(index++) - 63;
+        result |= (byte & 0x1f) << shift;
+        shift += 5;
+      } while (byte >= 0x20);
+      deltas.push(result & 1 ? ~(result >> 1) : result >> 1);
+    }
+    lat += deltas[0];
+    lng += deltas[1];
+    points.push([lat / factor, lng / factor]);
+  }
+
+  return points;
+};
+
+// Kompakt Shape düğümünün noktalarını [enlem, boylam] dizisi olarak döndür
+const compactShapePoints = (shape) => {
+  if (!shape) return [];
+  if (shape.polyline) return decodePolyline(shape.polyline);
+  if (shape.lats && shape.lngs) return shape.lats.map((lat, i) => [lat, shape.lngs[i]]);
+  return [];
+};
+
+// Hatta bağlı kompakt Shape varsa noktalarını getir (veri_yukle.py --shape-mode compact)
+const getCompactShape = async (session, routeId) => {
+  const result = await session.run(
+    `MATCH (h:Hat {route_id: $routeId})-[:SHAPE_ICERIYOR]->(s:Shape)
+     RETURN s.lats as lats, s.lngs as lngs, s.polyline as polyline
+     LIMIT 1`,
+    { routeId }
+  );
+  if (result.records.length === 0) return [];
+  const record = result.records[0];
+  return compactShapePoints({
+    lats: record.get('lats'),
+    lngs: record.get('lngs'),
+    polyline: record.get('polyline')
+  });
+};
+
+module.exports = {
+  decodePolyline,
+  compactShapePoints,
+  getCompactShape
+};
@@ -0,0 +1,133 @@
+const fs = require('fs');
+const path = require('path');
+
+// veri_yukle.py --stop-index ile yazılan durak -> (hat, sıra) ters indeksi.
+// Dosya düzeni için veri_yukle.write_stop_route_index'e bakın; uint32 dizileri little-endian
+const INDEX_PATH = process.env.DURAK_HAT_INDEKSI || path.join(__dirname, '../../veri/durak_hat_indeksi.bin');
+const SIGNATURE = 0x58494844; // "DHIX"
+const VERSION = 1;
+const HEADER_WORDS = 8;
+const UNKNOWN_STOP = 0xFFFFFFFF;
+
+let cached = null;
+
+// Dosyayı bir kez oku ve bölümleri kopyalamadan Uint32Array görünümleri olarak aç;
+// dosya yeniden yazılırsa (mtime değişirse) yeniden yüklenir, yoksa null döner
+const loadStopIndex = (filePath = INDEX_PATH) => {
+  let stat;
+  try {
+    stat = fs.statSync(filePath);
+  } catch (error) {
+    return null;
+  }
+  if (cached && cached.filePath === filePath && cached.mtimeMs === stat.mtimeMs) {
+    return cached.index;
+  }
+
+  let buffer = fs.readFileSync(filePath);
+  if (buffer.byteOffset % 4 !== 0) {
+    buffer = Buffer.from(buffer);
+  }
+  const header = new Uint32Array(buffer.buffer, buffer.byteOffset, HEADER_WORDS);
+  if (header[0] !== SIGNATURE || header[1] !== VERSION) {
+    console.error(`Durak-hat indeksi tanınmadı: ${filePath}`);
+    return null;
+  }
+  const [, , stopCount, routeCount, entryCount, routeStopCount, textLength] = header;
+
+  let offset = buffer.byteOffset + HEADER_WORDS * 4;
+  const section = (length) => {
+    const view = new Uint32Array(buffer.buffer, offset, length);
+    offset += length * 4;
+    return view;
+  };
+  const stopOffsets = section(stopCount + 1);
+  const entryRoutes = section(entryCount);
+  const entrySequences = section(entryCount);
+  const routeOffsets = section(routeCount + 1);
+  const routeStops = section(routeStopCount);
+  const text = JSON.parse(buffer.toString('utf8', offset - buffer.byteOffset, offset - buffer.byteOffset + textLength));
+
+  const index = {
+    stopOffsets,
+    entryRoutes,
+    entrySequences,
+    routeOffsets,
+    routeStops,
+    stopIds: text.stops,
+    routes: text.routes.map(([routeId, routeNumber, routeName, direction]) => ({ routeId, routeNumber, routeName, direction })),
+    stopPositions: new Map(text.stops.map((stopId, i) => [stopId, i])),
+    routePositions: new Map(text.routes.map(([routeId], i) => [routeId, i]))
+  };
+  cached = { filePath, mtimeMs: stat.mtimeMs, index };
+  console.log(`Durak-hat indeksi yüklendi: ${stopCount} durak, ${routeCount} hat, ${entryCount} girdi`);
+  return index;
+};
+
+// A'dan B'ye aynı yönde giden hatlar: iki durağın hat sırasına göre sıralı girdi listelerinin
+// kesişimi. Bir hat durağa birden fazla uğruyorsa en az duraklı (A önce, B sonra) çift alınır.
+// Sonuç GÜZERGAH_ÜZERINDE sorgusundaki gibi durak farkına göre artan sıralıdır
+const directConnections = (index, fromStopId, toStopId) => {
+  const from = index.stopPositions.get(fromStopId);
+  const to = index.stopPositions.get(toStopId);
+  if (from === undefined || to === undefined) return [];
+
+  const { stopOffsets, entryRoutes, entrySequences } = index;
+  let i = stopOffsets[from];
+  let j = stopOffsets[to];
+  const iEnd = stopOffsets[from + 1];
+  const jEnd = stopOffsets[to + 1];
+  const connections = [];
+
+  while (i < iEnd && j < jEnd) {
+    const route = entryRoutes[i];
+    if (route < entryRoutes[j]) {
+      i++;
+    } else if (route > entryRoutes[j]) {
+      j++;
+    } else {
+      let iGroupEnd = i;
+      let jGroupEnd = j;
+      while (iGroupEnd < iEnd && entryRoutes[iGroupEnd] === route) iGroupEnd++;
+      while (jGroupEnd < jEnd && entryRoutes[jGroupEnd] === route) jGroupEnd++;
+
+      let best = null;
+      for (let p = i; p < iGroupEnd; p++) {
+        for (let q = j; q < jGroupEnd; q++) {
+          const gap = entrySequences[q] - entrySequences[p];
+          if (entrySequences[p] < entrySequences[q] && (!best || gap < best.durakFarki)) {
+            best = { fromSequence: entrySequences[p], toSequence: entrySequences[q], durakFarki: gap };
+          }
+        }
+      }
+      if (best) {
+        const { routeId, routeNumber, routeName, direction } = index.routes[route];
+        connections.push({ hatId: routeId, hatNo: routeNumber, hatAdi: routeName, yon: direction, ...best });
+      }
+      i = iGroupEnd;
+      j = jGroupEnd;
+    }
+  }
+  return connections.sort((a, b) => a.durakFarki - b.durakFarki);
+};
+
+// Hattın stops.txt'de bulunan durakları sırayla: [{ stopId, sira }]; hat yoksa null.
+// direction verilirse GÜZERGAH_ÜZERINDE {yön} eşleşmesindeki gibi hattın yönü de tutmalı, tutmazsa []
+const routeStopSequence = (index, routeId, direction) => {
+  const route = index.routePositions.get(routeId);
+  if (route === undefined) return null;
+  if (direction !== undefined && direction !== null && index.routes[route].direction !== direction) return [];
+  const stops = [];
+  for (let k = index.routeOffsets[route]; k < index.routeOffsets[route + 1]; k++) {
+    if (index.routeStops[k] !== UNKNOWN_STOP) {
+      stops.push({ stopId: index.stopIds[index.routeStops[k]], sira: k - index.routeOffsets[route] });
+    }
+  }
+  return stops;
+};
+
+module.exports = {
+  loadStopIndex,
+  directConnections,
+  routeStopSequence
+};
@@ -63,6 +63,36 @@ const getTimeInMinutesFromDate = (date) => {
   return date.getHours() * 60 + date.getMinutes();
 };
 
+// Neo4j'den gelen tamsayı listesini (Integer nesneleri) sayı dizisine çevir
+const toMinuteList = (list) => {
+  if (!Array.isArray(list)) return null;
+  return list.map(value => (typeof value === 'number' ? value : value.toNumber()));
+};
+
+// Sıralı dizide value'dan büyük ilk elemanın indeksi (ikili arama)
+const upperBound = (sorted, value) => {
+  let low = 0;
+  let high = sorted.length;
+  while (low < high) {
+    const mid = (low + high) >> 1;
+    if (sorted[mid] <= value) low = mid + 1;
+    else high = mid;
+  }
+  return low;
+};
+
+// veri_yukle.py'nin yazdığı sıralı dakika dizisinde (weekday_dk vb.), travel dakika sonra
+// now'dan sonra durağa varan ilk kalkış. 1440 ve üzeri değerler gece yarısını geçen
+// seferlerdir; gece yarısından sonra dünkü çizelgenin bu seferleri de hesaba katılır.
+const nextDeparture = (sorted, now, travel = 0) => {
+  const candidates = [];
+  const today = upperBound(sorted, now - travel);
+  if (today < sorted.length) candidates.push(sorted[today]);
+  const yesterday = upperBound(sorted, now + 1440 - travel);
+  if (yesterday < sorted.length) candidates.push(sorted[yesterday] - 1440);
+  return candidates.length > 0 ? Math.min(...candidates) : null;
+};
+
 module.exports = {
   getCurrentTime,
   getDayType,
@@ -71,5 +101,7 @@ module.exports = {
   formatTime,
   formatDuration,
   getCurrentTimeInMinutes,
-  getTimeInMinutesFromDate
+  getTimeInMinutesFromDate,
+  toMinuteList,
+  nextDeparture
 }; 
\ No newline at end of file
@@ -0,0 +1,387 @@
+import asyncio
+import os
+import random
+import sys
+
+import pytest
+
+# veri_yukle modül düzeyinde neo4j sürücüsünü içe aktarır
+pytest.importorskip("neo4j")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import veri_yukle  # noqa: E402
+from veri_yukle_benchmark import KayitYapanSurucu  # noqa: E402
+from veri_yukle import _GridIndex, _douglas_peucker, _encode_polyline, _group_shapes, _haversine, _parse_times  # noqa: E402
+
+
+def _brute_nearest(points, lat, lon, k, max_radius=None):
+    distances = sorted((_haversine(lat, lon, p_lat, p_lon), i) for i, (_, p_lat, p_lon) in enumerate(points))
+    return [(i, d) for d, i in distances if max_radius is None or d <= max_radius][:k]
+
+
+@pytest.fixture(scope='module')
+def izmit_points():
+    rng = random.Random(42)
+    return [(f's{i}', 40.70 + rng.random() * 0.2, 29.80 + rng.random() * 0.3) for i in range(2000)]
+
+
+class _SorguKaydi(KayitYapanSurucu):
+    # Sayaçların yanında gönderilen her sorguyu parametreleriyle saklar
+    def reset(self):
+        super().reset()
+        self.calls = []
+
+    def record(self, query, parameters):
+        super().record(query, parameters)
+        with self._lock:
+            self.calls.append((query, parameters))
+
+    def rows(self, query):
+        return [row for sent, parameters in self.calls if sent == query for row in parameters.get('rows', ())]
+
+
+@pytest.fixture
+def recorded_db():
+    driver = _SorguKaydi()
+    db = veri_yukle.Neo4jDatabase(None, None, None, driver=driver)
+    yield db, driver
+    db.close()
+
+
+class _AsyncSurucu:
+    # Async yükleyici için yazılan satırları saklayan sürücü; fail_on içindeki stop_id'leri
+    # taşıyan parçalar verilen hatayla reddedilir
+    def __init__(self, fail_on=(), error=ValueError):
+        self.rows = []
+        self.fail_on = set(fail_on)
+        self.error = error
+
+    def session(self, **kwargs):
+        return _AsyncOturum(self)
+
+    async def close(self):
+        pass
+
+
+class _AsyncOturum:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute_write(self, work, *args):
+        return await work(self, *args)
+
+    async def run(self, query, rows=()):
+        if self.driver.fail_on.intersection(row['stop_id'] for row in rows):
+            raise self.driver.error("reddedildi")
+        await asyncio.sleep(0)
+        self.driver.rows.extend(rows)
+        return self
+
+    async def consume(self):
+        pass
+
+
+# _parse_times
+
+def test_parse_times_sorts_and_deduplicates():
+    assert _parse_times("06:00 06:00 06:10 07:30") == ([360, 370, 450], 0, 0)
+
+
+def test_parse_times_midnight_rollover():
+    minutes, malformed, reordered = _parse_times("22:30 23:00 23:30 00:00 00:30")
+    assert minutes == [1350, 1380, 1410, 1440, 1470]
+    assert (malformed, reordered) == (0, 0)
+
+
+def test_parse_times_explicit_after_midnight_values_keep_rolling():
+    assert _parse_times("23:40 24:10 00:40") == ([1420, 1450, 1480], 0, 0)
+
+
+def test_parse_times_sorts_in_midday_out_of_order_times():
+    # 412 cumartesi çizelgesindeki gibi gün ortasında sırası bozuk seferler atılmaz
+    assert _parse_times("07:55 08:25 08:10 08:40") == ([475, 490, 505, 520], 0, 1)
+    assert _parse_times("09:00 10:00 09:30 09:45 11:00") == ([540, 570, 585, 600, 660], 0, 2)
+
+
+def test_parse_times_morning_time_between_evening_trips_is_not_rolled():
+    # 417011 hafta içi: akşam seferlerinin arasındaki 05:52 ertesi güne kaydırılmaz,
+    # sonraki seferler de kaymaz
+    minutes, malformed, reordered = _parse_times("19:15 19:42 05:52 20:08 23:50 00:20")
+    assert minutes == [352, 1155, 1182, 1208, 1430, 1460]
+    assert (malformed, reordered) == (0, 1)
+
+
+def test_parse_times_drops_values_past_the_next_day():
+    minutes, malformed, reordered = _parse_times("23:00 24:30 47:59 00:10")
+    assert minutes == [1380, 1450, 1470, 2879]
+    assert (malformed, reordered) == (0, 1)
+    # Gece yarısından sonra gelen 24:xx biçimindeki saat 2880'i aşamaz
+    assert _parse_times("23:00 00:30 24:40 47:59") == ([1380, 1470, 1480, 2879], 0, 0)
+
+
+def test_parse_times_counts_malformed_tokens():
+    assert _parse_times("7:5x 48:00 06:60 :30 08:00") == ([480], 4, 0)
+    assert _parse_times("") == ([], 0, 0)
+
+
+def test_schedule_writer_sends_sorted_minute_arrays(tmp_path, recorded_db):
+    db, driver = recorded_db
+    (tmp_path / 'schedules.txt').write_text(
+        "route_id,weekday_times,saturday_times,sunday_times\n"
+        "4120,06:00 07:55 08:25 08:10 23:40 00:10,07:00 x:10 07:30,\n", encoding='utf-8')
+    driver.reset()
+    assert db.import_schedules_batched(str(tmp_path / 'schedules.txt'), 100) == 1
+
+    [row] = driver.rows(veri_yukle.CIZELGE_SORGUSU)
+    assert row['route_id'] == '4120'
+    assert row['weekday_dk'] == [360, 475, 490, 505, 1420, 1450]
+    assert row['saturday_dk'] == [420, 450]
+    assert row['sunday_dk'] == []
+    # Ham dizgeler API uyumluluğu için olduğu gibi gider
+    assert row['weekday_times'] == "06:00 07:55 08:25 08:10 23:40 00:10"
+
+
+# _GridIndex
+
+def test_nearest_matches_brute_force(izmit_points):
+    grid = _GridIndex(izmit_points, 250)
+    rng = random.Random(7)
+    for _ in range(100):
+        lat, lon = 40.68 + rng.random() * 0.24, 29.78 + rng.random() * 0.34
+        found = grid.nearest(lat, lon, 5)
+        expected = _brute_nearest(izmit_points, lat, lon, 5)
+        assert [i for i, _ in found] == [i for i, _ in expected]
+
+
+def test_nearest_respects_exclude(izmit_points):
+    grid = _GridIndex(izmit_points, 250)
+    _, lat, lon = izmit_points[10]
+    found = grid.nearest(lat, lon, 3, exclude=10)
+    assert 10 not in [i for i, _ in found]
+    assert len(found) == 3
+
+
+@pytest.mark.parametrize('lat, lon', [(0.0, 0.0), (41.0, 35.0)])
+def test_nearest_far_query_is_bounded(izmit_points, lat, lon):
+    grid = _GridIndex(izmit_points, 100)
+    assert grid.nearest(lat, lon, 3, max_radius=veri_yukle.EN_UZAK_IZDUSUM_M) == []
+    # Sınırsız sorgu da boş halkaları atlayarak en yakın noktaları bulur
+    found = grid.nearest(lat, lon, 3)
+    assert [i for i, _ in found] == [i for i, _ in _brute_nearest(izmit_points, lat, lon, 3)]
+
+
+def test_nearest_max_radius_truncates(izmit_points):
+    grid = _GridIndex(izmit_points, 250)
+    _, lat, lon = izmit_points[0]
+    found = grid.nearest(lat, lon, 50, max_radius=300)
+    assert found == _brute_nearest(izmit_points, lat, lon, 50, max_radius=300)
+    assert all(distance <= 300 for _, distance in found)
+
+
+def test_within_matches_brute_force(izmit_points):
+    grid = _GridIndex(izmit_points, 250)
+    _, lat, lon = izmit_points[5]
+    found = sorted(i for i, _ in grid.within(lat, lon, 600))
+    expected = sorted(i for i, (_, p_lat, p_lon) in enumerate(izmit_points) if _haversine(lat, lon, p_lat, p_lon) <= 600)
+    assert found == expected
+
+
+def test_empty_grid():
+    grid = _GridIndex([], 100)
+    assert grid.nearest(40.76, 29.92, 3) == []
+    assert list(grid.within(40.76, 29.92, 500)) == []
+
+
+# Shape yardımcıları
+
+def test_douglas_peucker_drops_collinear_points():
+    lats = [40.0 + i * 0.001 for i in range(10)]
+    lngs = [29.0] * 10
+    assert _douglas_peucker(lats, lngs, 5.0) == [0, 9]
+    lngs[4] = 29.001  # ~85 m sapma
+    kept = _douglas_peucker(lats, lngs, 5.0)
+    assert kept[0] == 0 and kept[-1] == 9 and 4 in kept
+
+
+def test_encode_polyline_reference_value():
+    # Google'ın biçim belgesindeki örnek
+    assert _encode_polyline([38.5, 40.7, 43.252], [-120.2, -120.95, -126.453]) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+
+def test_group_shapes_sorts_and_reports_duplicates():
+    rows = [('a', 40.2, 29.2, 2), ('a', 40.1, 29.1, 1), ('a', 40.15, 29.15, 1), ('b', 40.0, 29.0, 5), ('b', 40.0, 29.0, 7)]
+    report = {}
+    shapes = {shape['shape_id']: shape for shape in _group_shapes(rows, report)}
+    assert list(shapes['a']['sequences']) == [1, 2]
+    assert list(shapes['a']['lats']) == [40.1, 40.2]
+    assert report["tekrarlanan shape_pt_sequence (atlandı)"] == 1
+    assert report["sıra numaraları ardışık olmayan shape"] == 1
+
+
+# Ön denetim
+
+def test_preflight_reports_out_of_order_times(tmp_path):
+    (tmp_path / 'stops.txt').write_text(
+        "stop_id,stop_name,stop_lat,stop_lon\n"
+        "1,A,40.76,29.92\n"
+        "1,A tekrar,40.76,29.92\n"
+        "2,B,0,0\n", encoding='utf-8')
+    (tmp_path / 'routes.txt').write_text(
+        'route_id,route_short_name,route_long_name,stops\n'
+        '4170,417,A-B,"1,2,9"\n', encoding='utf-8')
+    (tmp_path / 'schedules.txt').write_text(
+        "route_id,weekday_times,saturday_times,sunday_times\n"
+        "4170,19:42 05:52 20:08 23:50 00:20,06:00 xx:10,\n", encoding='utf-8')
+    data, report = veri_yukle.preflight(str(tmp_path / 'stops.txt'), str(tmp_path / 'shapes.txt'),
+                                        str(tmp_path / 'routes.txt'), str(tmp_path / 'schedules.txt'))
+
+    assert [row.stop_id for row in data['stops']] == ['1', '2']
+    assert data['routes'][0]['stops'] == ['1', '2', '']
+    assert data['shapes'] is None
+    assert data['schedules'][0]['weekday_dk'] == [352, 1182, 1208, 1430, 1460]
+    section = report[str(tmp_path / 'schedules.txt')]
+    assert section["sıra dışı saat (sıraya dizildi)"] == 1
+    assert section["ayrıştırılamayan saat (atlandı)"] == 1
+    assert section["sırasız ya da 48 saati aşan saat listesi"] == 0
+    assert report[str(tmp_path / 'stops.txt')]["tekrarlanan stop_id (atlandı)"] == 1
+
+
+def test_post_import_stages_write_preflight_rows(tmp_path, recorded_db):
+    db, driver = recorded_db
+    (tmp_path / 'stops.txt').write_text(
+        "stop_id,stop_name,stop_lat,stop_lon\n"
+        "1,A,40.760,29.920\n"
+        "1,A tekrar,40.900,30.100\n"
+        "2,B,40.770,29.920\n"
+        "3,C,40.780,29.920\n", encoding='utf-8')
+    (tmp_path / 'routes.txt').write_text(
+        'route_id,route_short_name,route_long_name,stops\n'
+        '4170,417,A-C,"1,2,9,3"\n', encoding='utf-8')
+    files = [str(tmp_path / name) for name in ('stops.txt', 'shapes.txt', 'routes.txt', 'schedules.txt')]
+    clean, _ = veri_yukle.preflight(*files)
+
+    driver.reset()
+    db.build_stop_neighbors(files[0], 2, 100, data=clean)
+    neighbors = {row['stop_id']: row for row in driver.rows(veri_yukle.KOMSU_DURAK_SORGUSU)}
+    # Tekrarlanan durak tek satır olarak ve ilk kaydın konumuyla gider
+    assert sorted(neighbors) == ['1', '2', '3']
+    assert neighbors['1']['komsular'] == ['2', '3']
+    assert neighbors['1']['mesafeler'][0] == pytest.approx(1112, abs=2)
+
+    driver.reset()
+    db.import_stop_offsets(files[0], files[2], 100, data=clean)
+    [(_, parameters)] = driver.calls
+    offsets = [(row['stop_id'], row['sequence']) for row in parameters['rows']]
+    # Bilinmeyen durak (9) temiz veride boş id'ye çevrilmiştir ve yazılmaz; sıra numaraları korunur
+    assert offsets == [('1', 0), ('2', 1), ('3', 3)]
+    assert parameters['rows'][1]['offset'] == pytest.approx(1112 / veri_yukle.OTOBUS_HIZI_M_DK, abs=0.05)
+
+    # Manifest temiz veriden üretildiğini kaydeder; artımlı yükleme buna bakıp ön denetimi yeniden uygular
+    manifest, data = db.build_manifest(*files, loaded=clean)
+    assert manifest['preflight'] is True
+    assert data['stops'] is clean['stops']
+    assert db.build_manifest(*files)[0]['preflight'] is False
+
+
+# Paralel yazım bölüştürmesi
+
+@pytest.mark.parametrize('workers', [2, 4, 8])
+def test_lock_disjoint_rounds_never_share_a_node_within_a_round(workers):
+    rng = random.Random(3)
+    stop_ids = [str(i) for i in range(300)]
+    edges = [{'stop_id1': rng.choice(stop_ids), 'stop_id2': rng.choice(stop_ids)} for _ in range(2000)]
+    rounds = veri_yukle._lock_disjoint_rounds(edges, workers, veri_yukle._pair_lock_keys)
+
+    assert sorted(map(id, (row for lanes in rounds for lane in lanes for row in lane))) == sorted(map(id, edges))
+    for lanes in rounds:
+        owners = {}
+        for lane, rows in enumerate(lanes):
+            for row in rows:
+                for key in veri_yukle._pair_lock_keys(row):
+                    assert owners.setdefault(key, lane) == lane
+            assert rows == sorted(rows, key=veri_yukle._pair_lock_keys)
+    # Son turda tek işçiye kalan ilişkiler azdır
+    assert len(rounds) <= veri_yukle.KILIT_AYRIK_TUR_SAYISI + 1
+    assert sum(len(rows) for rows in rounds[-1]) < len(edges) / 4
+
+
+def test_parallel_route_writer_sends_every_link_once():
+    driver = _SorguKaydi()
+    db = veri_yukle.Neo4jDatabase(None, None, None, 4, driver=driver)
+    routes = [{'route_id': str(r), 'route_number': str(r), 'direction': 'Gidiş',
+               'stops': [str(s) for s in range(r, r + 30)]} for r in range(40)]
+    try:
+        db.write_routes(routes, 50)
+    finally:
+        db.close()
+    links = driver.rows(veri_yukle.GUZERGAH_SORGUSU)
+    edges = driver.rows(veri_yukle.SONRAKI_DURAK_SORGUSU)
+    assert sorted((row['route_id'], row['stop_id']) for row in links) == sorted(
+        (str(r), str(s)) for r in range(40) for s in range(r, r + 30))
+    assert len(edges) == 40 * 29
+
+
+def test_lock_disjoint_rounds_single_key_fits_one_round():
+    rows = [{'route_id': str(i)} for i in range(100)]
+    rounds = veri_yukle._lock_disjoint_rounds(rows, 4, lambda row: row['route_id'])
+    assert len(rounds) == 1 and sum(map(len, rounds[0])) == 100
+
+
+# Async yükleyici
+
+def _async_stops(count):
+    return [{'stop_id': str(i)} for i in range(count)]
+
+
+def test_async_writer_counts_failed_chunks_and_records_them_in_checkpoint(tmp_path):
+    driver = _AsyncSurucu(fail_on={'7'})
+    db = veri_yukle.AsyncNeo4jDatabase(None, None, None, 3, driver=driver)
+    checkpoint = veri_yukle.ImportCheckpoint(str(tmp_path / 'cp.json'), {}, {})
+    db.enable_checkpoint(checkpoint)
+
+    count = asyncio.run(db._write_batches("Duraklar", _async_stops(20), 5, veri_yukle.DURAK_SORGUSU))
+
+    assert count == 15 and db.failed_rows == 5
+    assert sorted(int(row['stop_id']) for row in driver.rows) == [i for i in range(20) if not 5 <= i < 10]
+    assert checkpoint.failed_rows() == 5
+    assert checkpoint.phase_rows("Duraklar") == 15
+    assert checkpoint.lane_progress("Duraklar", 0) == (4, 15)
+
+
+def test_async_writer_stops_on_transient_error_and_resumes_from_checkpoint(tmp_path):
+    path = str(tmp_path / 'cp.json')
+    driver = _AsyncSurucu(fail_on={'12'}, error=veri_yukle.GECICI_HATALAR[0])
+    db = veri_yukle.AsyncNeo4jDatabase(None, None, None, 1, driver=driver)
+    db.max_retries = 0
+    db.enable_checkpoint(veri_yukle.ImportCheckpoint(path, {}, {}))
+    with pytest.raises(veri_yukle.GECICI_HATALAR):
+        asyncio.run(db._write_batches("Duraklar", _async_stops(20), 5, veri_yukle.DURAK_SORGUSU))
+    assert len(driver.rows) == 10
+
+    resumed = _AsyncSurucu()
+    db = veri_yukle.AsyncNeo4jDatabase(None, None, None, 1, driver=resumed)
+    checkpoint = veri_yukle.ImportCheckpoint.load(path, {}, {})
+    db.enable_checkpoint(checkpoint)
+    assert asyncio.run(db._write_batches("Duraklar", _async_stops(20), 5, veri_yukle.DURAK_SORGUSU)) == 20
+    # Commit edilmiş iki parça yeniden gönderilmez
+    assert [row['stop_id'] for row in resumed.rows] == [str(i) for i in range(10, 20)]
+    assert checkpoint.failed_rows() == 0
+
+
+def test_async_partitioned_writer_without_checkpoint_keeps_going():
+    driver = _AsyncSurucu(fail_on={'3'}, error=veri_yukle.GECICI_HATALAR[0])
+    db = veri_yukle.AsyncNeo4jDatabase(None, None, None, 4, driver=driver)
+    db.max_retries = 0
+    rows = [{'stop_id1': str(i), 'stop_id2': str(i + 1), 'stop_id': str(i)} for i in range(40)]
+    count = asyncio.run(db._write_batches("SONRAKI_DURAK", rows, 2, veri_yukle.SONRAKI_DURAK_SORGUSU,
+                                          partition_key=veri_yukle._pair_lock_keys))
+    assert db.failed_rows >= 1
+    assert count + db.failed_rows == 40
+    assert len(driver.rows) == count
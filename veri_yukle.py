@@ -1,14 +1,1223 @@
-
-
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase, GraphDatabase
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+from array import array
+from bisect import bisect_left
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import compress, islice, zip_longest
+import argparse
+import asyncio
 import csv
+import hashlib
+import io
+import json
+import math
 import os
 import sys
+import threading
+import time
+import zipfile
+import zlib
+
+# Bağlantı bilgileri NEO4J_URI / NEO4J_USER / NEO4J_PASSWORD ortam değişkenlerinden ya da
+# --uri / --user / --password seçeneklerinden okunur; yoksa bunlar kullanılır (src/configs/neo4j.js ile aynı)
+VARSAYILAN_NEO4J_URI = "bolt://localhost:7687"
+VARSAYILAN_NEO4J_USER = "neo4j"
+VARSAYILAN_NEO4J_PASSWORD = "baranbaran"
+
+# Toplu yüklemede bir transaction'a giden satır sayısı
+VARSAYILAN_BATCH_SIZE = 1000
+
+# Tam temizlikte bir transaction'da silinecek düğüm/ilişki sayısı
+VARSAYILAN_SILME_BATCH_SIZE = 10000
+
+# Artımlı yüklemede son yüklenen kayıtların özetlerinin tutulduğu dosya
+VARSAYILAN_MANIFEST = "veri/.import_manifest.json"
+
+# Kompakt shape modunda Douglas-Peucker toleransı (metre)
+VARSAYILAN_SHAPE_TOLERANSI = 5.0
+
+DUNYA_YARICAPI_M = 6371000.0
+
+# Aktarma grafı: yürüme yarıçapı (metre) ve ortalama hızlar (metre/dakika).
+# Otobüs hızı durakController'daki varış tahminiyle aynıdır (250 m = 1 dk)
+VARSAYILAN_YURUME_YARICAPI = 300.0
+OTOBUS_HIZI_M_DK = 250.0
+YURUME_HIZI_M_DK = 80.0
+
+# Toplu kenar modelinde durak shape üzerine izdüşürülürken bakılan en yakın shape noktası
+# sayısı ve kabul edilen en uzak izdüşüm (metre); daha uzaksa kuş uçuşu mesafe kullanılır
+IZDUSUM_ADAY_SAYISI = 10
+EN_UZAK_IZDUSUM_M = 200.0
+
+# Ön denetimde geçerli sayılan koordinat aralığı (güney, kuzey, batı, doğu); Kocaeli il
+# sınırlarına komşu ilçelere (Tuzla, Sapanca ...) uzanan hatlar için pay bırakılmıştır
+KOCAELI_SINIRLARI = (40.40, 41.35, 29.00, 30.60)
+
+# Durak -> (hat, sıra) ters indeksinin yazıldığı dosya; API (src/utils/stopIndexUtils.js)
+# doğrudan hat ve güzergah parçası aramalarını Cypher'a gitmeden bu dosyadan yapar
+VARSAYILAN_DURAK_INDEKSI = os.environ.get("DURAK_HAT_INDEKSI", "veri/durak_hat_indeksi.bin")
+DURAK_INDEKSI_IMZASI = b"DHIX"
+DURAK_INDEKSI_SURUMU = 1
+# Hattın durak listesinde stops.txt'de olmayan durağın yeri
+BILINMEYEN_DURAK = 0xFFFFFFFF
+
+# Saat listesinde geri gidiş yalnızca bu saatten (20:00) sonraki bir seferi bu saatten (05:00)
+# önceki bir sefer izliyorsa gece yarısı geçişi sayılır
+GEC_SEFER_DK = 20 * 60
+ERKEN_SABAH_DK = 5 * 60
+
+# Her durak için önceden hesaplanan en yakın komşu durak sayısı
+VARSAYILAN_KOMSU_SAYISI = 10
+
+# Ölçüm: sorgu süresi histogramının kova üst sınırları (ms, son kova sınırsız),
+# result.consume() sayaçlarından toplananlar ve varsayılan JSON-lines günlüğü
+GECIKME_KOVALARI_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+SAYAC_ALANLARI = ('nodes_created', 'nodes_deleted', 'relationships_created', 'relationships_deleted',
+                  'properties_set', 'labels_added')
+VARSAYILAN_METRIK_GUNLUGU = "veri/import_metrics.jsonl"
+
+# Kaldığı yerden devam (--resume): kontrol noktası dosyası ve geçici hatalarda parça başına
+# yeniden deneme sayısı. execute_write kendi içinde de yeniden dener; bu sayaç onun da
+# vazgeçtiği (ör. Neo4j yeniden başlatılırken) hatalar içindir, bekleme her denemede ikiye katlanır
+VARSAYILAN_CHECKPOINT = "veri/.import_checkpoint.json"
+VARSAYILAN_YENIDEN_DENEME = 5
+YENIDEN_DENEME_BEKLEMESI_SN = 2.0
+EN_UZUN_BEKLEME_SN = 60.0
+GECICI_HATALAR = (ServiceUnavailable, SessionExpired, TransientError)
+
+# --workers ile ilişki yazımı: iki ucu farklı işçilere düşen ilişkiler bir sonraki turda başka
+# bir karma ile yeniden bölüştürülür; bu kadar turdan sonra kalanlar tek işçiyle yazılır
+KILIT_AYRIK_TUR_SAYISI = 16
+
+
+def _chunked(iterable, size):
+    # Satırları size uzunluğunda listeler halinde üret
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _run_unwind(tx, queries, rows, metrics=None, phase=None):
+    # Aynı parça için tüm sorguları tek transaction içinde çalıştır
+    for query in queries:
+        started = time.perf_counter()
+        summary = tx.run(query, rows=rows).consume()
+        if metrics is not None:
+            metrics.record_query(phase, query, time.perf_counter() - started, summary, {'rows': rows})
+
+
+async def _run_unwind_async(tx, queries, rows):
+    # _run_unwind'in async sürücü karşılığı
+    for query in queries:
+        result = await tx.run(query, rows=rows)
+        await result.consume()
+
+
+def _lock_disjoint_rounds(rows, workers, partition_key, rounds=KILIT_AYRIK_TUR_SAYISI):
+    """Satırları, her turdaki kulvarların kilitlediği düğümler ayrık olacak şekilde dağıtır.
+
+    partition_key satırın kilitlediği düğümün anahtarını ya da (ilişkilerde) iki ucun
+    anahtarlarını döndürür. Bir turda her anahtar tek bir kulvara düşer; tüm anahtarları aynı
+    kulvara düşen satır o kulvarda yazılır, kalanlar sonraki turda başka bir karmayla denenir.
+    Son turda kalanlar tek kulvardır. Her tur bir liste listesidir (kulvar başına satırlar);
+    kulvarlar anahtar sırasıyla yazılır.
+    """
+    pending = list(rows)
+    result = []
+    for salt in range(rounds):
+        lanes = [[] for _ in range(workers)]
+        rest = []
+        for row in pending:
+            keys = partition_key(row)
+            # crc32 doğrusal olduğundan öneki değiştirmek kulvar eşleşmelerini değiştirmez; blake2b kullanılır
+            targets = {int.from_bytes(hashlib.blake2b(f"{salt}:{key}".encode('utf-8'), digest_size=4).digest(),
+                                      'big') % workers
+                       for key in (keys if isinstance(keys, tuple) else (keys,))}
+            if len(targets) == 1:
+                lanes[targets.pop()].append(row)
+            else:
+                rest.append(row)
+        result.append([sorted(lane, key=partition_key) for lane in lanes])
+        pending = rest
+        if not pending:
+            return result
+    result.append([sorted(pending, key=partition_key)])
+    return result
+
+
+def _link_lock_keys(row):
+    # GÜZERGAH_ÜZERINDE: Durak ve Hat ucu (etiketler farklı, anahtarlar karışmasın diye önek)
+    return ('d' + row['stop_id'], 'h' + row['route_id'])
+
+
+def _pair_lock_keys(row):
+    # İki durak arasındaki ilişkiler (SONRAKI_DURAK, DURAK_BAGLANTISI, AKTARMA)
+    return (row['stop_id1'], row['stop_id2'])
+
+
+def _report_throughput(phase, count, elapsed):
+    # Aşama sonunda satır/sn bilgisini yazdır
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"[{phase}] {count} satır, {elapsed:.2f} sn, {rate:.0f} satır/sn")
+
+
+def _chunked_shapes(shapes, max_points):
+    # Shape'leri toplam nokta sayısı max_points'i geçmeyecek şekilde grupla
+    # (tek bir shape hiçbir zaman bölünmez)
+    chunk = []
+    points = 0
+    for shape in shapes:
+        size = len(shape['sequences'])
+        if chunk and points + size > max_points:
+            yield chunk
+            chunk = []
+            points = 0
+        chunk.append(shape)
+        points += size
+    if chunk:
+        yield chunk
+
+
+def _count_shape_points(chunk):
+    return sum(len(shape['sequences']) for shape in chunk)
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    # İki koordinat arasındaki mesafe (metre)
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * DUNYA_YARICAPI_M * math.asin(math.sqrt(a))
+
+
+def _douglas_peucker(lats, lngs, tolerance):
+    # Korunacak noktaların indekslerini döndür; mesafeler yerel düzlem
+    # izdüşümünde metre cinsinden hesaplanır
+    n = len(lats)
+    if n < 3:
+        return list(range(n))
+
+    kx = math.radians(1) * DUNYA_YARICAPI_M * math.cos(math.radians(sum(lats) / n))
+    ky = math.radians(1) * DUNYA_YARICAPI_M
+    xs = [lng * kx for lng in lngs]
+    ys = [lat * ky for lat in lats]
+
+    keep = [False] * n
+    keep[0] = keep[n - 1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = xs[first], ys[first]
+        dx, dy = xs[last] - x1, ys[last] - y1
+        length = math.hypot(dx, dy)
+        max_dist = -1.0
+        index = first
+        for i in range(first + 1, last):
+            if length == 0:
+                dist = math.hypot(xs[i] - x1, ys[i] - y1)
+            else:
+                dist = abs(dy * (xs[i] - x1) - dx * (ys[i] - y1)) / length
+            if dist > max_dist:
+                max_dist = dist
+                index = i
+        if max_dist > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [i for i in range(n) if keep[i]]
+
+
+class _GridIndex:
+    """Koordinatları cell_size metrelik hücrelere dağıtan basit uzamsal ızgara.
+
+    Yarıçap sorguları yalnızca komşu hücreleri tarar; O(n²) ikili karşılaştırma gerekmez.
+    """
+
+    def __init__(self, points, cell_size):
+        # points: [(anahtar, lat, lon)]
+        self.points = points
+        self.cell_size = cell_size
+        lat0 = sum(lat for _, lat, _ in points) / len(points) if points else 0
+        self.dlat = cell_size / (math.radians(1) * DUNYA_YARICAPI_M)
+        self.dlon = self.dlat / max(math.cos(math.radians(lat0)), 0.01)
+        self.cells = {}
+        for i, (_, lat, lon) in enumerate(points):
+            self.cells.setdefault(self._cell(lat, lon), []).append(i)
+        # Dolu hücrelerin sınırları (satır min/maks, sütun min/maks); halkalar bunun dışına taşmaz
+        rows = [row for row, _ in self.cells] or [0]
+        cols = [col for _, col in self.cells] or [0]
+        self.bounds = (min(rows), max(rows), min(cols), max(cols))
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.dlat), math.floor(lon / self.dlon)
+
+    def within(self, lat, lon, radius):
+        # radius metre içindeki (indeks, mesafe) çiftleri
+        reach = max(1, math.ceil(radius / self.cell_size))
+        row, col = self._cell(lat, lon)
+        for i in range(row - reach, row + reach + 1):
+            for j in range(col - reach, col + reach + 1):
+                for index in self.cells.get((i, j), ()):
+                    _, other_lat, other_lon = self.points[index]
+                    distance = _haversine(lat, lon, other_lat, other_lon)
+                    if distance <= radius:
+                        yield index, distance
+
+    def _ring(self, row, col, reach):
+        # (row, col) merkezli reach yarıçaplı halkanın dolu hücre sınırları içinde kalan kısmı
+        min_row, max_row, min_col, max_col = self.bounds
+        if reach == 0:
+            return [(row, col)]
+        cells = []
+        cols = range(max(col - reach, min_col), min(col + reach, max_col) + 1)
+        for i in (row - reach, row + reach):
+            if min_row <= i <= max_row:
+                cells += [(i, j) for j in cols]
+        rows = range(max(row - reach + 1, min_row), min(row + reach - 1, max_row) + 1)
+        for j in (col - reach, col + reach):
+            if min_col <= j <= max_col:
+                cells += [(i, j) for i in rows]
+        return cells
+
+    def nearest(self, lat, lon, k, exclude=None, max_radius=None):
+        # En yakın k noktanın (indeks, mesafe) listesi. Halkalar dışa doğru genişletilir;
+        # taranmamış hücrelerdeki noktalar en az reach * cell_size uzakta olduğundan
+        # k. aday bu sınırın içindeyse arama durur. max_radius verilirse daha uzaktaki
+        # noktalar aranmaz, sonuç k'dan kısa olabilir
+        row, col = self._cell(lat, lon)
+        min_row, max_row, min_col, max_col = self.bounds
+        # Dolu hücrelere varana dek halkalar boştur, doğrudan oradan başlanır
+        reach = max(min_row - row, row - max_row, min_col - col, col - max_col, 0)
+        found = []
+        seen = 0
+        while seen < len(self.points):
+            # Boylam hücreleri ortalama enleme göre ölçeklendiği için sınır biraz daraltılır
+            bound = reach * self.cell_size * 0.95
+            if max_radius is not None and bound - self.cell_size > max_radius:
+                break
+            for cell in self._ring(row, col, reach):
+                for index in self.cells.get(cell, ()):
+                    seen += 1
+                    if index == exclude:
+                        continue
+                    _, other_lat, other_lon = self.points[index]
+                    distance = _haversine(lat, lon, other_lat, other_lon)
+                    if max_radius is None or distance <= max_radius:
+                        found.append((index, distance))
+            found.sort(key=lambda item: item[1])
+            del found[k:]
+            if len(found) == k and found[-1][1] <= bound:
+                break
+            reach += 1
+        return found
+
+
+def _encode_polyline(lats, lngs, precision=5):
+    # Google "encoded polyline" biçimi
+    factor = 10 ** precision
+    result = []
+    prev_lat = prev_lng = 0
+    for lat, lng in zip(lats, lngs):
+        ilat = int(round(lat * factor))
+        ilng = int(round(lng * factor))
+        for delta in (ilat - prev_lat, ilng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        prev_lat, prev_lng = ilat, ilng
+    return ''.join(result)
+
+
+def _hash_record(record):
+    # Kaydın içeriğinden kararlı bir özet üret
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=list)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _diff_manifest(old, new):
+    # (yeni, değişen, silinen) anahtar kümelerini döndür
+    inserted = set(new) - set(old)
+    deleted = set(old) - set(new)
+    updated = {key for key in set(new) & set(old) if new[key] != old[key]}
+    return inserted, updated, deleted
+
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _save_manifest(path, manifest):
+    # Yarım yazılmış manifest kalmaması için önce geçici dosyaya yaz
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# Satır tipleri: alan sırası ve dönüşümler aşağıdaki *_SUTUNLARI tanımlarıyla aynıdır
+DurakSatiri = namedtuple('DurakSatiri', 'stop_id name lat lon stop_code')
+ShapeSatiri = namedtuple('ShapeSatiri', 'shape_id lat lon sequence')
+HatSatiri = namedtuple('HatSatiri', 'route_id route_short_name route_long_name route_type route_desc '
+                                    'route_color route_text_color stops')
+CizelgeSatiri = namedtuple('CizelgeSatiri', 'route_id weekday_times saturday_times sunday_times '
+                                            'color_notes route_short_name direction')
+# Kocaeli schedules.txt: hat numarası başına tek satır, iki yön _1 / _2 sütunlarında
+GenisCizelgeSatiri = namedtuple('GenisCizelgeSatiri', 'route_number direction_1 direction_2 '
+                                                      'weekday_times_1 weekday_times_2 saturday_times_1 '
+                                                      'saturday_times_2 sunday_times_1 sunday_times_2 color_notes')
+
+
+def _float_or_zero(value):
+    # Boş koordinat eski yükleyicide olduğu gibi 0 kabul edilir
+    return float(value) if value else 0
+
+
+# (sütun adı, dönüştürücü, zorunlu mu)
+DURAK_SUTUNLARI = [
+    ('stop_id', str, True),
+    ('stop_name', str, True),
+    ('stop_lat', _float_or_zero, True),
+    ('stop_lon', _float_or_zero, True),
+    ('stop_code', str, False),
+]
+SHAPE_SUTUNLARI = [
+    ('shape_id', str, True),
+    ('shape_pt_lat', float, True),
+    ('shape_pt_lon', float, True),
+    ('shape_pt_sequence', int, True),
+]
+HAT_SUTUNLARI = [
+    ('route_id', str, True),
+    ('route_short_name', str, False),
+    ('route_long_name', str, False),
+    ('route_type', str, False),
+    ('route_desc', str, False),
+    ('route_color', str, False),
+    ('route_text_color', str, False),
+    ('stops', str, True),
+]
+CIZELGE_SUTUNLARI = [
+    ('route_id', str, True),
+    ('weekday_times', str, False),
+    ('saturday_times', str, False),
+    ('sunday_times', str, False),
+    ('color_notes', str, False),
+    ('route_short_name', str, False),
+    ('direction', str, False),
+]
+GENIS_CIZELGE_SUTUNLARI = [
+    ('route_number', str, True),
+    ('direction_1', str, False),
+    ('direction_2', str, False),
+    ('weekday_times_1', str, False),
+    ('weekday_times_2', str, False),
+    ('saturday_times_1', str, False),
+    ('saturday_times_2', str, False),
+    ('sunday_times_1', str, False),
+    ('sunday_times_2', str, False),
+    ('color_notes', str, False),
+]
+
+GUN_TIPLERI = ('weekday', 'saturday', 'sunday')
+
+
+def _split_zip_path(file_path):
+    # "feed.zip/stops.txt" biçimindeki yolu (zip dosyası, üye adı) olarak ayır
+    parts = file_path.replace('\\', '/').split('/')
+    for i in range(len(parts) - 1, 0, -1):
+        zip_path = '/'.join(parts[:i])
+        if zip_path.lower().endswith('.zip') and os.path.isfile(zip_path):
+            return zip_path, '/'.join(parts[i:])
+    return None, None
+
+
+def _source_exists(file_path):
+    # Dosya diskte ya da bir GTFS zip arşivinin içinde mi?
+    if os.path.exists(file_path):
+        return True
+    zip_path, member = _split_zip_path(file_path)
+    if not zip_path:
+        return False
+    with zipfile.ZipFile(zip_path) as archive:
+        return member in archive.namelist()
+
+
+def _source_fingerprint(file_path):
+    # Kaynağın boyutu ve değişiklik zamanı; zip üyesi için arşivin kendisininki
+    path = file_path if os.path.exists(file_path) else _split_zip_path(file_path)[0]
+    if not path:
+        return None
+    stat = os.stat(path)
+    return [stat.st_size, int(stat.st_mtime)]
+
+
+def _open_text(file_path):
+    # Düz dosyayı ya da zip içindeki üyeyi çıkarmadan metin olarak aç
+    if os.path.exists(file_path):
+        return open(file_path, 'r', encoding='utf-8-sig', newline='')
+    zip_path, member = _split_zip_path(file_path)
+    # Arşiv kapatılsa da açık üye dosyası okunmaya devam eder
+    with zipfile.ZipFile(zip_path) as archive:
+        member_file = archive.open(member)
+    return io.TextIOWrapper(member_file, encoding='utf-8-sig', newline='')
+
+
+def _iter_rows(file, reader, plan, record_type, file_path):
+    skipped = 0
+    try:
+        for line in reader:
+            if not line:
+                continue
+            try:
+                yield record_type._make([convert(line[i]) if i < len(line) else ''
+                                         for i, convert in plan])
+            except ValueError:
+                skipped += 1
+                if skipped <= 10:
+                    print(f"Uyarı: {file_path} dosyasında geçersiz değer - Satır atlanıyor: {line}")
+    finally:
+        file.close()
+        if skipped:
+            print(f"Uyarı: {file_path} dosyasında toplam {skipped} satır geçersiz değerler nedeniyle atlandı.")
+
+
+def _row_source(file_path, record_type, columns):
+    """CSV'yi akış halinde okur ve tipli satırlar üretir.
+
+    Başlık bir kez doğrulanır, sütunlar konumlarına eşlenir; eksik zorunlu sütun
+    varsa hata yazdırılır ve None döner. Olmayan isteğe bağlı sütunlar '' okunur.
+    """
+    file = _open_text(file_path)
+    reader = csv.reader(file)
+    header = [name.strip() for name in next(reader, [])]
+    positions = {name: i for i, name in enumerate(header)}
+    missing = [name for name, _, required in columns if required and name not in positions]
+    if missing:
+        file.close()
+        print(f"Hata: {file_path} dosyasında gerekli sütunlar eksik: {', '.join(missing)}")
+        return None
+    # Olmayan sütunlar satır uzunluğunun dışına işaret eder ve '' okunur
+    plan = [(positions.get(name, sys.maxsize), convert) for name, convert, _ in columns]
+    return _iter_rows(file, reader, plan, record_type, file_path)
+
+
+def _read_stops(file_path):
+    # Durak satırlarını oku
+    rows = _row_source(file_path, DurakSatiri, DURAK_SUTUNLARI)
+    return None if rows is None else list(rows)
+
+
+def _read_shapes(file_path):
+    rows = _row_source(file_path, ShapeSatiri, SHAPE_SUTUNLARI)
+    return None if rows is None else _group_shapes(rows)
+
+
+def _group_shapes(rows, report=None):
+    # Noktaları shape_id'ye göre grupla ve her grubu shape_pt_sequence'e göre sırala.
+    # Gruplar typed array olarak tutulur; nokta başına Python nesnesi oluşmaz.
+    # report verilirse tekrar ve boşluk sayıları oraya da yazılır
+    groups = {}
+    for shape_id, lat, lon, sequence in rows:
+        group = groups.get(shape_id)
+        if group is None:
+            group = groups[shape_id] = (array('q'), array('d'), array('d'))
+        group[0].append(sequence)
+        group[1].append(lat)
+        group[2].append(lon)
+
+    shapes = []
+    duplicates = 0
+    gapped = 0
+    for shape_id, (sequences, lats, lngs) in groups.items():
+        if any(sequences[i] >= sequences[i + 1] for i in range(len(sequences) - 1)):
+            order = sorted(range(len(sequences)), key=sequences.__getitem__)
+            kept = [i for n, i in enumerate(order) if n == 0 or sequences[order[n - 1]] != sequences[i]]
+            duplicates += len(order) - len(kept)
+            sequences = array('q', (sequences[i] for i in kept))
+            lats = array('d', (lats[i] for i in kept))
+            lngs = array('d', (lngs[i] for i in kept))
+        if sequences[-1] - sequences[0] + 1 != len(sequences):
+            gapped += 1
+        shapes.append({'shape_id': shape_id, 'sequences': sequences, 'lats': lats, 'lngs': lngs})
+
+    if report is not None:
+        report["tekrarlanan shape_pt_sequence (atlandı)"] = duplicates
+        report["sıra numaraları ardışık olmayan shape"] = gapped
+    else:
+        if duplicates:
+            print(f"Uyarı: {duplicates} tekrarlanan shape_pt_sequence değeri atlandı.")
+        if gapped:
+            print(f"Bilgi: {gapped} shape'te sıra numaraları ardışık değil, noktalar sıralarına göre bağlandı.")
+    return shapes
+
+
+def _read_routes(file_path):
+    # Hat satırlarını ve durak listelerini oku
+    rows = _row_source(file_path, HatSatiri, HAT_SUTUNLARI)
+    if rows is None:
+        return None
+    routes = []
+    for row in rows:
+        route_id = row.route_id
+        routes.append({
+            'route_id': route_id,
+            'route_number': row.route_short_name,
+            'route_name': row.route_long_name,
+            'route_long_name': row.route_long_name,
+            'route_type': row.route_type,
+            'route_desc': row.route_desc,
+            'route_color': row.route_color,
+            'route_text_color': row.route_text_color,
+            'direction': 'Gidiş' if route_id.endswith('0') else 'Dönüş',
+            'stops': [stop_id.strip() for stop_id in row.stops.strip('"').split(',')],
+        })
+    return routes
+
+
+def _read_header(file_path):
+    # Yalnızca başlık satırını oku
+    with _open_text(file_path) as file:
+        return [name.strip() for name in next(csv.reader(file), [])]
+
+
+def _parse_times(times):
+    """"HH:MM HH:MM ..." dizgesini sıralı, tekrarsız dakika listesine çevirir.
+
+    Gece yarısını geçen seferler (ör. "23:46 00:06") GTFS'teki gibi 24:00 sonrasına
+    (1446) yazılır, böylece liste sıralı kalır. Erken saat (ERKEN_SABAH_DK öncesi) ancak
+    günün geç bir seferinden (GEC_SEFER_DK sonrası) sonra gelirse gece yarısı geçilmiş
+    sayılır; diğer sıra dışı saatler (ör. "07:55 08:25 08:10") gerçek seferlerdir ve
+    sıraya dizilir. Yalnızca ayrıştırılamayan ya da 2880'e (ertesi gün sonu) varan
+    değerler atılır. (dakikalar, atılan saat sayısı, sıraya dizilen saat sayısı) döner.
+    """
+    minutes = set()
+    malformed = 0
+    reordered = 0
+    latest = None
+    rolled_over = False
+    for token in times.split():
+        hour, _, minute = token.partition(':')
+        if not (hour.isdigit() and minute.isdigit() and int(hour) < 48 and int(minute) < 60):
+            malformed += 1
+            continue
+        value = int(hour) * 60 + int(minute)
+        if value < ERKEN_SABAH_DK and (rolled_over or (latest is not None and latest >= GEC_SEFER_DK)):
+            value += 1440
+            rolled_over = True
+        elif value >= 1440:
+            rolled_over = True
+        if value >= 2880:
+            malformed += 1
+            continue
+        if latest is not None and value < latest:
+            reordered += 1
+        latest = value if latest is None else max(latest, value)
+        minutes.add(value)
+    return sorted(minutes), malformed, reordered
+
+
+def _schedule_row(route_id, times, schedule_notes, route_short_name, direction):
+    # Ham saat dizgeleri API uyumluluğu için saklanır, yanında ayrıştırılmış *_dk dizileri
+    row = {
+        'route_id': route_id,
+        'schedule_notes': schedule_notes,
+        'route_short_name': route_short_name,
+        'direction': direction or ('Gidiş' if route_id.endswith('0') else 'Dönüş'),
+    }
+    for day_type, value in zip(GUN_TIPLERI, times):
+        row[f'{day_type}_times'] = value
+    return row
+
+
+def _read_schedules(file_path, routes_file=None, report=None):
+    """Zaman çizelgesi satırlarını okur ve saatleri dakika dizilerine ayrıştırır.
+
+    route_id sütunlu biçimin yanında Kocaeli'nin hat numarası başına tek satırlık
+    (direction_1/_2, weekday_times_1/_2 ...) biçimi de okunur; bu biçimde satırlar
+    routes_file'daki route_short_name ile eşleşen hatlara dağıtılır (_1 -> route_id
+    sonu 0, _2 -> sonu 1). report verilirse eşleşmeyen ve geçersiz değer sayıları oraya yazılır.
+    """
+    header = _read_header(file_path)
+    result = []
+    if 'route_id' not in header and 'route_number' in header:
+        rows = _row_source(file_path, GenisCizelgeSatiri, GENIS_CIZELGE_SUTUNLARI)
+        if rows is None:
+            return None
+        route_ids = {}
+        for route in (_read_routes(routes_file) if routes_file and _source_exists(routes_file) else None) or []:
+            route_ids.setdefault(route['route_number'], []).append(route['route_id'])
+        unmatched = 0
+        for row in rows:
+            matched = False
+            for digit, direction, times in (
+                ('0', row.direction_1, (row.weekday_times_1, row.saturday_times_1, row.sunday_times_1)),
+                ('1', row.direction_2, (row.weekday_times_2, row.saturday_times_2, row.sunday_times_2)),
+            ):
+                for route_id in route_ids.get(row.route_number, ()):
+                    if route_id.endswith(digit):
+                        result.append(_schedule_row(route_id, times, row.color_notes, row.route_number, direction))
+                        matched = True
+            unmatched += not matched
+        if report is not None:
+            report["routes.txt'de eşleşmeyen hat numarası"] = unmatched
+        elif unmatched:
+            print(f"Uyarı: {unmatched} hat numarasının çizelgesi routes.txt'de bir hatla eşleşmedi.")
+    else:
+        rows = _row_source(file_path, CizelgeSatiri, CIZELGE_SUTUNLARI)
+        if rows is None:
+            return None
+        for row in rows:
+            result.append(_schedule_row(row.route_id, (row.weekday_times, row.saturday_times, row.sunday_times),
+                                        row.color_notes, row.route_short_name, row.direction))
+
+    invalid = 0
+    unordered = 0
+    for row in result:
+        for day_type in GUN_TIPLERI:
+            row[f'{day_type}_dk'], malformed, reordered = _parse_times(row[f'{day_type}_times'])
+            invalid += malformed
+            unordered += reordered
+    if report is not None:
+        report["ayrıştırılamayan saat (atlandı)"] = invalid
+        report["sıra dışı saat (sıraya dizildi)"] = unordered
+    else:
+        if invalid:
+            print(f"Uyarı: {invalid} geçersiz saat değeri atlandı.")
+        if unordered:
+            print(f"Bilgi: {unordered} sıra dışı saat sıraya dizildi.")
+    return result
+
+
+def _loaded(data, key, file_path, reader=None):
+    # Ön denetimin temiz verisi (preflight) verilmişse onu kullan, yoksa dosyayı oku;
+    # böylece yükleme sonrası aşamalar da yazıcılarla aynı temizlenmiş satırları görür
+    if data is not None and data.get(key) is not None:
+        return data[key]
+    if not _source_exists(file_path):
+        return None
+    return (reader or _VERI_OKUYUCULARI[key])(file_path)
+
+
+def _edge_model_counts(routes):
+    # (hat başına SONRAKI_DURAK sayısı, durak çifti başına toplu kenar sayısı,
+    #  bir çift arasındaki en fazla paralel kenar); MERGE gibi tekrarlar bir kez sayılır
+    per_route = set()
+    for route in routes:
+        stops = route['stops']
+        for i in range(len(stops) - 1):
+            if stops[i] and stops[i + 1]:
+                per_route.add((stops[i], stops[i + 1], route['route_id'], i))
+    pairs = Counter((stop_id1, stop_id2) for stop_id1, stop_id2, _, _ in per_route)
+    return len(per_route), len(pairs), max(pairs.values(), default=0)
+
+
+def _segment_distances(route_stops, shape):
+    """Hattın ardışık durakları arasındaki yol mesafeleri (metre).
+
+    Shape varsa her durak shape üzerinde kendinden önceki durağın izdüşümünden geride
+    kalmayan en yakın noktaya izdüşürülür ve aradaki shape uzunluğu alınır; durak bilinmiyorsa
+    ya da koordinatı yoksa None, izdüşüm bulunamazsa kuş uçuşu mesafe döner.
+    """
+    projections = [None] * len(route_stops)
+    if shape and len(shape['lats']) > 1:
+        lats, lngs = shape['lats'], shape['lngs']
+        cumulative = [0.0]
+        for i in range(1, len(lats)):
+            cumulative.append(cumulative[-1] + _haversine(lats[i - 1], lngs[i - 1], lats[i], lngs[i]))
+        grid = _GridIndex([(i, lats[i], lngs[i]) for i in range(len(lats))], 100.0)
+        previous = 0
+        for position, stop in enumerate(route_stops):
+            # Koordinatı olmayan durak (0, 0) izdüşürülmez
+            if stop is None or not (stop.lat or stop.lon):
+                continue
+            for index, _ in grid.nearest(stop.lat, stop.lon, IZDUSUM_ADAY_SAYISI, max_radius=EN_UZAK_IZDUSUM_M):
+                if index >= previous:
+                    projections[position] = cumulative[index]
+                    previous = index
+                    break
+
+    distances = []
+    for i in range(len(route_stops) - 1):
+        first, second = route_stops[i], route_stops[i + 1]
+        if first is None or second is None or not (first.lat or first.lon) or not (second.lat or second.lon):
+            distances.append(None)
+        elif projections[i] is not None and projections[i + 1] is not None and projections[i + 1] > projections[i]:
+            distances.append(projections[i + 1] - projections[i])
+        else:
+            distances.append(_haversine(first.lat, first.lon, second.lat, second.lon))
+    return distances
+
+
+def _parse_schedule_notes(notes):
+    # "#renk:açıklama | #renk:açıklama" biçimindeki notları hatController'daki gibi ayrıştır
+    parsed = []
+    for segment in (notes or '').split('|'):
+        segment = segment.strip()
+        hash_index = segment.find('#')
+        colon_index = segment.find(':', hash_index) if hash_index != -1 else -1
+        if colon_index != -1:
+            note = {'color': segment[hash_index + 1:colon_index].strip(),
+                    'description': segment[colon_index + 1:].strip()}
+        else:
+            note = {'color': '', 'description': segment}
+        if note['description']:
+            parsed.append(note)
+    return parsed
+
+
+def _match_shape(route_id, shape_ids):
+    # Hattın shape'i: aynı id, yoksa link_shapes_to_routes'taki gibi önek + yön hanesi tutan ilk shape
+    if route_id in shape_ids:
+        return route_id
+    prefix, direction = route_id[:-1], route_id[-1:]
+    candidates = sorted(shape_id for shape_id in shape_ids
+                        if shape_id.startswith(prefix) and shape_id.endswith(direction))
+    return candidates[0] if candidates else None
+
+
+def _stop_neighbor_rows(stops, k):
+    # Konumu olan her durak için en yakın k durak ve mesafeleri (metre)
+    points = [(row.stop_id, row.lat, row.lon) for row in stops if row.lat and row.lon]
+    if not points:
+        return []
+    grid = _GridIndex(points, VARSAYILAN_YURUME_YARICAPI)
+    rows = []
+    for i, (stop_id, lat, lon) in enumerate(points):
+        neighbors = grid.nearest(lat, lon, k, exclude=i)
+        rows.append({'stop_id': stop_id,
+                     'komsular': [points[j][0] for j, _ in neighbors],
+                     'mesafeler': [round(distance, 1) for _, distance in neighbors]})
+    return rows
+
+
+_VERI_OKUYUCULARI = {'stops': _read_stops, 'shapes': _read_shapes, 'routes': _read_routes}
+
+
+def _route_documents(stops, shapes, routes, schedules, tolerance=VARSAYILAN_SHAPE_TOLERANSI):
+    """Hat (route_id, yani hat + yön) başına API'nin tek okumada sunacağı belgeyi üretir.
+
+    Belge; sıralı durak listesini koordinatlarıyla, sadeleştirilmiş shape'i encoded
+    polyline olarak, ayrıştırılmış zaman çizelgesini ve karşı yöndeki hattın id'sini içerir.
+    """
+    shapes_by_id = {shape['shape_id']: shape for shape in shapes}
+    route_ids = {route['route_id'] for route in routes}
+    schedules_by_route = {row['route_id']: row for row in schedules}
+
+    documents = {}
+    for route in routes:
+        route_id = route['route_id']
+        # GÜZERGAH_ÜZERINDE gibi: sıra hat listesindeki konumdur, bilinmeyen duraklar atlanır
+        route_stops = []
+        for i, stop_id in enumerate(route['stops']):
+            stop = stops.get(stop_id)
+            if stop:
+                route_stops.append({'stop_id': stop.stop_id, 'name': stop.name, 'lat': stop.lat, 'lon': stop.lon,
+                                    'stop_code': stop.stop_code, 'sira': i})
+
+        shape_id = _match_shape(route_id, shapes_by_id)
+        polyline = None
+        if shape_id:
+            shape = shapes_by_id[shape_id]
+            keep = _douglas_peucker(shape['lats'], shape['lngs'], tolerance)
+            polyline = _encode_polyline([shape['lats'][i] for i in keep], [shape['lngs'][i] for i in keep])
+
+        schedule = schedules_by_route.get(route_id)
+        if schedule:
+            schedule = {
+                'direction': schedule['direction'],
+                'route_short_name': schedule['route_short_name'] or '',
+                'notes': _parse_schedule_notes(schedule['schedule_notes']),
+                **{f'{day_type}_times': (schedule[f'{day_type}_times'] or '').split() for day_type in GUN_TIPLERI},
+                **{f'{day_type}_dk': list(schedule[f'{day_type}_dk']) for day_type in GUN_TIPLERI},
+            }
+
+        paired_id = route_id[:-1] + ('1' if route_id.endswith('0') else '0')
+        documents[route_id] = {
+            'v': 1,
+            'route_id': route_id,
+            'route_number': route['route_number'],
+            'route_name': route['route_name'],
+            'yon': route['direction'],
+            'paired_route_id': paired_id if paired_id in route_ids else None,
+            'stops': route_stops,
+            'shape_id': shape_id,
+            'shape': polyline,
+            'schedule': schedule,
+        }
+    return documents
+
+
+def _statement_key(query):
+    # Boşlukları sadeleştirilmiş sorgu metni; aynı ifade tek histogramda toplanır
+    return ' '.join(query.split())
+
+
+def _compact_plan(plan):
+    # PROFILE planından operatör, ayrıntı, satır ve db hit bilgilerini bırak
+    if not plan:
+        return None
+    args = plan.get('args') or {}
+    return {
+        'operator': plan.get('operatorType'),
+        'details': args.get('Details'),
+        'rows': plan.get('rows'),
+        'db_hits': plan.get('dbHits'),
+        'children': [_compact_plan(child) for child in plan.get('children') or []],
+    }
+
+
+def _hottest_operator(plan):
+    # Planda en çok db hit yapan operatör
+    best = plan
+    for child in plan['children']:
+        candidate = _hottest_operator(child)
+        if (candidate['db_hits'] or 0) > (best['db_hits'] or 0):
+            best = candidate
+    return best
+
+
+class ImportMetrics:
+    """Aşama başına sorgu süresi histogramı, result.consume() sayaçları, yeniden deneme ve
+    başarısız satır sayılarını toplar; her aşama bittiğinde JSON-lines günlüğüne bir kayıt yazar.
+
+    profile_slowest > 0 ise aşama sonunda en yavaş ifadeler, en yavaş çalıştıkları
+    parametrelerle PROFILE edilip geri alınan bir transaction'da yeniden çalıştırılır ve
+    planları günlüğe eklenir. Paralel işçiler aynı nesneyi paylaştığı için kilitle korunur.
+    """
+
+    def __init__(self, log_path=VARSAYILAN_METRIK_GUNLUGU, profile_slowest=0):
+        self.log_path = log_path
+        self.profile_slowest = profile_slowest
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._finished = []
+        os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+        self._file = open(log_path, 'a', encoding='utf-8')
+
+    def _phase(self, phase):
+        # Kilit tutulurken çağrılır
+        data = self._phases.get(phase)
+        if data is None:
+            data = self._phases[phase] = {
+                'statements': {},
+                'counters': dict.fromkeys(SAYAC_ALANLARI, 0),
+                'retries': 0,
+                'failed_rows': 0,
+                'errors': [],
+            }
+        return data
+
+    def record_query(self, phase, query, seconds, summary, params):
+        key = _statement_key(query)
+        elapsed_ms = seconds * 1000
+        counters = getattr(summary, 'counters', None)
+        with self._lock:
+            data = self._phase(phase)
+            statement = data['statements'].get(key)
+            if statement is None:
+                statement = data['statements'][key] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'histogram': [0] * (len(GECIKME_KOVALARI_MS) + 1), 'slowest_params': None,
+                }
+            statement['count'] += 1
+            statement['total_ms'] += elapsed_ms
+            statement['histogram'][bisect_left(GECIKME_KOVALARI_MS, elapsed_ms)] += 1
+            if elapsed_ms >= statement['max_ms']:
+                statement['max_ms'] = elapsed_ms
+                # PROFILE için yalnızca en yavaş çalışmanın parametreleri tutulur
+                if self.profile_slowest:
+                    statement['slowest_params'] = params
+            if counters is not None:
+                for field in SAYAC_ALANLARI:
+                    data['counters'][field] += getattr(counters, field, 0)
+
+    def record_retry(self, phase, count=1):
+        with self._lock:
+            self._phase(phase)['retries'] += count
+
+    def record_failure(self, phase, rows, error):
+        with self._lock:
+            data = self._phase(phase)
+            data['failed_rows'] += rows
+            # Günlüğü şişirmemek için ilk birkaç hata örneği saklanır
+            if len(data['errors']) < 5:
+                data['errors'].append(str(error))
+
+    def _write(self, record):
+        record['ts'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def _profile(self, driver, query, params):
+        # PROFILE sorguyu gerçekten çalıştırır; transaction commit edilmeden geri alınır
+        with driver.session() as session:
+            tx = session.begin_transaction()
+            try:
+                summary = tx.run('PROFILE ' + query, params).consume()
+            finally:
+                tx.rollback()
+                tx.close()
+        return _compact_plan(summary.profile)
+
+    def finish_phase(self, phase, rows=None, elapsed=None, driver=None):
+        with self._lock:
+            data = self._phases.pop(phase, None)
+        if data is None:
+            return
+
+        statements = []
+        for query, statement in data['statements'].items():
+            statements.append({
+                'query': query,
+                'count': statement['count'],
+                'total_ms': round(statement['total_ms'], 2),
+                'mean_ms': round(statement['total_ms'] / statement['count'], 3),
+                'max_ms': round(statement['max_ms'], 2),
+                'histogram_ms': dict(zip([f"<={bound}" for bound in GECIKME_KOVALARI_MS] + ['>'],
+                                         statement['histogram'])),
+            })
+            self._finished.append((phase, query, statement['total_ms'], statement['count']))
+        statements.sort(key=lambda item: item['total_ms'], reverse=True)
+        self._write({
+            'type': 'phase',
+            'phase': phase,
+            'rows': rows,
+            'seconds': round(elapsed, 3) if elapsed is not None else None,
+            'queries': sum(item['count'] for item in statements),
+            'retries': data['retries'],
+            'failed_rows': data['failed_rows'],
+            'errors': data['errors'],
+            'counters': data['counters'],
+            'statements': statements,
+        })
+
+        if not self.profile_slowest or driver is None:
+            return
+        slowest = sorted(((query, statement) for query, statement in data['statements'].items()
+                          if statement['slowest_params'] is not None),
+                         key=lambda item: item[1]['max_ms'], reverse=True)[:self.profile_slowest]
+        for query, statement in slowest:
+            try:
+                plan = self._profile(driver, query, statement['slowest_params'])
+            except Exception as e:
+                print(f"Uyarı: [{phase}] PROFILE alınamadı: {e}")
+                continue
+            self._write({'type': 'profile', 'phase': phase, 'query': query,
+                         'max_ms': round(statement['max_ms'], 2), 'plan': plan})
+            if plan:
+                hottest = _hottest_operator(plan)
+                print(f"[{phase}] PROFILE: en çok db hit {hottest['operator']} ({hottest['db_hits']}) "
+                      f"- {query[:80]}")
+
+    def close(self, driver=None, top=5):
+        # Bitmemiş aşamaları (satır satır yükleyici) yaz, en çok süre alan ifadeleri özetle
+        for phase in list(self._phases):
+            self.finish_phase(phase, driver=driver)
+        self._file.close()
+        if self._finished:
+            print(f"\nEn çok süre alan {top} sorgu ({self.log_path}):")
+            for phase, query, total_ms, count in sorted(self._finished, key=lambda item: item[2],
+                                                          reverse=True)[:top]:
+                print(f"  [{phase}] {total_ms / 1000:.2f} sn, {count} çağrı - {query[:90]}")
+
+
+class ImportCheckpoint:
+    """Yarıda kalan tam yüklemenin kaldığı yerden sürmesi için ilerleme kaydı.
+
+    Toplu yazımlarda parçalar girdi dosyası, batch size ve işçi sayısı aynı kaldıkça aynı
+    sırayla üretilir; bu yüzden konum olarak dosyadaki bayt yerine aşama ve kulvar başına
+    commit edilmiş parça sayısı (ve satır sayısı) tutulur. Dosya her commit'ten sonra
+    atomik olarak yeniden yazılır. Commit ile kayıt arasında kesilen bir parça yeniden
+    yazılır; tüm yazımlar MERGE/SET olduğundan bu zararsızdır.
+    """
+
+    def __init__(self, path, settings, sources, state=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = state or {'settings': settings, 'sources': sources, 'phases': {}}
+
+    @classmethod
+    def load(cls, path, settings, sources):
+        # Kayıt yoksa None; ayarlar ya da girdi dosyaları değiştiyse devam edilemez
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as file:
+            state = json.load(file)
+        if state.get('settings') != settings:
+            raise ValueError(f"{path} farklı ayarlarla oluşturulmuş: {state.get('settings')}")
+        if state.get('sources') != sources:
+            raise ValueError(f"{path} oluşturulduktan sonra girdi dosyaları değişmiş")
+        return cls(path, settings, sources, state)
+
+    def _save(self):
+        # Kilit tutulurken çağrılır
+        self.state['updated_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        _save_manifest(self.path, self.state)
+
+    def _phase(self, phase):
+        return self.state['phases'].setdefault(phase, {'done': False, 'rows': 0, 'lanes': {}, 'failed': []})
+
+    def phase_rows(self, phase):
+        # Aşama tamamlanmışsa yazılan satır sayısı, değilse None
+        with self._lock:
+            data = self.state['phases'].get(phase)
+            return data['rows'] if data and data['done'] else None
+
+    def lane_progress(self, phase, lane):
+        # (commit edilmiş parça sayısı, satır sayısı)
+        with self._lock:
+            data = self.state['phases'].get(phase)
+            progress = data['lanes'].get(str(lane)) if data else None
+            return (progress['chunks'], progress['rows']) if progress else (0, 0)
+
+    def commit(self, phase, lane, chunks, rows):
+        with self._lock:
+            self._phase(phase)['lanes'][str(lane)] = {'chunks': chunks, 'rows': rows}
+            self._save()
+
+    def fail(self, phase, lane, chunk, rows, error):
+        # Kalıcı (geçici olmayan) hatayla atlanan parça; sonraki çalıştırmada da atlanır
+        with self._lock:
+            self._phase(phase)['failed'].append({'lane': lane, 'chunk': chunk, 'rows': rows, 'error': str(error)})
+            self._save()
+
+    def finish_phase(self, phase, rows):
+        with self._lock:
+            data = self._phase(phase)
+            data.update(done=True, rows=rows)
+            self._save()
+
+    def summary(self):
+        with self._lock:
+            return [phase for phase, data in self.state['phases'].items() if data['done']]
+
+    def failed_rows(self):
+        # Önceki çalıştırmalar dahil kalıcı hatayla atlanan satırlar (devam edilirken yeniden denenmez)
+        with self._lock:
+            return sum(failure['rows'] for data in self.state['phases'].values() for failure in data['failed'])
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# Toplu yükleyicinin (Neo4jDatabase) ve async yükleyicinin (AsyncNeo4jDatabase) ortak UNWIND sorguları
+DURAK_SORGUSU = (
+    "UNWIND $rows AS row "
+    "MERGE (d:Durak {stop_id: row.stop_id}) "
+    "SET d.name = row.name, d.lat = row.lat, d.lon = row.lon, d.stop_code = row.stop_code, "
+    "d.konum = CASE WHEN row.lat <> 0 OR row.lon <> 0 "
+    "THEN point({latitude: row.lat, longitude: row.lon}) END"
+)
+# Noktalar sıralı geldiği için zincir, MERGE edilen düğümler üzerinden kurulur;
+# SONRAKI_NOKTA için ayrıca MATCH araması yapılmaz
+SHAPE_NOKTASI_SORGUSU = (
+    "UNWIND $rows AS shape "
+    "UNWIND range(0, size(shape.sequences) - 1) AS i "
+    "MERGE (p:ShapeNoktasi {shape_id_seq: shape.shape_id + '_' + toString(shape.sequences[i])}) "
+    "ON CREATE SET p.shape_id = shape.shape_id, p.sequence = shape.sequences[i] "
+    "SET p.lat = shape.lats[i], p.lng = shape.lngs[i] "
+    "WITH shape.shape_id AS shape_id, i, p ORDER BY i "
+    "WITH shape_id, collect(p) AS noktalar "
+    "UNWIND range(0, size(noktalar) - 2) AS j "
+    "WITH shape_id, noktalar[j] AS p1, noktalar[j + 1] AS p2 "
+    "MERGE (p1)-[:SONRAKI_NOKTA {shape_id: shape_id}]->(p2)"
+)
+HAT_SORGUSU = (
+    "UNWIND $rows AS row "
+    "MERGE (r:Hat {route_id: row.route_id}) "
+    "SET r.route_name = row.route_name, "
+    "    r.route_number = row.route_number, "
+    "    r.route_long_name = row.route_long_name, "
+    "    r.route_type = row.route_type, "
+    "    r.route_desc = row.route_desc, "
+    "    r.route_color = row.route_color, "
+    "    r.route_text_color = row.route_text_color, "
+    "    r.yön = row.direction"
+)
+GUZERGAH_SORGUSU = (
+    "UNWIND $rows AS row "
+    "MATCH (h:Hat {route_id: row.route_id}) "
+    "MATCH (d:Durak {stop_id: row.stop_id}) "
+    "MERGE (d)-[:GÜZERGAH_ÜZERINDE {yön: row.direction, sıra: row.sequence}]->(h)"
+)
+SONRAKI_DURAK_SORGUSU = (
+    "UNWIND $rows AS row "
+    "MATCH (s1:Durak {stop_id: row.stop_id1}) "
+    "MATCH (s2:Durak {stop_id: row.stop_id2}) "
+    "MERGE (s1)-[:SONRAKI_DURAK {hat: row.route_number, hat_id: row.route_id, "
+    "    yön: row.direction, sıra: row.order}]->(s2)"
+)
+KOMSU_DURAK_SORGUSU = (
+    "UNWIND $rows AS row "
+    "MATCH (d:Durak {stop_id: row.stop_id}) "
+    "SET d.komsu_duraklar = row.komsular, d.komsu_mesafeler = row.mesafeler"
+)
+CIZELGE_SORGUSU = (
+    "UNWIND $rows AS row "
+    "MATCH (r:Hat {route_id: row.route_id}) "
+    "SET r.weekday_times = row.weekday_times, "
+    "    r.saturday_times = row.saturday_times, "
+    "    r.sunday_times = row.sunday_times, "
+    "    r.direction = row.direction, "
+    "    r.route_short_name = row.route_short_name, "
+    "    r.schedule_notes = row.schedule_notes, "
+    "    r.weekday_dk = row.weekday_dk, "
+    "    r.saturday_dk = row.saturday_dk, "
+    "    r.sunday_dk = row.sunday_dk"
+)
+
+
+def _shape_params(shapes):
+    # Typed array'ler sürücüye gönderilmeden hemen önce listeye çevrilir
+    return ({'shape_id': shape['shape_id'], 'sequences': shape['sequences'].tolist(),
+             'lats': shape['lats'].tolist(), 'lngs': shape['lngs'].tolist()} for shape in shapes)
+
+
+def _route_rows(routes):
+    # (Hat satırları, GÜZERGAH_ÜZERINDE satırları, SONRAKI_DURAK satırları)
+    links = []
+    edges = []
+    for route in routes:
+        stops = route['stops']
+        for i, stop_id in enumerate(stops):
+            if stop_id:
+                links.append({'route_id': route['route_id'], 'stop_id': stop_id,
+                              'direction': route['direction'], 'sequence': i})
+        for i in range(len(stops) - 1):
+            if stops[i] and stops[i + 1]:
+                edges.append({'stop_id1': stops[i], 'stop_id2': stops[i + 1], 'route_id': route['route_id'],
+                              'route_number': route['route_number'], 'direction': route['direction'], 'order': i})
+    route_rows = [{key: value for key, value in route.items() if key != 'stops'} for route in routes]
+    return route_rows, links, edges
+
 
 class Neo4jDatabase:
-    def __init__(self, uri, user, password):
-        # Veritabanına bağlan
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri, user, password, workers=1, driver=None):
+        # Veritabanına bağlan; driver verilirse (ör. benchmark'ın sayaçlı sürücüsü) o kullanılır
+        self.driver = driver or GraphDatabase.driver(uri, auth=(user, password))
+        # Toplu yazımlarda paralel çalışan işçi (oturum) sayısı
+        self.workers = max(1, workers)
+        # enable_metrics ile açılan ölçüm katmanı (ImportMetrics)
+        self.metrics = None
+        # enable_checkpoint ile açılan ilerleme kaydı (ImportCheckpoint)
+        self.checkpoint = None
+        # Geçici hatalarda execute_write'ın dışında parça başına yeniden deneme sayısı
+        self.max_retries = VARSAYILAN_YENIDEN_DENEME
+        # Yazılamayıp atlanan satırlar; main bunlar varsa sıfırdan farklı kodla çıkar
+        self.failed_rows = 0
+        self._failure_lock = threading.Lock()
         self.verify_connection()
 
     def verify_connection(self):
@@ -26,16 +1235,79 @@ class Neo4jDatabase:
             print(f"Neo4j veritabanına bağlantı hatası: {e}")
             sys.exit(1)
 
+    def enable_metrics(self, log_path=VARSAYILAN_METRIK_GUNLUGU, profile_slowest=0):
+        # Sorgu süreleri, sayaçlar ve hatalar aşama başına log_path'e yazılır
+        self.metrics = ImportMetrics(log_path, profile_slowest)
+        return self.metrics
+
+    def enable_checkpoint(self, checkpoint):
+        # Toplu yazım ve parçalı silme aşamaları ilerlemeyi checkpoint'e yazar; tamamlanmış
+        # aşamalar atlanır, yarım kalanlar son commit edilen parçadan sürer
+        self.checkpoint = checkpoint
+
+    def _run(self, session, phase, query, **params):
+        # Satır satır yükleyicide tek sorgu; ölçüm açıksa süre ve sayaçlar kaydedilir
+        if self.metrics is None:
+            return session.run(query, **params)
+        started = time.perf_counter()
+        summary = session.run(query, **params).consume()
+        self.metrics.record_query(phase, query, time.perf_counter() - started, summary, params)
+
+    def _record_failure(self, phase, rows, error):
+        with self._failure_lock:
+            self.failed_rows += rows
+        if self.metrics is not None:
+            self.metrics.record_failure(phase, rows, error)
+
     def close(self):
         # Bağlantıyı kapat
+        if self.metrics is not None:
+            self.metrics.close(self.driver)
+            self.metrics = None
         self.driver.close()
         print("Veritabanı bağlantısı kapatıldı.")
 
-    def clear_database(self):
-        # Tüm veriyi sil
+    def _delete_in_chunks(self, query, batch_size, phase="Silme", **params):
+        # "... LIMIT $limit ... RETURN count(x) AS silinen" sorgusunu 0 kalana dek tekrarla;
+        # yarıda kesilirse kaldığı yerden sürmesi için yeniden çalıştırmak yeterlidir.
+        # params sorgunun diğer parametreleridir (ör. silinecek anahtarlar)
+        done = self.checkpoint.phase_rows(phase) if self.checkpoint else None
+        if done is not None:
+            print(f"[{phase}] önceki çalıştırmada tamamlanmış, atlanıyor.")
+            return done
+
+        def delete_chunk(tx):
+            started = time.perf_counter()
+            result = tx.run(query, limit=batch_size, **params)
+            deleted = result.single()["silinen"]
+            if self.metrics is not None:
+                self.metrics.record_query(phase, query, time.perf_counter() - started, result.consume(),
+                                          {'limit': batch_size, **params})
+            return deleted
+
+        total = 0
+        started = time.perf_counter()
         with self.driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
-            print("Veritabanı temizlendi.")
+            while True:
+                deleted = self._execute_write(session, phase, delete_chunk)
+                total += deleted
+                if deleted < batch_size:
+                    break
+        if self.checkpoint is not None:
+            self.checkpoint.finish_phase(phase, total)
+        if self.metrics is not None:
+            self.metrics.finish_phase(phase, total, time.perf_counter() - started, self.driver)
+        return total
+
+    def clear_database(self, batch_size=VARSAYILAN_SILME_BATCH_SIZE):
+        # Tüm veriyi parça parça sil (tek dev transaction yerine)
+        deleted = self._delete_in_chunks(
+            "MATCH ()-[r]->() WITH r LIMIT $limit DELETE r RETURN count(r) AS silinen", batch_size, "İlişki silme")
+        print(f"{deleted} ilişki silindi.")
+        deleted = self._delete_in_chunks(
+            "MATCH (n) WITH n LIMIT $limit DETACH DELETE n RETURN count(n) AS silinen", batch_size, "Düğüm silme")
+        print(f"{deleted} düğüm silindi.")
+        print("Veritabanı temizlendi.")
 
     def create_constraints(self):
         # Kısıtlamaları oluştur
@@ -43,6 +1315,7 @@ class Neo4jDatabase:
             session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (s:Durak) REQUIRE s.stop_id IS UNIQUE")
             session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (r:Hat) REQUIRE r.route_id IS UNIQUE")
             session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (p:ShapeNoktasi) REQUIRE p.shape_id_seq IS UNIQUE")
+            session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (s:Shape) REQUIRE s.shape_id IS UNIQUE")
             print("Kısıtlamalar oluşturuldu.")
 
     def create_indexes(self):
@@ -51,310 +1324,965 @@ class Neo4jDatabase:
             session.run("CREATE INDEX IF NOT EXISTS FOR (s:Durak) ON (s.name)")
             session.run("CREATE INDEX IF NOT EXISTS FOR (r:Hat) ON (r.route_name)")
             session.run("CREATE INDEX IF NOT EXISTS FOR (s:Durak) ON (s.lat, s.lon)")
+            # Yakın durak sorguları (point.distance(d.konum, ...) <= r) bu indeksi kullanır
+            session.run("CREATE POINT INDEX IF NOT EXISTS FOR (s:Durak) ON (s.konum)")
+            session.run("CREATE INDEX IF NOT EXISTS FOR (p:ShapeNoktasi) ON (p.shape_id)")
             print("İndeksler oluşturuldu.")
     
     def import_stops(self, file_path):
         # Durakları yükle
-        if not os.path.exists(file_path):
+        if not _source_exists(file_path):
             print(f"Hata: {file_path} dosyası bulunamadı!")
-            return
+            return 0
 
-        with self.driver.session() as session:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                csv_reader = csv.DictReader(file)
-                count = 0
-                for row in csv_reader:
-                    try:
-                        required_columns = ['stop_id', 'stop_name', 'stop_lat', 'stop_lon']
-                        for col in required_columns:
-                            if col not in row:
-                                print(f"Uyarı: {col} sütunu bulunamadı. Satır atlanıyor: {row}")
-                                continue
+        rows = _row_source(file_path, DurakSatiri, DURAK_SUTUNLARI)
+        if rows is None:
+            return 0
 
-                        query = (
-                            "MERGE (d:Durak {stop_id: $stop_id}) "
-                            "ON CREATE SET d.name = $name, d.lat = $lat, d.lon = $lon, d.stop_code = $stop_code "
-                            "ON MATCH SET d.name = $name, d.lat = $lat, d.lon = $lon, d.stop_code = $stop_code"
-                        )
-                        
-                        try:
-                            lat = float(row['stop_lat']) if row['stop_lat'] else 0
-                            lon = float(row['stop_lon']) if row['stop_lon'] else 0
-                        except ValueError:
-                            print(f"Uyarı: Geçersiz koordinat değerleri - {row['stop_lat']}, {row['stop_lon']} - Satır atlanıyor: {row}")
-                            continue
-                        
-                        session.run(query, 
-                                    stop_id=row['stop_id'], 
-                                    name=row['stop_name'], 
-                                    lat=lat,
-                                    lon=lon,
-                                    stop_code=row.get('stop_code', ''))
-                        count += 1
-                        
-                        if count % 1000 == 0:
-                            print(f"{count} durak işlendi...")
+        query = (
+            "MERGE (d:Durak {stop_id: $stop_id}) "
+            "ON CREATE SET d.name = $name, d.lat = $lat, d.lon = $lon, d.stop_code = $stop_code "
+            "ON MATCH SET d.name = $name, d.lat = $lat, d.lon = $lon, d.stop_code = $stop_code "
+            # Koordinatı olmayan (0, 0) duraklara konum yazılmaz
+            "SET d.konum = CASE WHEN $lat <> 0 OR $lon <> 0 THEN point({latitude: $lat, longitude: $lon}) END"
+        )
+        with self.driver.session() as session:
+            count = 0
+            for row in rows:
+                try:
+                    self._run(session, "Duraklar", query,
+                                stop_id=row.stop_id, 
+                                name=row.name, 
+                                lat=row.lat,
+                                lon=row.lon,
+                                stop_code=row.stop_code)
+                    count += 1
                     
-                    except Exception as e:
-                        print(f"Hata: Durak eklenirken bir sorun oluştu: {e} - Satır: {row}")
+                    if count % 1000 == 0:
+                        print(f"{count} durak işlendi...")
                 
-                print(f"Toplam {count} durak veritabanına eklendi.")
+                except Exception as e:
+                    print(f"Hata: Durak eklenirken bir sorun oluştu: {e} - Satır: {row}")
+                    self._record_failure("Duraklar", 1, e)
+            
+            print(f"Toplam {count} durak veritabanına eklendi.")
+            return count
     
     def import_shapes(self, file_path):
         """Hat şekil verilerini içeri aktarır."""
-        if not os.path.exists(file_path):
+        if not _source_exists(file_path):
             print(f"Hata: {file_path} dosyası bulunamadı!")
-            return
+            return 0
+
+        rows = _row_source(file_path, ShapeSatiri, SHAPE_SUTUNLARI)
+        if rows is None:
+            return 0
 
+        query = (
+            "MERGE (p:ShapeNoktasi {shape_id_seq: $shape_id_seq}) "
+            "ON CREATE SET p.shape_id = $shape_id, p.lat = $lat, p.lng = $lng, p.sequence = $sequence "
+            "ON MATCH SET p.lat = $lat, p.lng = $lng"
+        )
+        relation_query = (
+            "MATCH (p1:ShapeNoktasi {shape_id_seq: $prev_id}), "
+            "      (p2:ShapeNoktasi {shape_id_seq: $curr_id}) "
+            "MERGE (p1)-[r:SONRAKI_NOKTA {shape_id: $shape_id}]->(p2)"
+        )
         with self.driver.session() as session:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                csv_reader = csv.DictReader(file)
-                count = 0
-                shape_count = {}  # Shape başına nokta sayısı
-                
-                for row in csv_reader:
-                    try:
-                        required_columns = ['shape_id', 'shape_pt_lat', 'shape_pt_lon', 'shape_pt_sequence']
-                        for col in required_columns:
-                            if col not in row:
-                                print(f"Uyarı: {col} sütunu bulunamadı. Satır atlanıyor: {row}")
-                                continue
-                        
-                        shape_id = row['shape_id']
-                        sequence = int(row['shape_pt_sequence'])
-                        
-                        if shape_id not in shape_count:
-                            shape_count[shape_id] = 0
-                        shape_count[shape_id] += 1
-                        
-                        shape_id_seq = f"{shape_id}_{sequence}"
-                        
-                        # Koordinatları kontrol et
-                        try:
-                            lat = float(row['shape_pt_lat'])
-                            lon = float(row['shape_pt_lon'])
-                        except ValueError:
-                            print(f"Uyarı: Geçersiz koordinat değerleri - {row['shape_pt_lat']}, {row['shape_pt_lon']} - Satır atlanıyor")
-                            continue
-                        
-                        query = (
-                            "MERGE (p:ShapeNoktasi {shape_id_seq: $shape_id_seq}) "
-                            "ON CREATE SET p.shape_id = $shape_id, p.lat = $lat, p.lng = $lng, p.sequence = $sequence "
-                            "ON MATCH SET p.lat = $lat, p.lng = $lng"
-                        )
-                        session.run(query, 
-                                    shape_id_seq=shape_id_seq,
-                                    shape_id=shape_id,
-                                    lat=lat,
-                                    lng=lon,
-                                    sequence=sequence)
-                        
-                        # Noktaları bağla
-                        if sequence > 0:
-                            prev_shape_id_seq = f"{shape_id}_{sequence-1}"
-                            relation_query = (
-                                "MATCH (p1:ShapeNoktasi {shape_id_seq: $prev_id}), "
-                                "      (p2:ShapeNoktasi {shape_id_seq: $curr_id}) "
-                                "MERGE (p1)-[r:SONRAKI_NOKTA {shape_id: $shape_id}]->(p2)"
-                            )
-                            session.run(relation_query,
-                                        prev_id=prev_shape_id_seq,
-                                        curr_id=shape_id_seq,
-                                        shape_id=shape_id)
-                        
-                        count += 1
-                        # Durum bilgisi
-                        if count % 10000 == 0:
-                            print(f"{count} shape noktası işlendi...")
+            count = 0
+            shape_count = {}  # Shape başına nokta sayısı
+            
+            for row in rows:
+                try:
+                    shape_id = row.shape_id
+                    sequence = row.sequence
+                    shape_count[shape_id] = shape_count.get(shape_id, 0) + 1
+                    shape_id_seq = f"{shape_id}_{sequence}"
                     
-                    except Exception as e:
-                        print(f"Hata: Shape noktası eklenirken bir sorun oluştu: {e} - Satır: {row}")
+                    self._run(session, "Shape noktaları", query,
+                                shape_id_seq=shape_id_seq,
+                                shape_id=shape_id,
+                                lat=row.lat,
+                                lng=row.lon,
+                                sequence=sequence)
+                    
+                    # Noktaları bağla
+                    if sequence > 0:
+                        self._run(session, "Shape noktaları", relation_query,
+                                    prev_id=f"{shape_id}_{sequence-1}",
+                                    curr_id=shape_id_seq,
+                                    shape_id=shape_id)
+                    
+                    count += 1
+                    # Durum bilgisi
+                    if count % 10000 == 0:
+                        print(f"{count} shape noktası işlendi...")
                 
-                print(f"Toplam {count} shape noktası, {len(shape_count)} benzersiz shape için veritabanına eklendi.")
-                top_shapes = sorted(shape_count.items(), key=lambda x: x[1], reverse=True)[:5]
-                print("En çok noktaya sahip 5 shape:")
-                for shape_id, point_count in top_shapes:
-                    print(f"  {shape_id}: {point_count} nokta")
+                except Exception as e:
+                    print(f"Hata: Shape noktası eklenirken bir sorun oluştu: {e} - Satır: {row}")
+                    self._record_failure("Shape noktaları", 1, e)
+            
+            print(f"Toplam {count} shape noktası, {len(shape_count)} benzersiz shape için veritabanına eklendi.")
+            top_shapes = sorted(shape_count.items(), key=lambda x: x[1], reverse=True)[:5]
+            print("En çok noktaya sahip 5 shape:")
+            for shape_id, point_count in top_shapes:
+                print(f"  {shape_id}: {point_count} nokta")
+            return count
     
     def import_routes(self, file_path):
         # Hatları yükle
-        if not os.path.exists(file_path):
+        if not _source_exists(file_path):
             print(f"Hata: {file_path} dosyası bulunamadı!")
-            return
+            return 0
+
+        rows = _row_source(file_path, HatSatiri, HAT_SUTUNLARI)
+        if rows is None:
+            return 0
 
+        query = (
+            "MERGE (r:Hat {route_id: $route_id}) "
+            "ON CREATE SET r.route_name = $route_name, "
+            "    r.route_number = $route_number, "
+            "    r.route_long_name = $route_long_name, "
+            "    r.route_type = $route_type, "
+            "    r.route_desc = $route_desc, "
+            "    r.route_color = $route_color, "
+            "    r.route_text_color = $route_text_color, "
+            "    r.yön = $direction "
+            "ON MATCH SET r.route_name = $route_name, "
+            "    r.route_number = $route_number, "
+            "    r.route_long_name = $route_long_name, "
+            "    r.route_type = $route_type, "
+            "    r.route_desc = $route_desc, "
+            "    r.route_color = $route_color, "
+            "    r.route_text_color = $route_text_color, "
+            "    r.yön = $direction"
+        )
         with self.driver.session() as session:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                csv_reader = csv.DictReader(file)
-                count = 0
-                
-                for row in csv_reader:
-                    try:
-                        # Gerekli sütunların varlığını kontrol et
-                        if 'route_id' not in row or 'stops' not in row:
-                            print(f"Uyarı: Gerekli sütunlar bulunamadı. Satır atlanıyor: {row}")
-                            continue
-                        
-                        route_id = row['route_id']
-                        direction = 'Gidiş' if route_id.endswith('0') else 'Dönüş'
-                        
-                        route_number = row.get('route_short_name', '')
-                        route_name = row.get('route_long_name', '')
-                        
-                        query = (
-                            "MERGE (r:Hat {route_id: $route_id}) "
-                            "ON CREATE SET r.route_name = $route_name, "
-                            "    r.route_number = $route_number, "
-                            "    r.route_long_name = $route_long_name, "
-                            "    r.route_type = $route_type, "
-                            "    r.route_desc = $route_desc, "
-                            "    r.route_color = $route_color, "
-                            "    r.route_text_color = $route_text_color, "
-                            "    r.yön = $direction "
-                            "ON MATCH SET r.route_name = $route_name, "
-                            "    r.route_number = $route_number, "
-                            "    r.route_long_name = $route_long_name, "
-                            "    r.route_type = $route_type, "
-                            "    r.route_desc = $route_desc, "
-                            "    r.route_color = $route_color, "
-                            "    r.route_text_color = $route_text_color, "
-                            "    r.yön = $direction"
-                        )
-                        session.run(query,
-                                    route_id=route_id,
-                                    route_number=route_number,
-                                    route_name=route_name,
-                                    route_long_name=row.get('route_long_name', ''),
-                                    route_type=row.get('route_type', ''),
-                                    route_desc=row.get('route_desc', ''),
-                                    route_color=row.get('route_color', ''),
-                                    route_text_color=row.get('route_text_color', ''),
-                                    direction=direction)
+            count = 0
+            
+            for row in rows:
+                try:
+                    route_id = row.route_id
+                    direction = 'Gidiş' if route_id.endswith('0') else 'Dönüş'
+                    route_number = row.route_short_name
+                    
+                    self._run(session, "Hatlar", query,
+                                route_id=route_id,
+                                route_number=route_number,
+                                route_name=row.route_long_name,
+                                route_long_name=row.route_long_name,
+                                route_type=row.route_type,
+                                route_desc=row.route_desc,
+                                route_color=row.route_color,
+                                route_text_color=row.route_text_color,
+                                direction=direction)
+                    
+                    # Durak-Hat ilişkileri
+                    stops_str = row.stops.strip('"')
+                    if stops_str:
+                        stops = stops_str.split(',')
                         
-                        # Durak-Hat ilişkileri
-                        if 'stops' in row and row['stops']:
-                            stops_str = row['stops'].strip('"')
-                            if stops_str:
-                                stops = stops_str.split(',')
-                                
-                                for i, stop_id in enumerate(stops):
-                                    if not stop_id or stop_id.strip() == '':
-                                        continue
-                                    
-                                    session.run("""
-                                        MATCH (h:Hat {route_id: $route_id})
-                                        MATCH (d:Durak {stop_id: $stop_id})
-                                        MERGE (d)-[r:GÜZERGAH_ÜZERINDE {yön: $direction, sıra: $sequence}]->(h)
-                                    """, route_id=route_id, stop_id=stop_id.strip(), direction=direction, sequence=i)
-                                
-                                for i in range(len(stops) - 1):
-                                    stop_id1 = stops[i].strip()
-                                    stop_id2 = stops[i + 1].strip()
-                                    
-                                    if not stop_id1 or not stop_id2 or stop_id1 == '' or stop_id2 == '':
-                                        continue
-                                    
-                                    session.run("""
-                                        MATCH (s1:Durak {stop_id: $stop_id1})
-                                        MATCH (s2:Durak {stop_id: $stop_id2})
-                                        MERGE (s1)-[r:SONRAKI_DURAK {
-                                            hat: $route_number,
-                                            hat_id: $route_id,
-                                            yön: $direction,
-                                            sıra: $order
-                                        }]->(s2)
-                                    """, 
-                                    stop_id1=stop_id1,
-                                    stop_id2=stop_id2,
-                                    route_id=route_id,
-                                    route_number=route_number,
-                                    direction=direction,
-                                    order=i)
+                        for i, stop_id in enumerate(stops):
+                            if not stop_id or stop_id.strip() == '':
+                                continue
+                            
+                            self._run(session, "Hatlar", """
+                                MATCH (h:Hat {route_id: $route_id})
+                                MATCH (d:Durak {stop_id: $stop_id})
+                                MERGE (d)-[r:GÜZERGAH_ÜZERINDE {yön: $direction, sıra: $sequence}]->(h)
+                            """, route_id=route_id, stop_id=stop_id.strip(), direction=direction, sequence=i)
                         
-                        count += 1
-                        # Durum bilgisi
-                        if count % 100 == 0:
-                            print(f"{count} hat işlendi...")
+                        for i in range(len(stops) - 1):
+                            stop_id1 = stops[i].strip()
+                            stop_id2 = stops[i + 1].strip()
+                            
+                            if not stop_id1 or not stop_id2:
+                                continue
+                            
+                            self._run(session, "Hatlar", """
+                                MATCH (s1:Durak {stop_id: $stop_id1})
+                                MATCH (s2:Durak {stop_id: $stop_id2})
+                                MERGE (s1)-[r:SONRAKI_DURAK {
+                                    hat: $route_number,
+                                    hat_id: $route_id,
+                                    yön: $direction,
+                                    sıra: $order
+                                }]->(s2)
+                            """, 
+                            stop_id1=stop_id1,
+                            stop_id2=stop_id2,
+                            route_id=route_id,
+                            route_number=route_number,
+                            direction=direction,
+                            order=i)
                     
-                    except Exception as e:
-                        print(f"Hata: Hat eklenirken bir sorun oluştu: {e} - Satır: {row}")
+                    count += 1
+                    # Durum bilgisi
+                    if count % 100 == 0:
+                        print(f"{count} hat işlendi...")
                 
-                print(f"Toplam {count} hat veritabanına eklendi.")
+                except Exception as e:
+                    print(f"Hata: Hat eklenirken bir sorun oluştu: {e} - Satır: {row}")
+                    self._record_failure("Hatlar", 1, e)
+            
+            print(f"Toplam {count} hat veritabanına eklendi.")
+            return count
     
     def import_schedules(self, file_path):
         # Zaman çizelgelerini yükle
-        if not os.path.exists(file_path):
+        if not _source_exists(file_path):
             print(f"Hata: {file_path} dosyası bulunamadı!")
-            return
+            return 0
+
+        rows = _row_source(file_path, CizelgeSatiri, CIZELGE_SUTUNLARI)
+        if rows is None:
+            return 0
 
+        query = (
+            "MATCH (r:Hat {route_id: $route_id}) "
+            "SET r.weekday_times = $weekday_times, "
+            "    r.saturday_times = $saturday_times, "
+            "    r.sunday_times = $sunday_times, "
+            "    r.direction = $direction, "  # Direction bilgisini veritabanına kaydet
+            "    r.route_short_name = $route_short_name, "  # Route short name bilgisini ekle
+            "    r.schedule_notes = $schedule_notes "
+        )
         with self.driver.session() as session:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                csv_reader = csv.DictReader(file)
-                count = 0
-                
-                for row in csv_reader:
-                    try:
-                        if 'route_id' not in row:
-                            print(f"Uyarı: route_id sütunu bulunamadı. Satır atlanıyor: {row}")
-                            continue
-                        
-                        route_id = row['route_id']
-                        
-                        direction = row.get('direction', '')
-                        if not direction:
-                            if route_id.endswith('0'):
-                                direction = 'Gidiş'
-                            else:
-                                direction = 'Dönüş'
-                        
-                        query = (
-                            "MATCH (r:Hat {route_id: $route_id}) "
-                            "SET r.weekday_times = $weekday_times, "
-                            "    r.saturday_times = $saturday_times, "
-                            "    r.sunday_times = $sunday_times, "
-                            "    r.direction = $direction, "  # Direction bilgisini veritabanına kaydet
-                            "    r.route_short_name = $route_short_name, "  # Route short name bilgisini ekle
-                            "    r.schedule_notes = $schedule_notes "
-                        )
-                        
-                        session.run(query,
-                                    route_id=route_id,
-                                    weekday_times=row.get('weekday_times', ''),
-                                    saturday_times=row.get('saturday_times', ''),
-                                    sunday_times=row.get('sunday_times', ''),
-                                    schedule_notes=row.get('color_notes', ''),
-                                    route_short_name=row.get('route_short_name', ''),  # route_short_name değerini ekle
-                                    direction=direction)  # Direction değerini parametre olarak ekle
-                        
-                        count += 1
-                        # Durum bilgisi
-                        if count % 50 == 0:
-                            print(f"{count} hat için zaman çizelgesi işlendi...")
+            count = 0
+            
+            for row in rows:
+                try:
+                    route_id = row.route_id
+                    direction = row.direction
+                    if not direction:
+                        direction = 'Gidiş' if route_id.endswith('0') else 'Dönüş'
                     
-                    except Exception as e:
-                        print(f"Hata: Zaman çizelgesi eklenirken bir sorun oluştu: {e} - Satır: {row}")
+                    self._run(session, "Zaman çizelgeleri", query,
+                                route_id=route_id,
+                                weekday_times=row.weekday_times,
+                                saturday_times=row.saturday_times,
+                                sunday_times=row.sunday_times,
+                                schedule_notes=row.color_notes,
+                                route_short_name=row.route_short_name,
+                                direction=direction)
+                    
+                    count += 1
+                    # Durum bilgisi
+                    if count % 50 == 0:
+                        print(f"{count} hat için zaman çizelgesi işlendi...")
                 
-                print(f"Toplam {count} hat için zaman çizelgesi bilgileri eklendi.")
+                except Exception as e:
+                    print(f"Hata: Zaman çizelgesi eklenirken bir sorun oluştu: {e} - Satır: {row}")
+                    self._record_failure("Zaman çizelgeleri", 1, e)
+            
+            print(f"Toplam {count} hat için zaman çizelgesi bilgileri eklendi.")
+            return count
     
+    def _write_batches(self, phase, rows, batch_size, *queries, partition_key=None):
+        # Satırları parçalara ayır, her parçayı tek bir yazma transaction'ında gönder.
+        # partition_key verilirse (satırın kilitlediği düğüm ya da ilişkinin iki ucu) satırlar
+        # işçilere aynı anda hiçbir düğümü ortak kilitlemeyecek turlar halinde dağıtılır
+        if partition_key is None or self.workers == 1:
+            return self._write_chunks(phase, _chunked(rows, batch_size), *queries)
+
+        rounds = [[_chunked(lane, batch_size) for lane in lanes]
+                  for lanes in _lock_disjoint_rounds(rows, self.workers, partition_key)]
+        return self._write_rounds(phase, rounds, queries, len)
+
+    def _write_chunks(self, phase, chunks, *queries, size_of=len):
+        # Birbirinden bağımsız parçaları yaz; size_of parçadaki satır sayısını verir
+        if self.workers == 1:
+            return self._write_lanes(phase, [chunks], queries, size_of)
+        chunks = list(chunks)
+        lanes = [chunks[i::self.workers] for i in range(self.workers)]
+        return self._write_lanes(phase, lanes, queries, size_of)
+
+    def _execute_write(self, session, phase, work):
+        # execute_write geçici hataları kendi içinde yeniden dener; onun da vazgeçtiği geçici
+        # hatalar (ör. Neo4j yeniden başlatılırken) artan beklemeyle max_retries kez daha denenir
+        attempt = 0
+        while True:
+            try:
+                return session.execute_write(work)
+            except GECICI_HATALAR as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = min(YENIDEN_DENEME_BEKLEMESI_SN * 2 ** attempt, EN_UZUN_BEKLEME_SN)
+                attempt += 1
+                print(f"Uyarı: [{phase}] geçici hata, {delay:.0f} sn sonra yeniden denenecek "
+                      f"({attempt}/{self.max_retries}): {e}")
+                if self.metrics is not None:
+                    self.metrics.record_retry(phase)
+                time.sleep(delay)
+
+    def _write_lane(self, phase, chunks, queries, size_of, lane=0):
+        # Bir işçinin parçalarını kendi oturumunda sırayla yaz; checkpoint varsa önceki
+        # çalıştırmada commit edilmiş parçalar atlanır
+        skip, count = self.checkpoint.lane_progress(phase, lane) if self.checkpoint else (0, 0)
+        with self.driver.session() as session:
+            for index, chunk in enumerate(chunks):
+                if index < skip:
+                    continue
+                # execute_write geçici hatalarda fonksiyonu yeniden çağırır; denemeler sayılır
+                attempts = [0]
+
+                def work(tx):
+                    attempts[0] += 1
+                    _run_unwind(tx, queries, chunk, self.metrics, phase)
+
+                try:
+                    self._execute_write(session, phase, work)
+                    count += size_of(chunk)
+                except GECICI_HATALAR as e:
+                    # Checkpoint varken atlayıp devam etmek parçayı kaybettirir; --resume ile sürdürülür
+                    if self.checkpoint is not None:
+                        raise
+                    print(f"Hata: {phase} parçası yazılırken bir sorun oluştu ({size_of(chunk)} satır): {e}")
+                    self._record_failure(phase, size_of(chunk), e)
+                except Exception as e:
+                    print(f"Hata: {phase} parçası yazılırken bir sorun oluştu ({size_of(chunk)} satır): {e}")
+                    self._record_failure(phase, size_of(chunk), e)
+                    if self.checkpoint is not None:
+                        self.checkpoint.fail(phase, lane, index, size_of(chunk), e)
+                finally:
+                    if attempts[0] > 1 and self.metrics is not None:
+                        self.metrics.record_retry(phase, attempts[0] - 1)
+                if self.checkpoint is not None:
+                    self.checkpoint.commit(phase, lane, index + 1, count)
+        return count
+
+    def _write_lanes(self, phase, lanes, queries, size_of):
+        # Her kulvar bir işçide çalışır; tek kulvar varsa iş parçacığı açılmaz
+        return self._write_rounds(phase, [lanes], queries, size_of)
+
+    def _write_rounds(self, phase, rounds, queries, size_of):
+        # Turlar sırayla, her turun kulvarları aynı anda yazılır; checkpoint'te kulvarlar
+        # turlar boyunca artan numaralarla tutulur
+        done = self.checkpoint.phase_rows(phase) if self.checkpoint else None
+        if done is not None:
+            print(f"[{phase}] önceki çalıştırmada tamamlanmış ({done} satır), atlanıyor.")
+            return done
+
+        started = time.perf_counter()
+        count = 0
+        first_lane = 0
+        for lanes in rounds:
+            if len(lanes) == 1:
+                count += self._write_lane(phase, lanes[0], queries, size_of, first_lane)
+            else:
+                with ThreadPoolExecutor(max_workers=len(lanes)) as executor:
+                    futures = [executor.submit(self._write_lane, phase, chunks, queries, size_of, first_lane + lane)
+                               for lane, chunks in enumerate(lanes)]
+                    count += sum(future.result() for future in futures)
+            first_lane += len(lanes)
+        elapsed = time.perf_counter() - started
+        if self.checkpoint is not None:
+            self.checkpoint.finish_phase(phase, count)
+        _report_throughput(phase, count, elapsed)
+        if self.metrics is not None:
+            self.metrics.finish_phase(phase, count, elapsed, self.driver)
+        return count
+
+    def write_stops(self, rows, batch_size=VARSAYILAN_BATCH_SIZE):
+        # Durakları UNWIND ile parça parça yaz
+        return self._write_batches("Duraklar", (row._asdict() for row in rows), batch_size, DURAK_SORGUSU)
+
+    def write_shapes(self, shapes, batch_size=VARSAYILAN_BATCH_SIZE):
+        # Noktaları shape'leri bölmeden parçalara ayırıp yaz
+        return self._write_chunks("Shape noktaları", _chunked_shapes(_shape_params(shapes), batch_size),
+                                  SHAPE_NOKTASI_SORGUSU, size_of=_count_shape_points)
+
+    def write_shapes_compact(self, shapes, tolerance=VARSAYILAN_SHAPE_TOLERANSI, encoding='arrays',
+                             batch_size=VARSAYILAN_BATCH_SIZE):
+        # Shape'leri sadeleştirip tek bir Shape düğümünde sakla
+        rows = []
+        total_points = 0
+        total_kept = 0
+        total_saved = 0
+        print(f"Douglas-Peucker toleransı: {tolerance} m, saklama biçimi: {encoding}")
+        for shape in shapes:
+            keep = _douglas_peucker(shape['lats'], shape['lngs'], tolerance)
+            lats = [shape['lats'][i] for i in keep]
+            lngs = [shape['lngs'][i] for i in keep]
+            row = {'shape_id': shape['shape_id'], 'point_count': len(shape['lats']), 'tolerance': float(tolerance),
+                   'lats': None, 'lngs': None, 'polyline': None}
+            # Nokta başına iki float64 (16 bayt) ile karşılaştır
+            original_bytes = 16 * len(shape['lats'])
+            if encoding == 'polyline':
+                row['polyline'] = _encode_polyline(lats, lngs)
+                stored_bytes = len(row['polyline'])
+            else:
+                row['lats'] = lats
+                row['lngs'] = lngs
+                stored_bytes = 16 * len(lats)
+            rows.append(row)
+
+            total_points += len(shape['lats'])
+            total_kept += len(lats)
+            total_saved += original_bytes - stored_bytes
+            ratio = 1 - len(lats) / len(shape['lats'])
+            print(f"  {shape['shape_id']}: {len(shape['lats'])} -> {len(lats)} nokta "
+                  f"(%{ratio * 100:.1f} azalma), {original_bytes - stored_bytes} bayt tasarruf")
+
+        query = (
+            "UNWIND $rows AS row "
+            "MERGE (s:Shape {shape_id: row.shape_id}) "
+            "SET s.lats = row.lats, s.lngs = row.lngs, s.polyline = row.polyline, "
+            "    s.nokta_sayisi = row.point_count, s.tolerans = row.tolerance"
+        )
+        count = self._write_batches("Shape", rows, batch_size, query)
+
+        if total_points:
+            print(f"Toplam {count} shape kaydedildi: {total_points} -> {total_kept} nokta "
+                  f"(%{(1 - total_kept / total_points) * 100:.1f} azalma), {total_saved} bayt tasarruf.")
+        return count
+
+    def write_routes(self, routes, batch_size=VARSAYILAN_BATCH_SIZE, edge_model='per-route'):
+        # Hatları, güzergah ilişkilerini ve SONRAKI_DURAK kenarlarını ayrı aşamalarda yaz;
+        # edge_model 'aggregated' ise hat başına kenarlar yazılmaz (bkz. build_aggregated_edges)
+        route_rows, links, edges = _route_rows(routes)
+        count = self._write_batches("Hatlar", route_rows, batch_size, HAT_SORGUSU)
+        # İlişki eklemek iki ucu da kilitler; işçiler iki uca göre bölüştürülür
+        self._write_batches("GÜZERGAH_ÜZERINDE", links, batch_size, GUZERGAH_SORGUSU,
+                            partition_key=_link_lock_keys)
+        if edge_model != 'aggregated':
+            self._write_batches("SONRAKI_DURAK", edges, batch_size, SONRAKI_DURAK_SORGUSU,
+                                partition_key=_pair_lock_keys)
+        return count
+
+    def write_schedules(self, rows, batch_size=VARSAYILAN_BATCH_SIZE):
+        # Zaman çizelgelerini ilgili Hat düğümlerine yaz
+        return self._write_batches("Zaman çizelgeleri", rows, batch_size, CIZELGE_SORGUSU)
+
+    def import_stops_batched(self, file_path, batch_size=VARSAYILAN_BATCH_SIZE, rows=None):
+        # Durakları UNWIND ile parça parça yükle; rows verilirse (ön denetimden geçmiş) dosya okunmaz
+        if rows is None and not _source_exists(file_path):
+            print(f"Hata: {file_path} dosyası bulunamadı!")
+            return 0
+
+        if rows is None:
+            rows = _read_stops(file_path)
+        if rows is None:
+            return 0
+        count = self.write_stops(rows, batch_size)
+        print(f"Toplam {count} durak veritabanına eklendi.")
+        return count
+
+    def import_shapes_batched(self, file_path, batch_size=VARSAYILAN_BATCH_SIZE, shapes=None):
+        """Hat şekil verilerini shape başına tek bir toplu sorgu ile içeri aktarır."""
+        if shapes is None and not _source_exists(file_path):
+            print(f"Hata: {file_path} dosyası bulunamadı!")
+            return 0
+
+        if shapes is None:
+            shapes = _read_shapes(file_path)
+        if shapes is None:
+            return 0
+        count = self.write_shapes(shapes, batch_size)
+        print(f"Toplam {count} shape noktası, {len(shapes)} benzersiz shape için veritabanına eklendi.")
+        top_shapes = sorted(shapes, key=lambda shape: len(shape['sequences']), reverse=True)[:5]
+        print("En çok noktaya sahip 5 shape:")
+        for shape in top_shapes:
+            print(f"  {shape['shape_id']}: {len(shape['sequences'])} nokta")
+        return count
+
+    def import_shapes_compact(self, file_path, tolerance=VARSAYILAN_SHAPE_TOLERANSI, encoding='arrays',
+                              batch_size=VARSAYILAN_BATCH_SIZE, shapes=None):
+        """Her shape'i sadeleştirip tek bir Shape düğümünde dizi ya da encoded polyline olarak saklar."""
+        if shapes is None and not _source_exists(file_path):
+            print(f"Hata: {file_path} dosyası bulunamadı!")
+            return 0
+
+        if shapes is None:
+            shapes = _read_shapes(file_path)
+        if shapes is None:
+            return 0
+        return self.write_shapes_compact(shapes, tolerance, encoding, batch_size)
+
+    def link_shapes_to_routes(self):
+        # Kompakt Shape düğümlerini hatlara bağla (shape_id, route_id ile aynıdır;
+        # değilse hatController'daki gibi önek + yön hanesine göre eşleştir)
+        with self.driver.session() as session:
+            session.run("""
+                MATCH (s:Shape)
+                MATCH (h:Hat {route_id: s.shape_id})
+                MERGE (h)-[:SHAPE_ICERIYOR]->(s)
+            """)
+            session.run("""
+                MATCH (h:Hat)
+                WHERE NOT (h)-[:SHAPE_ICERIYOR]->(:Shape)
+                MATCH (s:Shape)
+                WHERE s.shape_id STARTS WITH left(h.route_id, size(h.route_id) - 1)
+                  AND right(s.shape_id, 1) = right(h.route_id, 1)
+                WITH h, s ORDER BY s.shape_id
+                WITH h, collect(s)[0] AS s
+                MERGE (h)-[:SHAPE_ICERIYOR]->(s)
+            """)
+            count = session.run("MATCH (:Hat)-[r:SHAPE_ICERIYOR]->(:Shape) RETURN COUNT(r) as count").single()["count"]
+            print(f"{count} hat kompakt shape ile ilişkilendirildi.")
+
+    def import_routes_batched(self, file_path, batch_size=VARSAYILAN_BATCH_SIZE, edge_model='per-route',
+                              routes=None):
+        # Hatları toplu yükle
+        if routes is None and not _source_exists(file_path):
+            print(f"Hata: {file_path} dosyası bulunamadı!")
+            return 0
+
+        if routes is None:
+            routes = _read_routes(file_path)
+        if routes is None:
+            return 0
+        count = self.write_routes(routes, batch_size, edge_model)
+        print(f"Toplam {count} hat veritabanına eklendi.")
+        per_route, aggregated, parallel = _edge_model_counts(routes)
+        print(f"Kenar sayısı: hat başına modelde {per_route} SONRAKI_DURAK, durak çifti başına modelde "
+              f"{aggregated} DURAK_BAGLANTISI (bir çift arasında en fazla {parallel} paralel kenar).")
+        return count
+
+    def import_schedules_batched(self, file_path, batch_size=VARSAYILAN_BATCH_SIZE, routes_file=None, rows=None):
+        # Zaman çizelgelerini toplu yükle
+        if rows is None and not _source_exists(file_path):
+            print(f"Hata: {file_path} dosyası bulunamadı!")
+            return 0
+
+        if rows is None:
+            rows = _read_schedules(file_path, routes_file)
+        if rows is None:
+            return 0
+        count = self.write_schedules(rows, batch_size)
+        print(f"Toplam {count} hat için zaman çizelgesi bilgileri eklendi.")
+        return count
+
+    def _delete_batches(self, phase, keys, batch_size, query):
+        # Silinecek anahtarları parça parça gönder
+        rows = [{'key': key} for key in keys]
+        return self._write_batches(phase, rows, batch_size, query)
+
+    def delete_stops(self, stop_ids, batch_size=VARSAYILAN_BATCH_SIZE):
+        return self._delete_batches("Silinen duraklar", stop_ids, batch_size,
+                                    "UNWIND $rows AS row MATCH (d:Durak {stop_id: row.key}) DETACH DELETE d")
+
+    def delete_shapes(self, shape_ids, batch_size=VARSAYILAN_BATCH_SIZE):
+        # Bir shape binlerce nokta içerebilir; satır başına bütün shape'i silmek transaction'ı
+        # sınırsız büyütür. Noktalar clear_database'deki gibi LIMIT'li parçalarla silinir
+        shape_ids = list(shape_ids)
+        deleted = self._delete_in_chunks(
+            "MATCH (p:ShapeNoktasi) WHERE p.shape_id IN $shape_ids "
+            "WITH p LIMIT $limit DETACH DELETE p RETURN count(p) AS silinen",
+            batch_size, "Silinen shape noktaları", shape_ids=shape_ids)
+        deleted += self._delete_in_chunks(
+            "MATCH (s:Shape) WHERE s.shape_id IN $shape_ids "
+            "WITH s LIMIT $limit DETACH DELETE s RETURN count(s) AS silinen",
+            batch_size, "Silinen kompakt shape'ler", shape_ids=shape_ids)
+        return deleted
+
+    def unlink_routes(self, route_ids, batch_size=VARSAYILAN_BATCH_SIZE):
+        # Hattın güzergah ve SONRAKI_DURAK ilişkilerini kaldır (hat düğümü kalır)
+        return self._delete_batches("Güncellenen hat ilişkileri", route_ids, batch_size, (
+            "UNWIND $rows AS row "
+            "MATCH (h:Hat {route_id: row.key})<-[g:GÜZERGAH_ÜZERINDE]-(d:Durak) "
+            "OPTIONAL MATCH (d)-[s:SONRAKI_DURAK {hat_id: row.key}]->() "
+            "DELETE s, g"
+        ))
+
+    def delete_routes(self, route_ids, batch_size=VARSAYILAN_BATCH_SIZE):
+        self.unlink_routes(route_ids, batch_size)
+        return self._delete_batches("Silinen hatlar", route_ids, batch_size,
+                                    "UNWIND $rows AS row MATCH (h:Hat {route_id: row.key}) DETACH DELETE h")
+
+    def clear_schedules(self, route_ids, batch_size=VARSAYILAN_BATCH_SIZE):
+        return self._delete_batches("Silinen zaman çizelgeleri", route_ids, batch_size, (
+            "UNWIND $rows AS row "
+            "MATCH (r:Hat {route_id: row.key}) "
+            "REMOVE r.weekday_times, r.saturday_times, r.sunday_times, r.direction, "
+            "    r.route_short_name, r.schedule_notes, r.weekday_dk, r.saturday_dk, r.sunday_dk"
+        ))
+
+    def clear_route_documents(self, route_ids, batch_size=VARSAYILAN_BATCH_SIZE):
+        # Okuma modeli silinen hatlarda hatController grafik sorgularına döner
+        return self._delete_batches("Eskiyen okuma modelleri", route_ids, batch_size,
+                                    "UNWIND $rows AS row MATCH (h:Hat {route_id: row.key}) REMOVE h.okuma_modeli")
+
+    def build_manifest(self, stops_file, shapes_file, routes_file, schedules_file, loaded=None):
+        # Her dosyadaki kayıtların anahtar -> özet (hash) eşlemesi. loaded verilirse (ön denetimin
+        # temiz verisi) dosyalar yeniden okunmaz, özetler veritabanına yazılan satırlardan çıkar
+        stops = _loaded(loaded, 'stops', stops_file)
+        shapes = _loaded(loaded, 'shapes', shapes_file)
+        routes = _loaded(loaded, 'routes', routes_file)
+        schedules = _loaded(loaded, 'schedules', schedules_file, lambda path: _read_schedules(path, routes_file))
+        data = {'stops': stops or [], 'shapes': shapes or [], 'routes': routes or [], 'schedules': schedules or []}
+        manifest = {
+            'stops': {row.stop_id: _hash_record(row._asdict()) for row in data['stops']},
+            'shapes': {shape['shape_id']: _hash_record(shape) for shape in data['shapes']},
+            'routes': {route['route_id']: _hash_record(route) for route in data['routes']},
+            'schedules': {row['route_id']: _hash_record(row) for row in data['schedules']},
+            # Özetler temiz veriden çıktıysa sonraki artımlı yükleme de ön denetimden geçmeli
+            'preflight': bool(loaded),
+        }
+        return manifest, data
+
+    def sync_incremental(self, stops_file, shapes_file, routes_file, schedules_file, manifest_path,
+                         batch_size=VARSAYILAN_BATCH_SIZE, shape_mode='points',
+                         shape_tolerance=VARSAYILAN_SHAPE_TOLERANSI, shape_encoding='arrays',
+                         edge_model='per-route', loaded=None):
+        # Son yüklemeden bu yana değişen kayıtları uygula; loaded verilirse (ön denetimin temiz
+        # verisi) fark dosyalar yerine bu satırlar üzerinden çıkarılır
+        old_manifest = _load_manifest(manifest_path)
+        new_manifest, data = self.build_manifest(stops_file, shapes_file, routes_file, schedules_file, loaded)
+        if not old_manifest:
+            print(f"Uyarı: {manifest_path} bulunamadı, tüm kayıtlar yeni kabul edilecek.")
+
+        changes = {}
+        for name in ('stops', 'shapes', 'routes', 'schedules'):
+            inserted, updated, deleted = _diff_manifest(old_manifest.get(name, {}), new_manifest[name])
+            changes[name] = (inserted, updated, deleted)
+            print(f"{name}: {len(inserted)} yeni, {len(updated)} değişen, {len(deleted)} silinen")
+
+        # Yeni eklenen duraklara uğrayan hatlar da yeniden bağlanmalı
+        new_stops = changes['stops'][0]
+        stale_routes = set(changes['routes'][1])
+        if new_stops:
+            stale_routes.update(route['route_id'] for route in data['routes']
+                                if route['route_id'] not in changes['routes'][0] and new_stops.intersection(route['stops']))
+
+        inserted, updated, deleted = changes['stops']
+        self.write_stops([row for row in data['stops'] if row.stop_id in inserted | updated], batch_size)
+        if deleted:
+            self.delete_stops(deleted, batch_size)
+        if inserted or updated or deleted:
+            self.refresh_stop_neighbors(data['stops'], inserted | updated | deleted, batch_size)
+
+        inserted, updated, deleted = changes['shapes']
+        if updated or deleted:
+            self.delete_shapes(updated | deleted, batch_size)
+        changed_shapes = [shape for shape in data['shapes'] if shape['shape_id'] in inserted | updated]
+        if shape_mode == 'compact':
+            self.write_shapes_compact(changed_shapes, shape_tolerance, shape_encoding, batch_size)
+        else:
+            self.write_shapes(changed_shapes, batch_size)
+
+        inserted, updated, deleted = changes['routes']
+        if stale_routes:
+            self.unlink_routes(stale_routes, batch_size)
+        if deleted:
+            self.delete_routes(deleted, batch_size)
+        self.write_routes([route for route in data['routes'] if route['route_id'] in inserted | stale_routes],
+                          batch_size, edge_model)
+        if shape_mode == 'compact':
+            self.link_shapes_to_routes()
+
+        # Hat yeniden yazıldıysa çizelgesi de yeniden yazılır
+        inserted, updated, deleted = changes['schedules']
+        rewrite = inserted | updated | (set(new_manifest['schedules']) & stale_routes)
+        if deleted:
+            self.clear_schedules(deleted, batch_size)
+        self.write_schedules([row for row in data['schedules'] if row['route_id'] in rewrite], batch_size)
+
+        # Okuma modeli durak, shape, hat ve çizelgeden türetilir; bunlardan biri değişen hatlarınki
+        # kaldırılır (--route-documents verilmişse ardından yeniden yazılır)
+        changed_stops = set().union(*changes['stops'])
+        changed_shapes = set().union(*changes['shapes'])
+        old_shapes = old_manifest.get('shapes', {}).keys()
+        stale_documents = set(changes['routes'][1]) | stale_routes | rewrite | set(changes['schedules'][2])
+        for route in data['routes']:
+            route_id = route['route_id']
+            shape_id = _match_shape(route_id, new_manifest['shapes'])
+            if (shape_id in changed_shapes or shape_id != _match_shape(route_id, old_shapes)
+                    or changed_stops.intersection(route['stops'])):
+                stale_documents.add(route_id)
+        stale_documents -= set(changes['routes'][2])
+        if stale_documents:
+            self.clear_route_documents(stale_documents, batch_size)
+
+        _save_manifest(manifest_path, new_manifest)
+        print(f"Manifest güncellendi: {manifest_path}")
+
+    def import_stop_offsets(self, stops_file, routes_file, batch_size=VARSAYILAN_BATCH_SIZE, data=None):
+        # Her GÜZERGAH_ÜZERINDE ilişkisine hattın ilk durağından bu durağa tahmini süreyi
+        # (offset_dk) yaz; duraktaki kalkış = çizelgedeki kalkış + offset_dk.
+        # data verilirse (ön denetimin temiz verisi) dosyalar yeniden okunmaz
+        stops = {row.stop_id: row for row in _loaded(data, 'stops', stops_file) or []}
+        rows = []
+        for route in _loaded(data, 'routes', routes_file) or []:
+            offset = 0.0
+            previous = None
+            for i, stop_id in enumerate(route['stops']):
+                stop = stops.get(stop_id)
+                if not stop:
+                    continue
+                # Koordinatı olmayan durak bir öncekiyle aynı süreyi alır
+                if previous and stop.lat and stop.lon:
+                    offset += _haversine(previous.lat, previous.lon, stop.lat, stop.lon) / OTOBUS_HIZI_M_DK
+                if stop.lat and stop.lon:
+                    previous = stop
+                rows.append({'route_id': route['route_id'], 'stop_id': stop_id, 'sequence': i,
+                             'offset': round(offset, 2)})
+
+        query = (
+            "UNWIND $rows AS row "
+            "MATCH (d:Durak {stop_id: row.stop_id})-[r:GÜZERGAH_ÜZERINDE {sıra: row.sequence}]->"
+            "(h:Hat {route_id: row.route_id}) "
+            "SET r.offset_dk = row.offset"
+        )
+        return self._write_batches("Durak kalkış farkları", rows, batch_size, query,
+                                   partition_key=lambda row: row['route_id'])
+
+    def build_route_documents(self, stops_file, shapes_file, routes_file, schedules_file,
+                              tolerance=VARSAYILAN_SHAPE_TOLERANSI, batch_size=VARSAYILAN_BATCH_SIZE, data=None):
+        # Her Hat düğümüne okuma modelini (okuma_modeli, JSON) yaz; hatController'daki güzergah,
+        # shape ve saat bilgisi uçları onlarca düğümü gezmek yerine bu tek özelliği okur
+        stops = {row.stop_id: row for row in _loaded(data, 'stops', stops_file) or []}
+        routes = _loaded(data, 'routes', routes_file) or []
+        shapes = _loaded(data, 'shapes', shapes_file) or []
+        schedules = _loaded(data, 'schedules', schedules_file, lambda path: _read_schedules(path, routes_file)) or []
+        documents = _route_documents(stops, shapes, routes, schedules, tolerance)
+
+        rows = [{'route_id': route_id, 'belge': json.dumps(document, ensure_ascii=False, separators=(',', ':'))}
+                for route_id, document in documents.items()]
+        query = (
+            "UNWIND $rows AS row "
+            "MATCH (h:Hat {route_id: row.route_id}) "
+            "SET h.okuma_modeli = row.belge"
+        )
+        count = self._write_batches("Hat okuma modelleri", rows, batch_size, query)
+        total_bytes = sum(len(row['belge'].encode('utf-8')) for row in rows)
+        print(f"{count} hat için okuma modeli yazıldı ({total_bytes / 1024:.0f} KB).")
+        return count
+
+    def build_aggregated_edges(self, stops_file, shapes_file, routes_file, batch_size=VARSAYILAN_BATCH_SIZE,
+                               data=None):
+        """Durak çifti başına tek DURAK_BAGLANTISI kenarı yazar.
+
+        Hat başına modelde yoğun koridorlarda aynı iki durak arasında onlarca paralel
+        SONRAKI_DURAK kenarı olur ve gezinmeler hepsine dallanır. Toplu kenarda çifte uğrayan
+        hatlar hat_idler / hatlar, her hattın kalkış durağındaki sırası aynı konumda
+        siralar dizisinde tutulur. Süreler hattın shape'i boyunca ölçülen mesafeden
+        (yoksa kuş uçuşu) otobüs hızıyla tahmin edilir: sure_min, sure_ort (dakika), mesafe
+        (metre, en kısası). Örnek sorgu:
+
+            MATCH (a:Durak {stop_id: $from}), (b:Durak {stop_id: $to})
+            CALL apoc.algo.dijkstra(a, b, 'DURAK_BAGLANTISI>|AKTARMA', 'sure_min') YIELD path, weight
+            RETURN path, weight
+        """
+        stops = {row.stop_id: row for row in _loaded(data, 'stops', stops_file) or []}
+        routes = _loaded(data, 'routes', routes_file) or []
+        shapes = {shape['shape_id']: shape for shape in _loaded(data, 'shapes', shapes_file) or []}
+
+        pairs = {}
+        for route in routes:
+            route_stops = route['stops']
+            shape_id = _match_shape(route['route_id'], shapes)
+            distances = _segment_distances([stops.get(stop_id) for stop_id in route_stops], shapes.get(shape_id))
+            for i, distance in enumerate(distances):
+                key = (route_stops[i], route_stops[i + 1])
+                if key[0] not in stops or key[1] not in stops:
+                    continue
+                edge = pairs.get(key)
+                if edge is None:
+                    edge = pairs[key] = {'stop_id1': key[0], 'stop_id2': key[1], 'hat_idler': [], 'hatlar': [],
+                                         'siralar': [], 'mesafeler': []}
+                edge['hat_idler'].append(route['route_id'])
+                edge['hatlar'].append(route['route_number'])
+                edge['siralar'].append(i)
+                if distance is not None:
+                    edge['mesafeler'].append(distance)
+
+        rows = []
+        for edge in pairs.values():
+            # Koordinatı olmayan duraklar arasındaki kenarın mesafe ve süresi boş kalır
+            distances = edge.pop('mesafeler')
+            edge['mesafe'] = round(min(distances), 1) if distances else None
+            edge['sure_min'] = round(min(distances) / OTOBUS_HIZI_M_DK, 2) if distances else None
+            edge['sure_ort'] = round(sum(distances) / len(distances) / OTOBUS_HIZI_M_DK, 2) if distances else None
+            rows.append(edge)
+
+        query = (
+            "UNWIND $rows AS row "
+            "MATCH (s1:Durak {stop_id: row.stop_id1}) "
+            "MATCH (s2:Durak {stop_id: row.stop_id2}) "
+            "MERGE (s1)-[r:DURAK_BAGLANTISI]->(s2) "
+            "SET r.hat_idler = row.hat_idler, r.hatlar = row.hatlar, r.siralar = row.siralar, "
+            "    r.mesafe = row.mesafe, r.sure_min = row.sure_min, r.sure_ort = row.sure_ort, "
+            # Rota aramasındaki dijkstra SONRAKI_DURAK ve AKTARMA'daki gibi sure'yi okur
+            "    r.sure = row.sure_min"
+        )
+        # Hat listeleri değişmiş olabilir, kenarlar her seferinde baştan kurulur
+        deleted = self._delete_in_chunks(
+            "MATCH ()-[r:DURAK_BAGLANTISI]->() WITH r LIMIT $limit DELETE r RETURN count(r) AS silinen",
+            VARSAYILAN_SILME_BATCH_SIZE, "Eski DURAK_BAGLANTISI")
+        if deleted:
+            print(f"{deleted} eski DURAK_BAGLANTISI ilişkisi silindi.")
+        count = self._write_batches("DURAK_BAGLANTISI", rows, batch_size, query,
+                                    partition_key=_pair_lock_keys)
+
+        per_route, aggregated, parallel = _edge_model_counts(routes)
+        print(f"{count} DURAK_BAGLANTISI yazıldı. Hat başına modelde {per_route} SONRAKI_DURAK kenarı olurdu "
+              f"({per_route / max(aggregated, 1):.1f} kat), bir çift arasında en fazla {parallel} paralel kenar.")
+        return count
+
+    def build_stop_neighbors(self, stops_file, k=VARSAYILAN_KOMSU_SAYISI, batch_size=VARSAYILAN_BATCH_SIZE,
+                             data=None):
+        # Her durağa en yakın k durağı mesafeleriyle birlikte yaz (komsu_duraklar, komsu_mesafeler);
+        # durak çevresi sorguları tüm durakları taramak yerine bu listeyi okur
+        rows = _stop_neighbor_rows(_loaded(data, 'stops', stops_file) or [], k)
+        count = self._write_batches("Komşu duraklar", rows, batch_size, KOMSU_DURAK_SORGUSU)
+        print(f"{count} durak için en yakın {k} komşu yazıldı.")
+        return count
+
+    def refresh_stop_neighbors(self, stops, changed_stop_ids, batch_size=VARSAYILAN_BATCH_SIZE):
+        # Artımlı yüklemede eklenen, taşınan ya da silinen durakların ve listelerinde bunlar
+        # bulunan (eski ya da yeni) durakların komşu listelerini yeniden yaz. Konumu olmayan
+        # duraklarınki kaldırılır, API onlar için point.distance sorgusuna döner
+        with self.driver.session() as session:
+            records = list(session.run(
+                "MATCH (d:Durak) WHERE d.komsu_duraklar IS NOT NULL "
+                "RETURN max(size(d.komsu_duraklar)) AS k, "
+                "    collect(CASE WHEN any(id IN d.komsu_duraklar WHERE id IN $ids) THEN d.stop_id END) AS durak_idler",
+                ids=list(changed_stop_ids)))
+        if not records or records[0]["k"] is None:
+            # Komşu listeleri hiç yazılmamış (--stop-neighbors kullanılmamış)
+            return 0
+        k = records[0]["k"]
+        affected = set(changed_stop_ids) | set(records[0]["durak_idler"])
+        rows = _stop_neighbor_rows(stops, k)
+        rows = [row for row in rows
+                if row['stop_id'] in affected or changed_stop_ids.intersection(row['komsular'])]
+        located = {row['stop_id'] for row in rows}
+        unlocated = [row.stop_id for row in stops if row.stop_id in affected and row.stop_id not in located]
+        count = self._write_batches("Güncellenen komşu duraklar", rows, batch_size, KOMSU_DURAK_SORGUSU)
+        if unlocated:
+            self._delete_batches("Konumsuz durakların komşuları", unlocated, batch_size, (
+                "UNWIND $rows AS row "
+                "MATCH (d:Durak {stop_id: row.key}) "
+                "REMOVE d.komsu_duraklar, d.komsu_mesafeler"
+            ))
+        print(f"{count} durağın en yakın {k} komşusu güncellendi.")
+        return count
+
+    def build_transfer_graph(self, stops_file, routes_file, walk_radius=VARSAYILAN_YURUME_YARICAPI,
+                             batch_size=VARSAYILAN_BATCH_SIZE, edge_model='per-route', data=None):
+        """Rota aramasının tek bir ağırlıklı en kısa yol sorgusuna inmesi için grafı hazırlar.
+
+        SONRAKI_DURAK kenarlarına ardışık duraklar arası haversine mesafesi (mesafe, metre)
+        ve tahmini süre (sure, dakika) yazılır; walk_radius metre içindeki durak çiftleri
+        arasına yürüme süreli AKTARMA kenarları eklenir. rotaController.findWeightedRoutes
+        bu grafı şu sorguyla arar:
+
+            MATCH (a:Durak {stop_id: $from}), (b:Durak {stop_id: $to})
+            CALL apoc.algo.dijkstra(a, b, 'SONRAKI_DURAK>|AKTARMA', 'sure') YIELD path, weight
+            RETURN path, weight
+
+        edge_model 'aggregated' ise SONRAKI_DURAK yazılmamıştır; süreler build_aggregated_edges'in
+        DURAK_BAGLANTISI'na yazdığı sure'den gelir ve yalnızca AKTARMA kenarları eklenir.
+        """
+        stops = {row.stop_id: row for row in _loaded(data, 'stops', stops_file) or []}
+        routes = _loaded(data, 'routes', routes_file) or []
+
+        edges = []
+        for route in routes:
+            route_stops = route['stops']
+            for i in range(len(route_stops) - 1):
+                first = stops.get(route_stops[i])
+                second = stops.get(route_stops[i + 1])
+                # Koordinatı olmayan duraklar arasında mesafe ölçülemez, kenar süresiz kalır
+                if not first or not second or not (first.lat and first.lon and second.lat and second.lon):
+                    continue
+                distance = _haversine(first.lat, first.lon, second.lat, second.lon)
+                edges.append({'stop_id1': first.stop_id, 'stop_id2': second.stop_id, 'route_id': route['route_id'],
+                              'order': i, 'mesafe': round(distance, 1),
+                              'sure': round(distance / OTOBUS_HIZI_M_DK, 2)})
+
+        # Koordinatı olmayan (0, 0) duraklar aktarma aramasına girmez
+        points = [(row.stop_id, row.lat, row.lon) for row in stops.values() if row.lat and row.lon]
+        grid = _GridIndex(points, walk_radius)
+        transfers = []
+        for i, (stop_id, lat, lon) in enumerate(points):
+            for j, distance in grid.within(lat, lon, walk_radius):
+                # Her çift bir kez yazılır; kenar yönsüz sorgulanır
+                if j > i:
+                    transfers.append({'stop_id1': stop_id, 'stop_id2': points[j][0], 'mesafe': round(distance, 1),
+                                      'sure': round(distance / YURUME_HIZI_M_DK, 2)})
+
+        edge_query = (
+            "UNWIND $rows AS row "
+            "MATCH (s1:Durak {stop_id: row.stop_id1})-[r:SONRAKI_DURAK {hat_id: row.route_id, sıra: row.order}]->"
+            "(s2:Durak {stop_id: row.stop_id2}) "
+            "SET r.mesafe = row.mesafe, r.sure = row.sure"
+        )
+        transfer_query = (
+            "UNWIND $rows AS row "
+            "MATCH (s1:Durak {stop_id: row.stop_id1}) "
+            "MATCH (s2:Durak {stop_id: row.stop_id2}) "
+            "MERGE (s1)-[r:AKTARMA]->(s2) "
+            "SET r.mesafe = row.mesafe, r.sure = row.sure"
+        )
+        if edge_model == 'aggregated':
+            print("SONRAKI_DURAK kenarı yok (--edge-model aggregated); otobüs süreleri DURAK_BAGLANTISI.sure'den okunur.")
+            edges = []
+        else:
+            # Yalnızca var olan ilişkilerin özelliği değişir, düğüm kilidi alınmaz
+            self._write_batches("SONRAKI_DURAK süreleri", edges, batch_size, edge_query,
+                                partition_key=lambda row: row['route_id'])
+        # Yarıçap değişmiş olabilir, eski aktarmalar önce silinir
+        deleted = self._delete_in_chunks(
+            "MATCH ()-[r:AKTARMA]->() WITH r LIMIT $limit DELETE r RETURN count(r) AS silinen",
+            VARSAYILAN_SILME_BATCH_SIZE, "Eski AKTARMA")
+        if deleted:
+            print(f"{deleted} eski AKTARMA ilişkisi silindi.")
+        count = self._write_batches("AKTARMA", transfers, batch_size, transfer_query,
+                                    partition_key=_pair_lock_keys)
+        print(f"{len(edges)} SONRAKI_DURAK kenarına süre yazıldı, {walk_radius:.0f} m içinde {count} AKTARMA eklendi.")
+        return count
+
+    def database_counts(self):
+        # Özetteki düğüm ve ilişki sayımları
+        with self.driver.session() as session:
+            counts = {}
+            for label in ('Durak', 'Hat', 'ShapeNoktasi', 'Shape'):
+                counts[label] = session.run(f"MATCH (n:{label}) RETURN COUNT(n) as count").single()["count"]
+            for rel_type in ('GÜZERGAH_ÜZERINDE', 'SONRAKI_DURAK', 'DURAK_BAGLANTISI', 'SONRAKI_NOKTA', 'AKTARMA'):
+                counts[rel_type] = session.run(f"MATCH ()-[r:{rel_type}]->() RETURN COUNT(r) as count").single()["count"]
+            return counts
+
+    def verify_admin_import(self, output_dir):
+        # neo4j-admin ile yüklenen grafı export sırasında beklenen sayımlarla karşılaştır
+        with open(os.path.join(output_dir, 'counts.json'), 'r', encoding='utf-8') as file:
+            expected = json.load(file)
+        actual = self.database_counts()
+        ok = True
+        print("\nBeklenen / veritabanındaki sayımlar:")
+        for key in OZET_SAYIMLARI:
+            mark = "OK" if expected.get(key) == actual.get(key) else "FARKLI"
+            ok = ok and mark == "OK"
+            print(f"  {key}: {expected.get(key)} / {actual.get(key)} [{mark}]")
+        print("Doğrulama başarılı." if ok else "Uyarı: Sayımlar eşleşmiyor!")
+        return ok
+
     def create_database_summary(self):
         # Özet bilgi göster
+        counts = self.database_counts()
+        durak_sayisi = counts['Durak']
+        hat_sayisi = counts['Hat']
+        shape_noktasi_sayisi = counts['ShapeNoktasi']
+        shape_sayisi = counts['Shape']
+        guzergah_iliskisi_sayisi = counts['GÜZERGAH_ÜZERINDE']
+        sonraki_durak_iliskisi_sayisi = counts['SONRAKI_DURAK']
+        sonraki_nokta_iliskisi_sayisi = counts['SONRAKI_NOKTA']
+
         with self.driver.session() as session:
-            durak_sayisi = session.run("MATCH (d:Durak) RETURN COUNT(d) as count").single()["count"]
-            hat_sayisi = session.run("MATCH (h:Hat) RETURN COUNT(h) as count").single()["count"]
-            shape_noktasi_sayisi = session.run("MATCH (p:ShapeNoktasi) RETURN COUNT(p) as count").single()["count"]
-            
-            guzergah_iliskisi_sayisi = session.run("MATCH ()-[r:GÜZERGAH_ÜZERINDE]->() RETURN COUNT(r) as count").single()["count"]
-            sonraki_durak_iliskisi_sayisi = session.run("MATCH ()-[r:SONRAKI_DURAK]->() RETURN COUNT(r) as count").single()["count"]
-            sonraki_nokta_iliskisi_sayisi = session.run("MATCH ()-[r:SONRAKI_NOKTA]->() RETURN COUNT(r) as count").single()["count"]
-            
             print("\n" + "="*50)
             print("VERİTABANI ÖZET BİLGİLERİ")
             print("="*50)
             print(f"Durak sayısı: {durak_sayisi}")
             print(f"Hat sayısı: {hat_sayisi}")
             print(f"Shape noktası sayısı: {shape_noktasi_sayisi}")
+            print(f"Kompakt shape sayısı: {shape_sayisi}")
             print(f"GÜZERGAH_ÜZERINDE ilişki sayısı: {guzergah_iliskisi_sayisi}")
             print(f"SONRAKI_DURAK ilişki sayısı: {sonraki_durak_iliskisi_sayisi}")
+            print(f"DURAK_BAGLANTISI (toplu kenar) ilişki sayısı: {counts['DURAK_BAGLANTISI']}")
             print(f"SONRAKI_NOKTA ilişki sayısı: {sonraki_nokta_iliskisi_sayisi}")
+            print(f"AKTARMA ilişki sayısı: {counts['AKTARMA']}")
             
             print("\nEn çok hat geçen 5 durak:")
             result = session.run("""
@@ -392,59 +2320,885 @@ class Neo4jDatabase:
             print("="*50)
 
 
+class AsyncNeo4jDatabase:
+    """AsyncGraphDatabase üzerinde boru hattı şeklinde çalışan toplu yükleyici.
+
+    Okuyucu, ayrıştırdığı parçaları sınırlı bir asyncio.Queue'ya koyar; `writers` adet
+    eşzamanlı yazma transaction'ı kuyruğu boşaltır. Bir parça sunucuda işlenirken sonraki
+    ayrıştırılır, kuyruk dolunca okuyucu bekler ve bellekte en fazla queue_size parça kalır.
+    Sorgular, satır biçimleri ve bölüştürme Neo4jDatabase'in toplu yolu ile aynıdır.
+    """
+
+    def __init__(self, uri, user, password, writers=4, queue_size=0, driver=None):
+        self.driver = driver or AsyncGraphDatabase.driver(uri, auth=(user, password))
+        # Aynı anda açık yazma transaction'ı (oturum) sayısı
+        self.writers = max(1, writers)
+        # Yazılmayı bekleyen en fazla parça sayısı
+        self.queue_size = queue_size or 2 * self.writers
+        self.max_retries = VARSAYILAN_YENIDEN_DENEME
+        # Neo4jDatabase'deki gibi: ilerleme kaydı ve yazılamayıp atlanan satırlar
+        self.checkpoint = None
+        self.failed_rows = 0
+
+    def enable_checkpoint(self, checkpoint):
+        # Aşamalar Neo4jDatabase ile aynı adlarla kaydedilir; tamamlanmışlar atlanır,
+        # yarım kalanlar her kulvarda kesintisiz commit edilmiş son parçadan sürer
+        self.checkpoint = checkpoint
+
+    async def verify_connection(self):
+        # Bağlantıyı test et
+        try:
+            await self.driver.verify_connectivity()
+            print("Neo4j veritabanına bağlantı başarılı! (async)")
+        except Exception as e:
+            print(f"Neo4j veritabanına bağlantı hatası: {e}")
+            sys.exit(1)
+
+    async def close(self):
+        await self.driver.close()
+
+    async def _execute_write(self, session, phase, queries, chunk):
+        # Neo4jDatabase._execute_write gibi: sürücünün de vazgeçtiği geçici hatalarda artan bekleme
+        attempt = 0
+        while True:
+            try:
+                return await session.execute_write(_run_unwind_async, queries, chunk)
+            except GECICI_HATALAR as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = min(YENIDEN_DENEME_BEKLEMESI_SN * 2 ** attempt, EN_UZUN_BEKLEME_SN)
+                attempt += 1
+                print(f"Uyarı: [{phase}] geçici hata, {delay:.0f} sn sonra yeniden denenecek "
+                      f"({attempt}/{self.max_retries}): {e}")
+                await asyncio.sleep(delay)
+
+    async def _writer(self, phase, queue, queries, size_of, progress):
+        # Kuyruk sonu işareti (None) gelene dek parçaları kendi oturumunda yaz
+        async with self.driver.session() as session:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                lane, index, chunk = item
+                written = 0
+                try:
+                    await self._execute_write(session, phase, queries, chunk)
+                    written = size_of(chunk)
+                except GECICI_HATALAR as e:
+                    # Neo4jDatabase._write_lane gibi: checkpoint varken parça kaybedilmez, --resume ile sürer
+                    if self.checkpoint is not None:
+                        raise
+                    print(f"Hata: {phase} parçası yazılırken bir sorun oluştu ({size_of(chunk)} satır): {e}")
+                    self.failed_rows += size_of(chunk)
+                except Exception as e:
+                    print(f"Hata: {phase} parçası yazılırken bir sorun oluştu ({size_of(chunk)} satır): {e}")
+                    self.failed_rows += size_of(chunk)
+                    if self.checkpoint is not None:
+                        self.checkpoint.fail(phase, lane, index, size_of(chunk), e)
+                self._commit_chunk(phase, progress[lane], lane, index, written)
+
+    def _commit_chunk(self, phase, state, lane, index, rows):
+        # Ortak kuyruktaki parçalar sırasız biter; checkpoint'e yalnızca kesintisiz biten önek yazılır
+        state['done'][index] = rows
+        if state['next'] not in state['done']:
+            return
+        while state['next'] in state['done']:
+            state['rows'] += state['done'].pop(state['next'])
+            state['next'] += 1
+        if self.checkpoint is not None:
+            self.checkpoint.commit(phase, lane, state['next'], state['rows'])
+
+    async def _run_lanes(self, phase, lanes, queries, size_of, first_lane=0):
+        # Tek kulvarı tüm yazarlar ortak kuyruktan, bölüştürülmüş kulvarları kendi yazarları boşaltır
+        queues = [asyncio.Queue(max(1, self.queue_size // len(lanes))) for _ in lanes]
+        writers_per_queue = self.writers if len(lanes) == 1 else 1
+        progress = {}
+        for lane in range(first_lane, first_lane + len(lanes)):
+            skip, rows = self.checkpoint.lane_progress(phase, lane) if self.checkpoint else (0, 0)
+            progress[lane] = {'next': skip, 'rows': rows, 'done': {}}
+
+        async def produce():
+            # Kulvarlar sırayla beslenir; put yalnızca kuyruk doluyken bekler
+            for index, chunks in enumerate(zip_longest(*lanes)):
+                for lane, (queue, chunk) in enumerate(zip(queues, chunks), first_lane):
+                    if chunk is not None and index >= progress[lane]['next']:
+                        await queue.put((lane, index, chunk))
+            for queue in queues:
+                for _ in range(writers_per_queue):
+                    await queue.put(None)
+
+        tasks = [asyncio.ensure_future(produce())]
+        tasks += [asyncio.ensure_future(self._writer(phase, queue, queries, size_of, progress))
+                  for queue in queues for _ in range(writers_per_queue)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # Bir yazar vazgeçtiyse ötekiler ve dolu kuyrukta bekleyen okuyucu da durdurulur
+            for task in tasks:
+                task.cancel()
+            raise
+        return sum(state['rows'] for state in progress.values())
+
+    async def _write_lanes(self, phase, lanes, queries, size_of):
+        return await self._write_rounds(phase, [lanes], queries, size_of)
+
+    async def _write_rounds(self, phase, rounds, queries, size_of):
+        # Neo4jDatabase._write_rounds karşılığı: turlar sırayla, kulvar numaraları turlar boyunca artar
+        done = self.checkpoint.phase_rows(phase) if self.checkpoint else None
+        if done is not None:
+            print(f"[{phase}] önceki çalıştırmada tamamlanmış ({done} satır), atlanıyor.")
+            return done
+
+        started = time.perf_counter()
+        count = 0
+        first_lane = 0
+        for lanes in rounds:
+            count += await self._run_lanes(phase, lanes, queries, size_of, first_lane)
+            first_lane += len(lanes)
+        if self.checkpoint is not None:
+            self.checkpoint.finish_phase(phase, count)
+        _report_throughput(phase, count, time.perf_counter() - started)
+        return count
+
+    async def _write_batches(self, phase, rows, batch_size, *queries, partition_key=None):
+        # Neo4jDatabase._write_batches ile aynı bölüştürme: anahtar verilirse satırlar yazarlara
+        # kilit kümeleri ayrık turlar halinde dağıtılır, yoksa parçalar okundukça ortak kuyruğa akar
+        if partition_key is None or self.writers == 1:
+            return await self._write_lanes(phase, [_chunked(rows, batch_size)], queries, len)
+        rounds = [[_chunked(lane, batch_size) for lane in lanes]
+                  for lanes in _lock_disjoint_rounds(rows, self.writers, partition_key)]
+        return await self._write_rounds(phase, rounds, queries, len)
+
+    async def import_stops(self, file_path, batch_size=VARSAYILAN_BATCH_SIZE):
+        # Duraklar listeye alınmadan, CSV okundukça kuyruğa akar
+        rows = _row_source(file_path, DurakSatiri, DURAK_SUTUNLARI) if _source_exists(file_path) else None
+        if rows is None:
+            print(f"Hata: {file_path} okunamadı, duraklar atlanıyor.")
+            return 0
+        count = await self._write_batches("Duraklar", (row._asdict() for row in rows), batch_size, DURAK_SORGUSU)
+        print(f"Toplam {count} durak veritabanına eklendi.")
+        return count
+
+    async def import_shapes(self, file_path, batch_size=VARSAYILAN_BATCH_SIZE):
+        shapes = _read_shapes(file_path) if _source_exists(file_path) else None
+        if shapes is None:
+            print(f"Hata: {file_path} okunamadı, shape noktaları atlanıyor.")
+            return 0
+        count = await self._write_lanes("Shape noktaları", [_chunked_shapes(_shape_params(shapes), batch_size)],
+                                        (SHAPE_NOKTASI_SORGUSU,), _count_shape_points)
+        print(f"Toplam {count} shape noktası, {len(shapes)} benzersiz shape için veritabanına eklendi.")
+        return count
+
+    async def import_routes(self, file_path, batch_size=VARSAYILAN_BATCH_SIZE, edge_model='per-route'):
+        routes = _read_routes(file_path) if _source_exists(file_path) else None
+        if routes is None:
+            print(f"Hata: {file_path} okunamadı, hatlar atlanıyor.")
+            return 0
+        route_rows, links, edges = _route_rows(routes)
+        count = await self._write_batches("Hatlar", route_rows, batch_size, HAT_SORGUSU)
+        await self._write_batches("GÜZERGAH_ÜZERINDE", links, batch_size, GUZERGAH_SORGUSU,
+                                  partition_key=_link_lock_keys)
+        if edge_model != 'aggregated':
+            await self._write_batches("SONRAKI_DURAK", edges, batch_size, SONRAKI_DURAK_SORGUSU,
+                                      partition_key=_pair_lock_keys)
+        print(f"Toplam {count} hat veritabanına eklendi.")
+        return count
+
+    async def import_schedules(self, file_path, batch_size=VARSAYILAN_BATCH_SIZE, routes_file=None):
+        rows = _read_schedules(file_path, routes_file) if _source_exists(file_path) else None
+        if rows is None:
+            print(f"Hata: {file_path} okunamadı, zaman çizelgeleri atlanıyor.")
+            return 0
+        count = await self._write_batches("Zaman çizelgeleri", rows, batch_size, CIZELGE_SORGUSU)
+        print(f"Toplam {count} hat için zaman çizelgesi bilgileri eklendi.")
+        return count
+
+    async def import_all(self, stops_file, shapes_file, routes_file, schedules_file,
+                         batch_size=VARSAYILAN_BATCH_SIZE, edge_model='per-route'):
+        # Duraklar ve shape'ler birbirinden bağımsız, aynı anda yazılır; shapes_file None ise
+        # shape'ler atlanır (ör. compact modu toplu yükleyiciye bırakılır)
+        await self.verify_connection()
+        stages = [self.import_stops(stops_file, batch_size)]
+        if shapes_file:
+            stages.append(self.import_shapes(shapes_file, batch_size))
+        count = sum(await asyncio.gather(*stages))
+        count += await self.import_routes(routes_file, batch_size, edge_model)
+        count += await self.import_schedules(schedules_file, batch_size, routes_file)
+        return count
+
+
+async def import_async(uri, user, password, stops_file, shapes_file, routes_file, schedules_file,
+                       batch_size=VARSAYILAN_BATCH_SIZE, writers=4, queue_size=0, edge_model='per-route',
+                       max_retries=VARSAYILAN_YENIDEN_DENEME, checkpoint=None):
+    # Async yükleyiciyi kendi sürücüsüyle çalıştır ve kapat; (yazılan, yazılamayan) satır sayısı döner
+    db = AsyncNeo4jDatabase(uri, user, password, writers, queue_size)
+    db.max_retries = max_retries
+    if checkpoint is not None:
+        db.enable_checkpoint(checkpoint)
+    try:
+        count = await db.import_all(stops_file, shapes_file, routes_file, schedules_file, batch_size, edge_model)
+        return count, db.failed_rows
+    finally:
+        await db.close()
+
+
+# neo4j-admin import dosyaları: (dosya adı, başlık); düğüm etiketi / ilişki tipi komutta verilir
+ADMIN_IMPORT_DOSYALARI = {
+    'Durak': ('durak.csv', ['stop_id:ID(Durak)', 'name', 'lat:double', 'lon:double', 'stop_code',
+                            'konum:point{crs:WGS-84}']),
+    'Hat': ('hat.csv', ['route_id:ID(Hat)', 'route_name', 'route_number', 'route_long_name', 'route_type',
+                        'route_desc', 'route_color', 'route_text_color', 'yön']),
+    'Hat_cizelge': ('hat_cizelge.csv', ['route_id:ID(Hat)', 'route_name', 'route_number', 'route_long_name',
+                                        'route_type', 'route_desc', 'route_color', 'route_text_color', 'yön',
+                                        'weekday_times', 'saturday_times', 'sunday_times', 'direction',
+                                        'route_short_name', 'schedule_notes', 'weekday_dk:long[]',
+                                        'saturday_dk:long[]', 'sunday_dk:long[]']),
+    'ShapeNoktasi': ('shape_noktasi.csv', ['shape_id_seq:ID(ShapeNoktasi)', 'shape_id', 'lat:double', 'lng:double',
+                                           'sequence:long']),
+    'GÜZERGAH_ÜZERINDE': ('guzergah_uzerinde.csv', [':START_ID(Durak)', ':END_ID(Hat)', 'yön', 'sıra:long']),
+    'SONRAKI_DURAK': ('sonraki_durak.csv', [':START_ID(Durak)', ':END_ID(Durak)', 'hat', 'hat_id', 'yön',
+                                            'sıra:long']),
+    'SONRAKI_NOKTA': ('sonraki_nokta.csv', [':START_ID(ShapeNoktasi)', ':END_ID(ShapeNoktasi)', 'shape_id']),
+}
+
+# create_database_summary ile karşılaştırılan sayımlar
+OZET_SAYIMLARI = ['Durak', 'Hat', 'ShapeNoktasi', 'GÜZERGAH_ÜZERINDE', 'SONRAKI_DURAK', 'SONRAKI_NOKTA']
+
+
+def export_admin_import(stops_file, shapes_file, routes_file, schedules_file, output_dir):
+    """Bolt yerine `neo4j-admin database import full` ile yüklenecek CSV'leri yazar.
+
+    Düğüm ve ilişkiler toplu yükleyicinin (import_*_batched) ürettiği grafla aynıdır:
+    MERGE'ün birleştirdiği tekrarlar burada da tekilleştirilir, MATCH'in atladığı
+    (olmayan durağa giden) ilişkiler yazılmaz. Beklenen sayımlar counts.json'a kaydedilir.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Aynı anahtarlı satırlarda MERGE + SET gibi sonuncusu geçerli olur
+    stops = {row.stop_id: row for row in (_read_stops(stops_file) or [])} if _source_exists(stops_file) else {}
+    routes = _read_routes(routes_file) if _source_exists(routes_file) else None
+    shapes = _read_shapes(shapes_file) if _source_exists(shapes_file) else None
+    schedules = _read_schedules(schedules_file, routes_file) if _source_exists(schedules_file) else None
+    route_rows = {route['route_id']: route for route in routes or []}
+    schedule_rows = {row['route_id']: row for row in schedules or [] if row['route_id'] in route_rows}
+
+    writers = {}
+    files = []
+    for key, (file_name, header) in ADMIN_IMPORT_DOSYALARI.items():
+        file = open(os.path.join(output_dir, file_name), 'w', encoding='utf-8', newline='')
+        files.append(file)
+        writers[key] = csv.writer(file)
+        writers[key].writerow(header)
+
+    counts = dict.fromkeys(OZET_SAYIMLARI, 0)
+    try:
+        for row in stops.values():
+            # Koordinatı olmayan (0, 0) duraklarda konum boş bırakılır
+            konum = f"{{latitude:{row.lat}, longitude:{row.lon}}}" if row.lat or row.lon else ''
+            writers['Durak'].writerow([row.stop_id, row.name, row.lat, row.lon, row.stop_code, konum])
+        counts['Durak'] = len(stops)
+
+        for route_id, route in route_rows.items():
+            values = [route_id, route['route_name'], route['route_number'], route['route_long_name'],
+                      route['route_type'], route['route_desc'], route['route_color'], route['route_text_color'],
+                      route['direction']]
+            schedule = schedule_rows.get(route_id)
+            if schedule:
+                writers['Hat_cizelge'].writerow(values + [schedule['weekday_times'], schedule['saturday_times'],
+                                                          schedule['sunday_times'], schedule['direction'],
+                                                          schedule['route_short_name'], schedule['schedule_notes']]
+                                                 + [';'.join(map(str, schedule[f'{day_type}_dk']))
+                                                    for day_type in GUN_TIPLERI])
+            else:
+                writers['Hat'].writerow(values)
+        counts['Hat'] = len(route_rows)
+
+        # Tekrarlanan hat satırlarının ilişkileri MERGE'de olduğu gibi birleşir
+        links = set()
+        edges = set()
+        for route in routes or []:
+            route_stops = route['stops']
+            for i, stop_id in enumerate(route_stops):
+                if stop_id in stops:
+                    links.add((stop_id, route['route_id'], route['direction'], i))
+            for i in range(len(route_stops) - 1):
+                if route_stops[i] in stops and route_stops[i + 1] in stops:
+                    edges.add((route_stops[i], route_stops[i + 1], route['route_number'], route['route_id'],
+                               route['direction'], i))
+        writers['GÜZERGAH_ÜZERINDE'].writerows(sorted(links))
+        writers['SONRAKI_DURAK'].writerows(sorted(edges))
+        counts['GÜZERGAH_ÜZERINDE'] = len(links)
+        counts['SONRAKI_DURAK'] = len(edges)
+
+        for shape in shapes or []:
+            shape_id = shape['shape_id']
+            ids = [f"{shape_id}_{sequence}" for sequence in shape['sequences']]
+            writers['ShapeNoktasi'].writerows(
+                zip(ids, [shape_id] * len(ids), shape['lats'], shape['lngs'], shape['sequences']))
+            writers['SONRAKI_NOKTA'].writerows((ids[i], ids[i + 1], shape_id) for i in range(len(ids) - 1))
+            counts['ShapeNoktasi'] += len(ids)
+            counts['SONRAKI_NOKTA'] += max(len(ids) - 1, 0)
+    finally:
+        for file in files:
+            file.close()
+
+    with open(os.path.join(output_dir, 'counts.json'), 'w', encoding='utf-8') as file:
+        json.dump(counts, file, ensure_ascii=False, indent=2)
+
+    nodes = [('Durak', 'Durak'), ('Hat', 'Hat'), ('Hat', 'Hat_cizelge'), ('ShapeNoktasi', 'ShapeNoktasi')]
+    relationships = ['GÜZERGAH_ÜZERINDE', 'SONRAKI_DURAK', 'SONRAKI_NOKTA']
+    command = ["neo4j-admin database import full neo4j --overwrite-destination"]
+    command += [f"  --nodes={label}={os.path.join(output_dir, ADMIN_IMPORT_DOSYALARI[key][0])}"
+                for label, key in nodes]
+    command += [f"  --relationships={rel_type}={os.path.join(output_dir, ADMIN_IMPORT_DOSYALARI[rel_type][0])}"
+                for rel_type in relationships]
+
+    print(f"neo4j-admin import dosyaları yazıldı: {output_dir}")
+    for key in OZET_SAYIMLARI:
+        print(f"  {key}: {counts[key]}")
+    print("\nVeritabanı durdurulduktan sonra çalıştırın:")
+    print(" \\\n".join(command))
+    print("\nArdından kısıtlama/indeksler ve doğrulama için: python veri_yukle.py --verify-admin-import "
+          f"{output_dir}")
+    return counts
+
+
+def _within_bounds(lats, lons):
+    # Koordinat sütunları için KOCAELI_SINIRLARI maskesi
+    south, north, west, east = KOCAELI_SINIRLARI
+    return [south <= lat <= north and west <= lon <= east for lat, lon in zip(lats, lons)]
+
+
+def _first_occurrences(keys):
+    # Her anahtarın ilk geçtiği satırlar için True maskesi
+    seen = set()
+    mask = []
+    for key in keys:
+        mask.append(key not in seen)
+        seen.add(key)
+    return mask
+
+
+def preflight(stops_file, shapes_file, routes_file, schedules_file):
+    """Dört girdiyi sütun dizilerine okuyup denetler; (temiz veri, rapor) döner.
+
+    Yazıcılara yalnızca temizlenmiş veri gider, böylece hatalı satırlar yazma döngüsünde
+    tek tek başarısız olmaz:
+      - Duraklar: tekrarlanan stop_id'lerin ilki tutulur; KOCAELI_SINIRLARI dışındaki ya da
+        eksik koordinatlar 0'a çekilir (durak konumsuz yazılır, hatlardaki yeri korunur).
+      - Shape noktaları: sınır dışındakiler atılır, tekrarlanan sıra numaraları ayıklanır,
+        sıra boşlukları raporlanır.
+      - Hatlar: tekrarlanan route_id'lerin ilki tutulur; stops.txt'de olmayan duraklar
+        boş bırakılır (sıra numaraları kaymasın diye listeden çıkarılmaz).
+      - Çizelgeler: ayrıştırılamayan saatler atılır, sıra dışı olanlar sıraya dizilir,
+        routes.txt'de olmayan hatlarınki bırakılır, aynı hattın tekrarlanan satırlarından
+        (veritabanında olduğu gibi) sonuncusu tutulur.
+
+    Temiz veri {'stops', 'shapes', 'routes', 'schedules'} sözlüğüdür; okunamayan
+    dosyanın değeri None'dır. Rapor dosya başına {'satır', 'temiz', denetim: sayı} tutar.
+    """
+    data = dict.fromkeys(('stops', 'shapes', 'routes', 'schedules'))
+    report = {}
+
+    rows = _row_source(stops_file, DurakSatiri, DURAK_SUTUNLARI) if _source_exists(stops_file) else None
+    if rows is not None:
+        stop_ids, names, codes = [], [], []
+        lats, lons = array('d'), array('d')
+        for stop_id, name, lat, lon, stop_code in rows:
+            stop_ids.append(stop_id)
+            names.append(name)
+            lats.append(lat)
+            lons.append(lon)
+            codes.append(stop_code)
+        inside = _within_bounds(lats, lons)
+        unique = _first_occurrences(stop_ids)
+        missing = [lat == 0 and lon == 0 for lat, lon in zip(lats, lons)]
+        data['stops'] = [DurakSatiri(stop_ids[i], names[i], lats[i] if inside[i] else 0.0,
+                                     lons[i] if inside[i] else 0.0, codes[i])
+                         for i in compress(range(len(stop_ids)), unique)]
+        report[stops_file] = {
+            'satır': len(stop_ids),
+            'temiz': len(data['stops']),
+            "tekrarlanan stop_id (atlandı)": unique.count(False),
+            "eksik koordinat (konumsuz yazılacak)": missing.count(True),
+            "Kocaeli sınırları dışında koordinat (konumsuz yazılacak)":
+                sum(1 for ok, empty in zip(inside, missing) if not ok and not empty),
+        }
+
+    rows = _row_source(shapes_file, ShapeSatiri, SHAPE_SUTUNLARI) if _source_exists(shapes_file) else None
+    if rows is not None:
+        shape_ids = []
+        lats, lons = array('d'), array('d')
+        sequences = array('q')
+        for shape_id, lat, lon, sequence in rows:
+            shape_ids.append(shape_id)
+            lats.append(lat)
+            lons.append(lon)
+            sequences.append(sequence)
+        inside = _within_bounds(lats, lons)
+        section = report[shapes_file] = {'satır': len(shape_ids)}
+        section["Kocaeli sınırları dışında nokta (atlandı)"] = inside.count(False)
+        data['shapes'] = _group_shapes(
+            (ShapeSatiri(shape_ids[i], lats[i], lons[i], sequences[i]) for i in compress(range(len(shape_ids)), inside)),
+            section)
+        section['temiz'] = sum(len(shape['sequences']) for shape in data['shapes'])
+
+    routes = _read_routes(routes_file) if _source_exists(routes_file) else None
+    if routes is not None:
+        total = len(routes)
+        routes = list(compress(routes, _first_occurrences(route['route_id'] for route in routes)))
+        known = {row.stop_id for row in data['stops'] or ()}
+        unknown = set()
+        references = 0
+        for route in routes:
+            for i, stop_id in enumerate(route['stops']):
+                if stop_id and data['stops'] is not None and stop_id not in known:
+                    unknown.add(stop_id)
+                    references += 1
+                    route['stops'][i] = ''
+        data['routes'] = routes
+        report[routes_file] = {
+            'satır': total,
+            'temiz': len(routes),
+            "tekrarlanan route_id (atlandı)": total - len(routes),
+            "stops.txt'de olmayan durak referansı (boş bırakıldı)": references,
+            "stops.txt'de olmayan farklı durak": len(unknown),
+        }
+
+    if _source_exists(schedules_file):
+        section = {}
+        rows = _read_schedules(schedules_file, routes_file, section)
+        if rows is not None:
+            route_ids = {route['route_id'] for route in data['routes'] or ()}
+            matched = [row for row in rows if data['routes'] is None or row['route_id'] in route_ids]
+            # Aynı Hat'a yazılan satırlardan sonuncusu kalırdı; sırayı koruyarak sonuncuyu tut
+            last = {row['route_id']: i for i, row in enumerate(matched)}
+            data['schedules'] = [row for i, row in enumerate(matched) if last[row['route_id']] == i]
+            # Yazılacak dakika listeleri kesin artan ve 2880'in (ertesi gün sonu) altında olmalı
+            columns = [row[f'{day_type}_dk'] for row in data['schedules'] for day_type in GUN_TIPLERI]
+            broken = sum(1 for minutes in columns
+                         if any(a >= b for a, b in zip(minutes, minutes[1:])) or (minutes and minutes[-1] >= 2880))
+            report[schedules_file] = {
+                'satır': len(rows),
+                'temiz': len(data['schedules']),
+                "routes.txt'de olmayan hat (atlandı)": len(rows) - len(matched),
+                "aynı hat için tekrarlanan çizelge (sonuncusu kullanıldı)": len(matched) - len(data['schedules']),
+                **section,
+                "sırasız ya da 48 saati aşan saat listesi": broken,
+            }
+    return data, report
+
+
+def print_preflight_report(report):
+    # Ön denetim özetini dosya başına yazdır
+    print("\n" + "=" * 50)
+    print("ÖN DENETİM RAPORU")
+    print("=" * 50)
+    for file_path, section in report.items():
+        print(f"{file_path}: {section['satır']} satır, {section['temiz']} temiz kayıt")
+        for check, count in section.items():
+            if check not in ('satır', 'temiz'):
+                print(f"  {'!' if count else ' '} {check}: {count}")
+    print("=" * 50)
+
+
+def write_stop_route_index(stops_file, routes_file, path=VARSAYILAN_DURAK_INDEKSI, data=None):
+    """Durak -> (hat, sıra) ters indeksini little-endian uint32 dizileri olarak yazar.
+
+    Dosya düzeni (her bölüm 4 bayt hizalı, dosya olduğu gibi belleğe eşlenebilir):
+
+        başlık     : imza "DHIX", sürüm, durak, hat, girdi, hat-durak sayısı, metin uzunluğu, 0
+        durak_bas  : uint32[durak + 1]  durağın girdilerinin başladığı yer (CSR)
+        girdi_hat  : uint32[girdi]      girdinin hat numarası (durak içinde hat, sonra sıraya göre sıralı)
+        girdi_sira : uint32[girdi]      durağın hattaki sırası (GÜZERGAH_ÜZERINDE.sıra ile aynı)
+        hat_bas    : uint32[hat + 1]    hattın durak listesinin başladığı yer
+        hat_durak  : uint32[hat-durak]  hattın durakları sırayla (stops.txt'de yoksa BILINMEYEN_DURAK)
+        metin      : UTF-8 JSON {"stops": [stop_id...], "routes": [[route_id, no, ad, yön]...]}
+
+    İki durağın girdileri hat numarasına göre sıralı olduğundan doğrudan hatlar iki listenin
+    kesişimiyle, güzergah parçası hat_durak dilimiyle bulunur. data verilirse (ön denetimin
+    temiz verisi) dosyalar yeniden okunmaz.
+    """
+    stops = _loaded(data, 'stops', stops_file) or []
+    routes = sorted(_loaded(data, 'routes', routes_file) or [], key=lambda route: route['route_id'])
+    stop_ids = sorted({row.stop_id for row in stops})
+    stop_index = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+
+    entries = [[] for _ in stop_ids]
+    route_offsets = array('I', [0])
+    route_stops = array('I')
+    for route_number, route in enumerate(routes):
+        for sequence, stop_id in enumerate(route['stops']):
+            index = stop_index.get(stop_id)
+            route_stops.append(BILINMEYEN_DURAK if index is None else index)
+            if index is not None:
+                entries[index].append((route_number, sequence))
+        route_offsets.append(len(route_stops))
+
+    stop_offsets = array('I', [0])
+    entry_routes = array('I')
+    entry_sequences = array('I')
+    for stop_entries in entries:
+        # Hatlar ve sıralar artan sırada eklendiğinden liste zaten sıralı
+        for route_number, sequence in stop_entries:
+            entry_routes.append(route_number)
+            entry_sequences.append(sequence)
+        stop_offsets.append(len(entry_routes))
+
+    text = json.dumps({'stops': stop_ids,
+                       'routes': [[route['route_id'], route['route_number'], route['route_name'], route['direction']]
+                                  for route in routes]}, ensure_ascii=False).encode('utf-8')
+    header = array('I', [int.from_bytes(DURAK_INDEKSI_IMZASI, 'little'), DURAK_INDEKSI_SURUMU, len(stop_ids),
+                         len(routes), len(entry_routes), len(route_stops), len(text), 0])
+    sections = (header, stop_offsets, entry_routes, entry_sequences, route_offsets, route_stops)
+    if sys.byteorder != 'little':
+        for section in sections:
+            section.byteswap()
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        for section in sections:
+            section.tofile(file)
+        file.write(text)
+    os.replace(tmp_path, path)
+    print(f"Durak-hat indeksi {path} dosyasına yazıldı: {len(stop_ids)} durak, {len(routes)} hat, "
+          f"{len(entry_routes)} girdi, {os.path.getsize(path)} bayt.")
+    return len(entry_routes)
+
+
+def remove_stop_route_index(path=VARSAYILAN_DURAK_INDEKSI):
+    # API indeks dosyası varken Cypher'a gitmez; yükleme başlarken eskisi silinir ki veritabanıyla
+    # uyuşmayan indeks sunulmasın. --stop-index verilmişse yükleme sonunda yeniden yazılır
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    print(f"Eski durak-hat indeksi {path} silindi.")
+    return True
+
+
+def _timed(phase, func, *args, **kwargs):
+    # Aşamayı çalıştır ve toplam süresini raporla
+    started = time.perf_counter()
+    count = func(*args, **kwargs)
+    _report_throughput(phase, count or 0, time.perf_counter() - started)
+    return count
+
+
+def parse_args(argv=None):
+    # Komut satırı seçenekleri
+    parser = argparse.ArgumentParser(description="GTFS verilerini Neo4j veritabanına yükler.")
+    parser.add_argument("--uri", default=os.environ.get("NEO4J_URI", VARSAYILAN_NEO4J_URI),
+                        help="Neo4j adresi (varsayılan: NEO4J_URI ortam değişkeni)")
+    parser.add_argument("--user", default=os.environ.get("NEO4J_USER", VARSAYILAN_NEO4J_USER),
+                        help="Neo4j kullanıcısı (varsayılan: NEO4J_USER ortam değişkeni)")
+    parser.add_argument("--password", default=os.environ.get("NEO4J_PASSWORD", VARSAYILAN_NEO4J_PASSWORD),
+                        help="Neo4j parolası (varsayılan: NEO4J_PASSWORD ortam değişkeni; komut satırında "
+                             "parola işlem listesinde görünür, ortam değişkeni tercih edin)")
+    parser.add_argument("--batch-size", type=int, default=VARSAYILAN_BATCH_SIZE,
+                        help="Bir transaction'da yazılacak satır sayısı (0: eski satır satır yükleme)")
+    parser.add_argument("--shape-mode", choices=["points", "compact"], default="points",
+                        help="points: her nokta bir ShapeNoktasi düğümü, compact: shape başına tek Shape düğümü")
+    parser.add_argument("--shape-tolerance", type=float, default=VARSAYILAN_SHAPE_TOLERANSI,
+                        help="compact modunda Douglas-Peucker toleransı (metre)")
+    parser.add_argument("--shape-encoding", choices=["arrays", "polyline"], default="arrays",
+                        help="compact modunda lat/lng dizileri ya da encoded polyline olarak sakla")
+    parser.add_argument("--async-writers", type=int, default=0, metavar="N",
+                        help="Durak, shape, hat ve çizelgeleri AsyncGraphDatabase ile N eşzamanlı yazma "
+                             "transaction'ı üzerinden boru hattı şeklinde yükle")
+    parser.add_argument("--queue-size", type=int, default=0,
+                        help="Async yüklemede yazılmayı bekleyen en fazla parça sayısı (varsayılan: 2 x N)")
+    parser.add_argument("--gtfs-zip", help="veri/ klasörü yerine doğrudan okunacak GTFS zip arşivi")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Toplu yüklemede paralel yazan oturum sayısı")
+    parser.add_argument("--preflight", action="store_true",
+                        help="Yüklemeden önce girdileri denetle (koordinat sınırları, durak referansları, tekrarlanan "
+                             "shape sıraları, geçersiz saatler) ve yazıcılara yalnızca temiz veriyi ver")
+    parser.add_argument("--preflight-only", action="store_true",
+                        help="Veritabanına bağlanmadan yalnızca ön denetim raporunu yazdır")
+    parser.add_argument("--export-admin-import", metavar="DIR",
+                        help="Veritabanına bağlanmadan neo4j-admin import CSV'lerini DIR klasörüne yaz")
+    parser.add_argument("--verify-admin-import", metavar="DIR",
+                        help="neo4j-admin ile yüklenen grafı DIR/counts.json ile karşılaştır")
+    parser.add_argument("--edge-model", choices=["per-route", "aggregated", "both"], default="per-route",
+                        help="Hat başına SONRAKI_DURAK, durak çifti başına DURAK_BAGLANTISI ya da ikisi birden")
+    parser.add_argument("--stop-offsets", action="store_true",
+                        help="Güzergah ilişkilerine hattın ilk durağından itibaren tahmini süreyi (offset_dk) yaz")
+    parser.add_argument("--route-documents", action="store_true",
+                        help="Her hatta güzergah, sadeleştirilmiş shape ve çizelgeyi tek JSON okuma modeli olarak yaz")
+    parser.add_argument("--stop-index", nargs="?", const=VARSAYILAN_DURAK_INDEKSI, metavar="PATH",
+                        help="API'nin doğrudan hat aramaları için durak -> (hat, sıra) ters indeksini yaz "
+                             f"(varsayılan: {VARSAYILAN_DURAK_INDEKSI})")
+    parser.add_argument("--stop-neighbors", type=int, default=0, metavar="K",
+                        help="Her durağa en yakın K durağı mesafeleriyle birlikte önceden hesaplayıp yaz")
+    parser.add_argument("--transfer-graph", action="store_true",
+                        help="SONRAKI_DURAK kenarlarına süre yaz ve yürüme mesafesindeki duraklar arasına AKTARMA ekle")
+    parser.add_argument("--walk-radius", type=float, default=VARSAYILAN_YURUME_YARICAPI,
+                        help="AKTARMA için en fazla yürüme mesafesi (metre)")
+    parser.add_argument("--metrics-log", nargs="?", const=VARSAYILAN_METRIK_GUNLUGU, metavar="PATH",
+                        help="Aşama başına sorgu süresi histogramı, sayaçlar, yeniden deneme ve hataları "
+                             f"JSON-lines olarak yaz (varsayılan: {VARSAYILAN_METRIK_GUNLUGU})")
+    parser.add_argument("--profile-slowest", type=int, default=0, metavar="N",
+                        help="Her aşamada en yavaş N ifadenin PROFILE planını günlüğe ekle (--metrics-log'u açar)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Yarıda kalan tam yüklemeyi veritabanını silmeden son kontrol noktasından sürdür")
+    parser.add_argument("--checkpoint", default=VARSAYILAN_CHECKPOINT,
+                        help="Toplu (ve async) yüklemede her commit'ten sonra ilerlemenin yazıldığı dosya")
+    parser.add_argument("--max-retries", type=int, default=VARSAYILAN_YENIDEN_DENEME,
+                        help="Geçici hatalarda (bağlantı kopması, zaman aşımı) parça başına artan beklemeli yeniden deneme")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Veritabanını silmeden yalnızca değişen kayıtları uygula")
+    parser.add_argument("--manifest", default=VARSAYILAN_MANIFEST,
+                        help="Son yüklenen kayıtların özetlerinin tutulduğu dosya")
+    return parser.parse_args(argv)
+
+
 def main():
     # Program başlat
-    URI = "bolt://localhost:7687"
-    USER = "neo4j"
-    PASSWORD = "baranbaran"
+    args = parse_args()
+    URI = args.uri
+    USER = args.user
+    PASSWORD = args.password
     
-    STOPS_FILE = "veri/stops.txt"
-    SHAPES_FILE = "veri/shapes.txt"
-    ROUTES_FILE = "veri/routes.txt"
-    SCHEDULES_FILE = "veri/schedules.txt"
+    # Zip verilmişse dosyalar arşivden çıkarılmadan okunur (ör. gtfs.zip/stops.txt)
+    DATA_DIR = args.gtfs_zip or "veri"
+    STOPS_FILE = f"{DATA_DIR}/stops.txt"
+    SHAPES_FILE = f"{DATA_DIR}/shapes.txt"
+    ROUTES_FILE = f"{DATA_DIR}/routes.txt"
+    SCHEDULES_FILE = f"{DATA_DIR}/schedules.txt"
+    checkpoint = None
     
     try:
-        # Onay al
-        confirm = input("Veritabanı tamamen temizlenecek ve yeniden yapılandırılacak. Devam etmek istiyor musunuz? (e/h): ")
-        if confirm.lower() != 'e':
-            print("İşlem iptal edildi.")
+        if args.preflight_only:
+            _, report = preflight(STOPS_FILE, SHAPES_FILE, ROUTES_FILE, SCHEDULES_FILE)
+            print_preflight_report(report)
             return
+
+        if args.export_admin_import:
+            export_admin_import(STOPS_FILE, SHAPES_FILE, ROUTES_FILE, SCHEDULES_FILE, args.export_admin_import)
+            return
+
+        if args.verify_admin_import:
+            # neo4j-admin kısıtlama oluşturmaz; Bolt yolundakilerle aynılarını ekle
+            db = Neo4jDatabase(URI, USER, PASSWORD)
+            db.create_constraints()
+            db.create_indexes()
+            ok = db.verify_admin_import(args.verify_admin_import)
+            db.create_database_summary()
+            db.close()
+            if not ok:
+                sys.exit(1)
+            return
+
+        if args.incremental:
+            # Artımlı senkronizasyon: veritabanı silinmez. Manifest temiz veriden yazıldıysa
+            # aynı ön denetim burada da uygulanır, yoksa ham satırlar temiz özetlerle karşılaştırılırdı
+            clean = None
+            if args.preflight or _load_manifest(args.manifest).get('preflight'):
+                clean, report = preflight(STOPS_FILE, SHAPES_FILE, ROUTES_FILE, SCHEDULES_FILE)
+                print_preflight_report(report)
+            db = Neo4jDatabase(URI, USER, PASSWORD, args.workers)
+            db.max_retries = args.max_retries
+            if args.metrics_log or args.profile_slowest:
+                db.enable_metrics(args.metrics_log or VARSAYILAN_METRIK_GUNLUGU, args.profile_slowest)
+            remove_stop_route_index(args.stop_index or VARSAYILAN_DURAK_INDEKSI)
+            db.create_constraints()
+            db.sync_incremental(STOPS_FILE, SHAPES_FILE, ROUTES_FILE, SCHEDULES_FILE, args.manifest,
+                                args.batch_size or VARSAYILAN_BATCH_SIZE, args.shape_mode,
+                                args.shape_tolerance, args.shape_encoding, args.edge_model, clean)
+            if args.edge_model != 'per-route':
+                db.build_aggregated_edges(STOPS_FILE, SHAPES_FILE, ROUTES_FILE, args.batch_size or VARSAYILAN_BATCH_SIZE,
+                                          data=clean)
+            if args.stop_index:
+                write_stop_route_index(STOPS_FILE, ROUTES_FILE, args.stop_index, data=clean)
+            if args.stop_offsets:
+                db.import_stop_offsets(STOPS_FILE, ROUTES_FILE, args.batch_size or VARSAYILAN_BATCH_SIZE, data=clean)
+            if args.route_documents:
+                db.build_route_documents(STOPS_FILE, SHAPES_FILE, ROUTES_FILE, SCHEDULES_FILE, args.shape_tolerance,
+                                         args.batch_size or VARSAYILAN_BATCH_SIZE, data=clean)
+            if args.stop_neighbors:
+                db.build_stop_neighbors(STOPS_FILE, args.stop_neighbors, args.batch_size or VARSAYILAN_BATCH_SIZE,
+                                        data=clean)
+            if args.transfer_graph:
+                db.build_transfer_graph(STOPS_FILE, ROUTES_FILE, args.walk_radius, args.batch_size or VARSAYILAN_BATCH_SIZE,
+                                        args.edge_model, data=clean)
+            db.create_indexes()
+            db.create_database_summary()
+            failed_rows = db.failed_rows
+            db.close()
+            if failed_rows:
+                print(f"\nHata: {failed_rows} satır yazılamadı ve atlandı (ayrıntılar yukarıda).")
+                sys.exit(1)
+            print("\nArtımlı yükleme başarıyla tamamlandı!")
+            return
+
+        # Kaldığı yerden devam: parçalar aynı ayar ve girdilerle aynı sırada üretilmeli
+        settings = {'data_dir': DATA_DIR, 'batch_size': args.batch_size, 'workers': args.workers,
+                    'async_writers': args.async_writers, 'queue_size': args.queue_size,
+                    'shape_mode': args.shape_mode, 'shape_tolerance': args.shape_tolerance,
+                    'shape_encoding': args.shape_encoding, 'edge_model': args.edge_model, 'preflight': args.preflight}
+        sources = {path: _source_fingerprint(path) for path in (STOPS_FILE, SHAPES_FILE, ROUTES_FILE, SCHEDULES_FILE)
+                   if _source_exists(path)}
+        if args.async_writers and args.batch_size <= 0:
+            print("Hata: --async-writers yalnızca toplu yüklemede (--batch-size > 0) kullanılabilir.")
+            sys.exit(1)
+        if args.preflight and (args.batch_size <= 0 or args.async_writers):
+            print("Hata: --preflight yalnızca toplu yüklemede (--batch-size > 0, --async-writers olmadan) "
+                  "kullanılabilir.")
+            sys.exit(1)
+        if args.resume:
+            if args.batch_size <= 0:
+                print("Hata: --resume yalnızca toplu yüklemede (--batch-size > 0) kullanılabilir.")
+                sys.exit(1)
+            checkpoint = ImportCheckpoint.load(args.checkpoint, settings, sources)
+            if checkpoint is None:
+                print(f"Uyarı: {args.checkpoint} bulunamadı, yükleme baştan başlayacak.")
+            else:
+                print(f"Kaldığı yerden devam ediliyor. Tamamlanmış aşamalar: {', '.join(checkpoint.summary()) or '-'}")
+
+        if checkpoint is None:
+            # Onay al
+            confirm = input("Veritabanı tamamen temizlenecek ve yeniden yapılandırılacak. Devam etmek istiyor musunuz? (e/h): ")
+            if confirm.lower() != 'e':
+                print("İşlem iptal edildi.")
+                return
+            if args.batch_size > 0:
+                checkpoint = ImportCheckpoint(args.checkpoint, settings, sources)
+        remove_stop_route_index(args.stop_index or VARSAYILAN_DURAK_INDEKSI)
         
+        # Ön denetim: yazıcılar dosyaları yeniden okumaz, temizlenmiş veriyi kullanır
+        clean = None
+        if args.preflight:
+            clean, report = preflight(STOPS_FILE, SHAPES_FILE, ROUTES_FILE, SCHEDULES_FILE)
+            print_preflight_report(report)
+
         # DB'ye bağlan
-        db = Neo4jDatabase(URI, USER, PASSWORD)
+        db = Neo4jDatabase(URI, USER, PASSWORD, args.workers)
+        db.max_retries = args.max_retries
+        if args.metrics_log or args.profile_slowest:
+            db.enable_metrics(args.metrics_log or VARSAYILAN_METRIK_GUNLUGU, args.profile_slowest)
+        if checkpoint is not None:
+            db.enable_checkpoint(checkpoint)
         
-        # Temizle
+        # Temizle (devam edilirken tamamlanmış silme aşamaları atlanır)
         db.clear_database()
         
         # Kısıtlamalar
         db.create_constraints()
         
         # Veri yükleme
-        print("\n1. Durak verilerini yükleme...")
-        db.import_stops(STOPS_FILE)
-        
-        print("\n2. Shape verilerini yükleme...")
-        db.import_shapes(SHAPES_FILE)
+        if args.batch_size > 0:
+            print(f"\nToplu yükleme modu (batch size: {args.batch_size})")
+            clean = clean or {}
+            import_stops = lambda path: db.import_stops_batched(path, args.batch_size, clean.get('stops'))
+            import_shapes = lambda path: db.import_shapes_batched(path, args.batch_size, clean.get('shapes'))
+            import_routes = lambda path: db.import_routes_batched(path, args.batch_size, args.edge_model,
+                                                                  clean.get('routes'))
+            import_schedules = lambda path: db.import_schedules_batched(path, args.batch_size, ROUTES_FILE,
+                                                                        clean.get('schedules'))
+        else:
+            print("\nSatır satır yükleme modu")
+            import_stops, import_shapes, import_routes = db.import_stops, db.import_shapes, db.import_routes
+            import_schedules = db.import_schedules
+        if args.shape_mode == "compact":
+            import_shapes = lambda path: db.import_shapes_compact(path, args.shape_tolerance, args.shape_encoding,
+                                                                  args.batch_size or VARSAYILAN_BATCH_SIZE,
+                                                                  (clean or {}).get('shapes'))
+
+        async_failed_rows = 0
+        if args.async_writers:
+            print(f"\n1-4. Durak, shape, hat ve çizelgeleri async yükleme ({args.async_writers} eşzamanlı yazar)...")
+            started = time.perf_counter()
+            count, async_failed_rows = asyncio.run(import_async(
+                URI, USER, PASSWORD, STOPS_FILE, SHAPES_FILE if args.shape_mode == "points" else None,
+                ROUTES_FILE, SCHEDULES_FILE, args.batch_size, args.async_writers, args.queue_size,
+                args.edge_model, args.max_retries, checkpoint))
+            _report_throughput("1-4. Async yükleme", count, time.perf_counter() - started)
+            if args.shape_mode == "compact":
+                _timed("2. Shape", import_shapes, SHAPES_FILE)
+        elif db.workers > 1 and args.batch_size > 0:
+            # Duraklar ve shape'ler birbirine bağlı değil, aynı anda yüklenir
+            print(f"\n1-2. Durak ve shape verilerini paralel yükleme ({db.workers} işçi)...")
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                stops_future = executor.submit(_timed, "1. Duraklar", import_stops, STOPS_FILE)
+                shapes_future = executor.submit(_timed, "2. Shape", import_shapes, SHAPES_FILE)
+                count = (stops_future.result() or 0) + (shapes_future.result() or 0)
+            _report_throughput("1-2. Duraklar + Shape", count, time.perf_counter() - started)
+        else:
+            print("\n1. Durak verilerini yükleme...")
+            _timed("1. Duraklar", import_stops, STOPS_FILE)
+
+            print("\n2. Shape verilerini yükleme...")
+            _timed("2. Shape", import_shapes, SHAPES_FILE)
         
-        print("\n3. Hat ve güzergah verilerini yükleme...")
-        db.import_routes(ROUTES_FILE)
+        if not args.async_writers:
+            print("\n3. Hat ve güzergah verilerini yükleme...")
+            _timed("3. Hatlar", import_routes, ROUTES_FILE)
+        if args.shape_mode == "compact":
+            db.link_shapes_to_routes()
+        if args.edge_model != 'per-route':
+            print("\nDurak çifti başına toplu kenarları oluşturma...")
+            _timed("DURAK_BAGLANTISI", db.build_aggregated_edges, STOPS_FILE, SHAPES_FILE, ROUTES_FILE,
+                   args.batch_size or VARSAYILAN_BATCH_SIZE, data=clean)
         
-        print("\n4. Hat zaman çizelgelerini yükleme...")
-        db.import_schedules(SCHEDULES_FILE)
+        if not args.async_writers:
+            print("\n4. Hat zaman çizelgelerini yükleme...")
+            _timed("4. Zaman çizelgeleri", import_schedules, SCHEDULES_FILE)
+
+        if args.stop_index:
+            print("\nDurak-hat indeksini yazma...")
+            _timed("Durak-hat indeksi", write_stop_route_index, STOPS_FILE, ROUTES_FILE, args.stop_index, data=clean)
+
+        if args.stop_offsets:
+            print("\nDuraklara göre kalkış farklarını hesaplama...")
+            _timed("Durak kalkış farkları", db.import_stop_offsets, STOPS_FILE, ROUTES_FILE,
+                   args.batch_size or VARSAYILAN_BATCH_SIZE, data=clean)
+
+        if args.route_documents:
+            print("\nHat okuma modellerini oluşturma...")
+            _timed("Hat okuma modelleri", db.build_route_documents, STOPS_FILE, SHAPES_FILE, ROUTES_FILE,
+                   SCHEDULES_FILE, args.shape_tolerance, args.batch_size or VARSAYILAN_BATCH_SIZE, data=clean)
+
+        if args.stop_neighbors:
+            print("\nEn yakın komşu durakları hesaplama...")
+            _timed("Komşu duraklar", db.build_stop_neighbors, STOPS_FILE, args.stop_neighbors,
+                   args.batch_size or VARSAYILAN_BATCH_SIZE, data=clean)
+
+        if args.transfer_graph:
+            print("\n5. Aktarma grafını oluşturma...")
+            _timed("5. Aktarma grafı", db.build_transfer_graph, STOPS_FILE, ROUTES_FILE, args.walk_radius,
+                   args.batch_size or VARSAYILAN_BATCH_SIZE, args.edge_model, data=clean)
         
         # İndeksler
         db.create_indexes()
+
+        # Sonraki artımlı yükleme için manifest; ön denetim yapıldıysa yazılan temiz satırlardan
+        manifest, _ = db.build_manifest(STOPS_FILE, SHAPES_FILE, ROUTES_FILE, SCHEDULES_FILE, clean)
+        _save_manifest(args.manifest, manifest)
         
         # Özet
         db.create_database_summary()
         
         # Kapat
+        failed_rows = db.failed_rows + async_failed_rows
+        if checkpoint is not None:
+            # Checkpoint varken geçici hatalar yüklemeyi durdurur; kalıcı hatalar burada birikir
+            failed_rows = checkpoint.failed_rows()
         db.close()
+        if checkpoint is not None:
+            checkpoint.remove()
+        if failed_rows:
+            print(f"\nHata: {failed_rows} satır yazılamadı ve atlandı (ayrıntılar yukarıda).")
+            sys.exit(1)
         print("\nİşlem başarıyla tamamlandı!")
         
     except Exception as e:
         print(f"\nHata: {e}")
         print("İşlem sırasında bir hata oluştu!")
+        if checkpoint is not None and os.path.exists(checkpoint.path):
+            print(f"İlerleme {checkpoint.path} dosyasında; --resume ile kaldığı yerden devam edebilirsiniz.")
         sys.exit(1)
 
 
@@ -0,0 +1,452 @@
+"""veri_yukle.py için içe aktarma benchmark'ı.
+
+Ölçeklenebilir sentetik bir GTFS beslemesi üretir (N durak, M hat, hat başına K shape
+noktası, zaman çizelgeleri) ve Neo4jDatabase'in import_* aşamalarını birkaç besleme
+boyutunda ölçer: satır/sn, sorgu ve transaction sayısı (round trip) ve tepe RSS.
+
+--uri verilirse yerel bir Neo4j'ye (ör. docker konteyneri) karşı çalışır; verilmezse
+sorguları yalnızca sayan kayıt yapan sahte sürücü kullanılır. Sonuçlar JSON olarak
+yazılır, --compare ile önceki bir çalıştırmayla karşılaştırılır.
+
+    python veri_yukle_benchmark.py --scales 1 5 10
+    python veri_yukle_benchmark.py --uri bolt://localhost:7687 --password sifre --scales 1
+    python veri_yukle_benchmark.py --compare veri/benchmark/onceki.json
+"""
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import veri_yukle
+
+# Ölçek 1'deki besleme boyutu; --scales ile çarpılır
+VARSAYILAN_DURAK_SAYISI = 1000
+VARSAYILAN_HAT_SAYISI = 40
+VARSAYILAN_SHAPE_NOKTASI = 300
+VARSAYILAN_HAT_DURAK_SAYISI = 30
+
+# Sentetik durakların dağıtıldığı alan (Kocaeli)
+ENLEM_ARALIGI = (40.65, 40.85)
+BOYLAM_ARALIGI = (29.70, 30.10)
+
+VARSAYILAN_CIKTI_KLASORU = "veri/benchmark"
+
+
+def _times(rng, first, last, headway):
+    # first..last dakikaları arasında yaklaşık headway aralıklı "SS:DD" sefer listesi;
+    # son seferler gece yarısını geçebilir (ör. 00:15)
+    minutes = []
+    current = first + rng.randrange(0, headway)
+    while current <= last:
+        minutes.append(current)
+        current += headway + rng.randrange(-2, 3)
+    return ' '.join(f"{(m // 60) % 24:02d}:{m % 60:02d}" for m in minutes)
+
+
+def generate_feed(output_dir, stops=VARSAYILAN_DURAK_SAYISI, routes=VARSAYILAN_HAT_SAYISI,
+                  shape_points=VARSAYILAN_SHAPE_NOKTASI, stops_per_route=VARSAYILAN_HAT_DURAK_SAYISI,
+                  wide_schedules=True, seed=0):
+    """output_dir'e stops.txt, routes.txt, shapes.txt ve schedules.txt yazar.
+
+    Her hat numarası gidiş (route_id ...0) ve dönüş (...1) olmak üzere iki hat üretir.
+    Zaman çizelgesi varsayılan olarak gerçek Kocaeli verisindeki geniş biçimdedir;
+    wide_schedules=False ise eski yükleyicinin okuduğu route_id biçiminde yazılır.
+    Üretilen satır sayılarını döndürür.
+    """
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+
+    stop_rows = []
+    for i in range(stops):
+        stop_rows.append((str(10000 + i), f"DURAK {i}", round(rng.uniform(*ENLEM_ARALIGI), 7),
+                          round(rng.uniform(*BOYLAM_ARALIGI), 7)))
+    with open(os.path.join(output_dir, "stops.txt"), 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['stop_id', 'stop_name', 'stop_lat', 'stop_lon', 'wheelchair_boarding', 'stop_url',
+                         'location_type', 'parent_station'])
+        for stop_id, name, lat, lon in stop_rows:
+            writer.writerow([stop_id, name, lat, lon, 0, '', 0, ''])
+
+    route_rows = []
+    shape_count = 0
+    with open(os.path.join(output_dir, "routes.txt"), 'w', encoding='utf-8', newline='') as routes_file, \
+            open(os.path.join(output_dir, "shapes.txt"), 'w', encoding='utf-8', newline='') as shapes_file:
+        route_writer = csv.writer(routes_file)
+        route_writer.writerow(['route_id', 'agency_id', 'route_short_name', 'route_long_name', 'route_type',
+                               'route_desc', 'route_color', 'route_text_color', 'route_url', 'stops'])
+        shape_writer = csv.writer(shapes_file)
+        shape_writer.writerow(['shape_id', 'shape_pt_lat', 'shape_pt_lon', 'shape_pt_sequence'])
+
+        for number in range(1, routes + 1):
+            # Duraklar boylama göre sıralanır ki güzergah zikzak çizmesin
+            route_stops = sorted(rng.sample(stop_rows, min(stops_per_route, len(stop_rows))),
+                                 key=lambda stop: stop[3])
+            for direction in (0, 1):
+                route_id = f"4{number:04d}{direction}"
+                ordered = route_stops if direction == 0 else route_stops[::-1]
+                route_writer.writerow([route_id, 78, str(number), f"HAT {number}", 3, 'Otobüs', '1EA9BD',
+                                       'FFFFFF', '', ','.join(stop[0] for stop in ordered)])
+                route_rows.append((route_id, str(number), direction))
+
+                # Shape noktaları ardışık duraklar arasında doğrusal dağıtılır
+                segments = max(1, len(ordered) - 1)
+                for seq in range(shape_points):
+                    position = seq * segments / max(1, shape_points - 1)
+                    index = min(int(position), segments - 1)
+                    ratio = position - index
+                    first, second = ordered[index], ordered[min(index + 1, len(ordered) - 1)]
+                    lat = first[2] + (second[2] - first[2]) * ratio + rng.uniform(-2e-5, 2e-5)
+                    lon = first[3] + (second[3] - first[3]) * ratio + rng.uniform(-2e-5, 2e-5)
+                    shape_writer.writerow([route_id, round(lat, 7), round(lon, 7), seq + 1])
+                    shape_count += 1
+
+    schedule_rows = 0
+    with open(os.path.join(output_dir, "schedules.txt"), 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        if wide_schedules:
+            writer.writerow(['route_number', 'route_name', 'direction_1', 'direction_2', 'weekday_times_1',
+                             'weekday_times_2', 'saturday_times_1', 'saturday_times_2', 'sunday_times_1',
+                             'sunday_times_2', 'color_notes'])
+            for number in range(1, routes + 1):
+                writer.writerow([str(number), f"{number} - HAT {number}", 'BAŞLANGIÇ', 'BİTİŞ',
+                                 _times(rng, 360, 1450, 20), _times(rng, 380, 1450, 20),
+                                 _times(rng, 420, 1380, 30), _times(rng, 440, 1380, 30),
+                                 _times(rng, 480, 1320, 40), _times(rng, 500, 1320, 40), ''])
+                schedule_rows += 1
+        else:
+            writer.writerow(['route_id', 'weekday_times', 'saturday_times', 'sunday_times', 'color_notes',
+                             'route_short_name', 'direction'])
+            for route_id, number, direction in route_rows:
+                writer.writerow([route_id, _times(rng, 360, 1450, 20), _times(rng, 420, 1380, 30),
+                                 _times(rng, 480, 1320, 40), '', number, 'Gidiş' if direction == 0 else 'Dönüş'])
+                schedule_rows += 1
+
+    return {'stops': stops, 'routes': len(route_rows), 'shape_points': shape_count,
+            'schedule_rows': schedule_rows}
+
+
+class _KayitSonucu:
+    # Sahte sürücünün sonucu: her anahtar için 0 döner, yalnızca bağlantı testi 1 ister
+    def single(self):
+        return defaultdict(int, test=1)
+
+    def consume(self):
+        return None
+
+    def data(self):
+        return []
+
+    def __iter__(self):
+        return iter(())
+
+
+class _KayitOturumu:
+    # session.run ve execute_write çağrılarını sürücünün sayaçlarına işler
+    def __init__(self, driver, session=None):
+        self._driver = driver
+        self._session = session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+    def run(self, query, parameters=None, **kwargs):
+        self._driver.record(query, parameters or kwargs)
+        if self._session is None:
+            return _KayitSonucu()
+        return self._session.run(query, parameters, **kwargs)
+
+    def _transaction(self, method, work, *args, **kwargs):
+        self._driver.record_transaction()
+        if self._session is None:
+            return work(_KayitIslemi(self._driver, None), *args, **kwargs)
+        return getattr(self._session, method)(
+            lambda tx, *a, **kw: work(_KayitIslemi(self._driver, tx), *a, **kw), *args, **kwargs)
+
+    def execute_write(self, work, *args, **kwargs):
+        return self._transaction('execute_write', work, *args, **kwargs)
+
+    def execute_read(self, work, *args, **kwargs):
+        return self._transaction('execute_read', work, *args, **kwargs)
+
+
+class _KayitIslemi:
+    # Transaction fonksiyonlarına verilen tx; run çağrıları sayılır
+    def __init__(self, driver, tx):
+        self._driver = driver
+        self._tx = tx
+
+    def run(self, query, parameters=None, **kwargs):
+        self._driver.record(query, parameters or kwargs)
+        if self._tx is None:
+            return _KayitSonucu()
+        return self._tx.run(query, parameters, **kwargs)
+
+
+class KayitYapanSurucu:
+    """Sorguları sayan sürücü.
+
+    driver verilirse gerçek sürücünün önüne geçip yalnızca sayar; verilmezse veritabanı
+    olmadan her sorguya boş sonuç döner. Paralel işçiler için sayaçlar kilitle korunur.
+    """
+
+    def __init__(self, driver=None):
+        self._driver = driver
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queries = 0
+            self.transactions = 0
+            self.rows_sent = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {'queries': self.queries, 'transactions': self.transactions, 'rows_sent': self.rows_sent}
+
+    def record(self, query, parameters):
+        rows = parameters.get('rows') if parameters else None
+        with self._lock:
+            self.queries += 1
+            self.rows_sent += len(rows) if isinstance(rows, list) else 0
+
+    def record_transaction(self):
+        with self._lock:
+            self.transactions += 1
+
+    def session(self, **kwargs):
+        return _KayitOturumu(self, self._driver.session(**kwargs) if self._driver else None)
+
+    def close(self):
+        if self._driver is not None:
+            self._driver.close()
+
+
+def _peak_rss_kb():
+    # Sürecin şimdiye kadarki tepe bellek kullanımı (KB); Windows'ta ölçülemez
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS bayt, Linux KB döndürür
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _phases(db, feed_dir, args):
+    # (aşama adı, çağrılacak fonksiyon, argümanlar)
+    stops = os.path.join(feed_dir, "stops.txt")
+    shapes = os.path.join(feed_dir, "shapes.txt")
+    routes = os.path.join(feed_dir, "routes.txt")
+    schedules = os.path.join(feed_dir, "schedules.txt")
+    batch_size = args['batch_size']
+
+    if args['mode'] == 'legacy':
+        return [
+            ('import_stops', db.import_stops, (stops,)),
+            ('import_shapes', db.import_shapes, (shapes,)),
+            ('import_routes', db.import_routes, (routes,)),
+            ('import_schedules', db.import_schedules, (schedules,)),
+        ]
+
+    if args['shape_mode'] == 'compact':
+        shape_phase = ('import_shapes_compact', db.import_shapes_compact,
+                       (shapes, args['shape_tolerance'], 'arrays', batch_size))
+    else:
+        shape_phase = ('import_shapes_batched', db.import_shapes_batched, (shapes, batch_size))
+    return [
+        ('import_stops_batched', db.import_stops_batched, (stops, batch_size)),
+        shape_phase,
+        ('import_routes_batched', db.import_routes_batched, (routes, batch_size)),
+        ('import_schedules_batched', db.import_schedules_batched, (schedules, batch_size, routes)),
+        ('import_stop_offsets', db.import_stop_offsets, (stops, routes, batch_size)),
+        ('build_stop_neighbors', db.build_stop_neighbors, (stops, veri_yukle.VARSAYILAN_KOMSU_SAYISI, batch_size)),
+        ('build_transfer_graph', db.build_transfer_graph,
+         (stops, routes, veri_yukle.VARSAYILAN_YURUME_YARICAPI, batch_size)),
+    ]
+
+
+def _run_scale(scale, args):
+    """Tek bir ölçeği ayrı bir süreçte çalıştırır; tepe RSS yalnızca bu ölçeği yansıtır."""
+    feed_dir = tempfile.mkdtemp(prefix=f"gtfs_bench_{scale}_")
+    log = io.StringIO()
+    try:
+        feed = generate_feed(feed_dir, args['stops'] * scale, args['routes'] * scale, args['shape_points'],
+                             args['stops_per_route'], wide_schedules=args['mode'] != 'legacy', seed=scale)
+        real_driver = None
+        if args['uri']:
+            real_driver = veri_yukle.GraphDatabase.driver(args['uri'], auth=(args['user'], args['password']))
+        driver = KayitYapanSurucu(real_driver)
+
+        with redirect_stdout(log if not args['verbose'] else sys.stdout):
+            db = veri_yukle.Neo4jDatabase(args['uri'], args['user'], args['password'], args['workers'],
+                                          driver=driver)
+            if real_driver is not None:
+                db.clear_database()
+            db.create_constraints()
+
+            results = []
+            for phase, func, phase_args in _phases(db, feed_dir, args):
+                driver.reset()
+                started = time.perf_counter()
+                rows = func(*phase_args) or 0
+                elapsed = time.perf_counter() - started
+                counters = driver.snapshot()
+                results.append({
+                    'phase': phase,
+                    'rows': rows,
+                    'seconds': round(elapsed, 4),
+                    'rows_per_s': round(rows / elapsed, 1) if elapsed > 0 else None,
+                    'round_trips': counters['queries'],
+                    'transactions': counters['transactions'],
+                    'rows_sent': counters['rows_sent'],
+                    'peak_rss_kb': _peak_rss_kb(),
+                })
+            db.close()
+    finally:
+        if args['keep_feed']:
+            target = os.path.join(args['keep_feed'], f"scale_{scale}")
+            shutil.rmtree(target, ignore_errors=True)
+            shutil.copytree(feed_dir, target)
+        shutil.rmtree(feed_dir, ignore_errors=True)
+
+    return {
+        'scale': scale,
+        'feed': feed,
+        'phases': results,
+        'total_seconds': round(sum(result['seconds'] for result in results), 4),
+        'total_round_trips': sum(result['round_trips'] for result in results),
+        'peak_rss_kb': _peak_rss_kb(),
+    }
+
+
+def _print_report(report):
+    print(f"\nSürücü: {report['driver']}, mod: {report['mode']}, batch: {report['batch_size']}, "
+          f"işçi: {report['workers']}")
+    for run in report['runs']:
+        feed = run['feed']
+        print(f"\nÖlçek {run['scale']}: {feed['stops']} durak, {feed['routes']} hat, "
+              f"{feed['shape_points']} shape noktası, {feed['schedule_rows']} çizelge satırı")
+        print(f"  {'aşama':<26}{'satır':>9}{'sn':>9}{'satır/sn':>11}{'sorgu':>8}{'tx':>7}{'RSS KB':>10}")
+        for phase in run['phases']:
+            print(f"  {phase['phase']:<26}{phase['rows']:>9}{phase['seconds']:>9.2f}"
+                  f"{phase['rows_per_s'] or 0:>11.0f}{phase['round_trips']:>8}{phase['transactions']:>7}"
+                  f"{phase['peak_rss_kb'] or 0:>10}")
+        print(f"  toplam {run['total_seconds']:.2f} sn, {run['total_round_trips']} sorgu, "
+              f"tepe RSS {run['peak_rss_kb']} KB")
+
+
+def _compare(report, baseline_path):
+    # Aynı ölçek ve aşama için satır/sn ve sorgu sayısını önceki çalıştırmayla karşılaştır
+    with open(baseline_path, 'r', encoding='utf-8') as file:
+        baseline = json.load(file)
+    previous = {(run['scale'], phase['phase']): phase
+                for run in baseline['runs'] for phase in run['phases']}
+    print(f"\n{baseline_path} ile karşılaştırma (satır/sn oranı, sorgu farkı):")
+    for run in report['runs']:
+        for phase in run['phases']:
+            old = previous.get((run['scale'], phase['phase']))
+            if not old:
+                continue
+            ratio = (phase['rows_per_s'] / old['rows_per_s']) if old['rows_per_s'] and phase['rows_per_s'] else None
+            ratio_text = f"{ratio:.2f}x" if ratio is not None else "-"
+            print(f"  ölçek {run['scale']} {phase['phase']:<26}{ratio_text:>8}"
+                  f"{phase['round_trips'] - old['round_trips']:>+9}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="veri_yukle.py içe aktarma benchmark'ı")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 5],
+                        help="Besleme boyutu çarpanları (ölçek 1: --stops durak, --routes hat numarası)")
+    parser.add_argument("--stops", type=int, default=VARSAYILAN_DURAK_SAYISI, help="Ölçek 1'deki durak sayısı")
+    parser.add_argument("--routes", type=int, default=VARSAYILAN_HAT_SAYISI,
+                        help="Ölçek 1'deki hat numarası sayısı (her biri gidiş ve dönüş olmak üzere iki hat)")
+    parser.add_argument("--shape-points", type=int, default=VARSAYILAN_SHAPE_NOKTASI,
+                        help="Hat başına shape noktası")
+    parser.add_argument("--stops-per-route", type=int, default=VARSAYILAN_HAT_DURAK_SAYISI,
+                        help="Hat başına durak sayısı")
+    parser.add_argument("--mode", choices=["batched", "legacy"], default="batched",
+                        help="Toplu (import_*_batched) ya da satır satır (import_*) yükleyiciyi ölç")
+    parser.add_argument("--shape-mode", choices=["points", "compact"], default="points")
+    parser.add_argument("--shape-tolerance", type=float, default=veri_yukle.VARSAYILAN_SHAPE_TOLERANSI)
+    parser.add_argument("--batch-size", type=int, default=veri_yukle.VARSAYILAN_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--uri", help="Gerçek Neo4j adresi (ör. bolt://localhost:7687); yoksa sahte sürücü")
+    parser.add_argument("--user", default="neo4j")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--yes", action="store_true",
+                        help="Gerçek veritabanının her ölçekte silinmesi için onay sorma")
+    parser.add_argument("--output", help=f"Sonuç JSON dosyası (varsayılan: {VARSAYILAN_CIKTI_KLASORU}/<zaman>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="Önceki bir sonuç dosyasıyla karşılaştır")
+    parser.add_argument("--keep-feed", metavar="DIR", help="Üretilen sentetik beslemeleri DIR altına kopyala")
+    parser.add_argument("--verbose", action="store_true", help="Yükleyicinin çıktısını gizleme")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.uri and not args.yes:
+        confirm = input(f"{args.uri} adresindeki veritabanı her ölçekte tamamen silinecek. "
+                        "Devam etmek istiyor musunuz? (e/h): ")
+        if confirm.lower() != 'e':
+            print("İşlem iptal edildi.")
+            return
+
+    config = {
+        'stops': args.stops, 'routes': args.routes, 'shape_points': args.shape_points,
+        'stops_per_route': args.stops_per_route, 'mode': args.mode, 'shape_mode': args.shape_mode,
+        'shape_tolerance': args.shape_tolerance, 'batch_size': args.batch_size, 'workers': args.workers,
+        'uri': args.uri, 'user': args.user, 'password': args.password, 'keep_feed': args.keep_feed,
+        'verbose': args.verbose,
+    }
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'driver': args.uri or 'fake',
+        'mode': args.mode,
+        'shape_mode': args.shape_mode,
+        'batch_size': args.batch_size,
+        'workers': args.workers,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'runs': [],
+    }
+    for scale in args.scales:
+        print(f"Ölçek {scale} çalıştırılıyor...")
+        # Her ölçek yeni bir süreçte çalışır ki tepe RSS önceki ölçeklerden etkilenmesin
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            report['runs'].append(executor.submit(_run_scale, scale, config).result())
+
+    output = args.output or os.path.join(VARSAYILAN_CIKTI_KLASORU, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+
+    _print_report(report)
+    print(f"\nSonuçlar {output} dosyasına yazıldı.")
+    if args.compare:
+        _compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()